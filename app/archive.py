@@ -0,0 +1,421 @@
+"""
+Columnar cold storage for old calculations.
+
+    python -m app.archive run [--older-than-days N]
+    python -m app.archive list
+
+The archive job moves calculations created before a cutoff out of the database
+into immutable segment files. A segment holds one zlib-compressed block per
+column of little-endian typed arrays:
+
+    id, user_id          16 bytes per row (UUID bytes)
+    type                 uint8 code into the header's type table
+    created_at,          int64 microseconds since the Unix epoch
+    updated_at
+    result               float64, with result_valid (uint8) marking NULLs
+    input_offsets        int64, rows + 1 entries into input_values
+    input_values         float64, every row's inputs concatenated
+
+Rows are sorted by user and newest first, and the JSON header records each
+user's row range plus per-type aggregates, so stats rarely decompress a column
+and history only decompresses the columns of segments that hold the user, once:
+decoded columns are kept in a per-worker LRU of ARCHIVE_COLUMN_CACHE_MB.
+Segments are memory-mapped, so unused ones cost no resident memory.
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import uuid
+import zlib
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import AbstractSet, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.models.calculation import Calculation, summarize_stat_groups
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CALCSEG1"
+HEADER_LENGTH = struct.Struct("<I")
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+SEGMENT_SUFFIX = ".seg"
+
+def to_micros(value: datetime) -> int:
+    return (value - EPOCH) // MICROSECOND
+
+def from_micros(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+def _pack(typecode: str, values) -> bytes:
+    data = array(typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+def _unpack(typecode: str, raw: bytes) -> array:
+    data = array(typecode)
+    data.frombytes(raw)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+def stat_groups(rows: Iterable[Tuple[str, Optional[float]]]) -> List[list]:
+    """Per-type [type, count, result_count, result_sum, result_min, result_max] of (type, result) pairs."""
+    groups: Dict[str, list] = {}
+    for type_, result in rows:
+        group = groups.setdefault(type_, [type_, 0, 0, 0.0, None, None])
+        group[1] += 1
+        if result is not None:
+            group[2] += 1
+            group[3] += result
+            group[4] = result if group[4] is None else min(group[4], result)
+            group[5] = result if group[5] is None else max(group[5], result)
+    return list(groups.values())
+
+def write_segment(path: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Write rows (dicts with the Calculation column names) as a segment file; returns the header."""
+    rows = sorted(rows, key=lambda row: (row["user_id"].bytes, -to_micros(row["created_at"])))
+    types = sorted({row["type"] for row in rows})
+    type_codes = {type_: code for code, type_ in enumerate(types)}
+
+    offsets = [0]
+    values: List[float] = []
+    for row in rows:
+        values.extend(float(value) for value in row["inputs"])
+        offsets.append(len(values))
+
+    columns = {
+        "id": ("B", b"".join(row["id"].bytes for row in rows)),
+        "user_id": ("B", b"".join(row["user_id"].bytes for row in rows)),
+        "type": ("B", _pack("B", [type_codes[row["type"]] for row in rows])),
+        "created_at": ("q", _pack("q", [to_micros(row["created_at"]) for row in rows])),
+        "updated_at": ("q", _pack("q", [to_micros(row["updated_at"]) for row in rows])),
+        "result": ("d", _pack("d", [row["result"] if row["result"] is not None else 0.0 for row in rows])),
+        "result_valid": ("B", _pack("B", [row["result"] is not None for row in rows])),
+        "input_offsets": ("q", _pack("q", offsets)),
+        "input_values": ("d", _pack("d", values)),
+    }
+
+    users: Dict[str, Dict[str, Any]] = {}
+    for index, row in enumerate(rows):
+        user = users.setdefault(row["user_id"].hex, {"start": index, "end": index})
+        user["end"] = index + 1
+    for user in users.values():
+        user["groups"] = stat_groups((row["type"], row["result"]) for row in rows[user["start"]:user["end"]])
+
+    blocks = []
+    directory = {}
+    position = 0
+    for name, (typecode, raw) in columns.items():
+        block = zlib.compress(raw, 6)
+        directory[name] = {"typecode": typecode, "offset": position, "length": len(block)}
+        blocks.append(block)
+        position += len(block)
+
+    header = {
+        "version": 1,
+        "rows": len(rows),
+        "created_min": min((to_micros(row["created_at"]) for row in rows), default=0),
+        "created_max": max((to_micros(row["created_at"]) for row in rows), default=0),
+        "types": types,
+        "columns": directory,
+        "users": users,
+    }
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+
+    # Write to a temporary name and rename so readers never see a partial segment.
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(MAGIC)
+        handle.write(HEADER_LENGTH.pack(len(encoded)))
+        handle.write(encoded)
+        for block in blocks:
+            handle.write(block)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+    return header
+
+class ColumnCache:
+    """
+    Decoded segment columns keyed by (segment path, column), least recently used
+    evicted past max_bytes. Segments are immutable, so entries never go stale;
+    history pages reuse the created_at and input columns instead of
+    decompressing them on every request.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = settings.ARCHIVE_COLUMN_CACHE_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sizeof(value) -> int:
+        return len(value) if isinstance(value, bytes) else len(value) * value.itemsize
+
+    def get(self, key: Tuple[str, str], load: Callable[[], Any]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+        # Decompress outside the lock; two threads may both load a column, which is harmless.
+        value = load()
+        size = self._sizeof(value)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, size)
+                self.size += size
+            while self.size > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+        return value
+
+    def discard(self, path: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                self.size -= self._entries.pop(key)[1]
+
+column_cache = ColumnCache()
+
+class ArchiveSegment:
+    """Read-only, memory-mapped view of one segment file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a calculation archive segment")
+        (length,) = HEADER_LENGTH.unpack_from(self._mmap, len(MAGIC))
+        start = len(MAGIC) + HEADER_LENGTH.size
+        self.header = json.loads(self._mmap[start:start + length])
+        self._data_offset = start + length
+
+    @property
+    def rows(self) -> int:
+        return self.header["rows"]
+
+    def close(self) -> None:
+        column_cache.discard(self.path)
+        self._mmap.close()
+
+    def user_range(self, user_id: uuid.UUID) -> Optional[Tuple[int, int]]:
+        user = self.header["users"].get(user_id.hex)
+        return (user["start"], user["end"]) if user else None
+
+    def newest_for_user(self, user_id: uuid.UUID) -> Optional[int]:
+        """created_at (microseconds) of the user's newest row here; rows are newest first per user."""
+        bounds = self.user_range(user_id)
+        return self.column("created_at")[bounds[0]] if bounds else None
+
+    def stat_groups(self, user_id: uuid.UUID, exclude: AbstractSet[uuid.UUID] = frozenset()) -> List[list]:
+        """The user's per-type aggregates from the header, recomputed without rows whose id is in exclude."""
+        user = self.header["users"].get(user_id.hex)
+        if user is None:
+            return []
+        if not exclude:
+            return user["groups"]
+        ids = self.column("id")
+        kept = [i for i in range(user["start"], user["end"]) if uuid.UUID(bytes=ids[i * 16:(i + 1) * 16]) not in exclude]
+        if len(kept) == user["end"] - user["start"]:
+            return user["groups"]
+        types, results, valid = self.column("type"), self.column("result"), self.column("result_valid")
+        return stat_groups((self.header["types"][types[i]], results[i] if valid[i] else None) for i in kept)
+
+    def column(self, name: str):
+        return column_cache.get((self.path, name), lambda: self._decode(name))
+
+    def _decode(self, name: str):
+        spec = self.header["columns"][name]
+        start = self._data_offset + spec["offset"]
+        with memoryview(self._mmap)[start:start + spec["length"]] as block:
+            raw = zlib.decompress(block)
+        return raw if name in ("id", "user_id") else _unpack(spec["typecode"], raw)
+
+    def read_rows(self, indexes: List[int]) -> List[Dict[str, Any]]:
+        if not indexes:
+            return []
+        columns = {name: self.column(name) for name in self.header["columns"]}
+        types = self.header["types"]
+        offsets, values = columns["input_offsets"], columns["input_values"]
+        return [
+            {
+                "id": uuid.UUID(bytes=columns["id"][i * 16:(i + 1) * 16]),
+                "user_id": uuid.UUID(bytes=columns["user_id"][i * 16:(i + 1) * 16]),
+                "type": types[columns["type"][i]],
+                "inputs": values[offsets[i]:offsets[i + 1]].tolist(),
+                "result": columns["result"][i] if columns["result_valid"][i] else None,
+                "created_at": from_micros(columns["created_at"][i]),
+                "updated_at": from_micros(columns["updated_at"][i]),
+            }
+            for i in indexes
+        ]
+
+class CalculationArchive:
+    """The set of segment files in a directory, re-scanned when files are added or removed."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.ARCHIVE_DIR
+        self._segments: Dict[str, ArchiveSegment] = {}
+        self._lock = threading.Lock()
+
+    def segments(self) -> List[ArchiveSegment]:
+        try:
+            names = {name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX)}
+        except FileNotFoundError:
+            names = set()
+        with self._lock:
+            for name in set(self._segments) - names:
+                self._segments.pop(name).close()
+            for name in names - set(self._segments):
+                try:
+                    self._segments[name] = ArchiveSegment(os.path.join(self.directory, name))
+                except (OSError, ValueError) as e:
+                    logger.error(f"Skipping unreadable archive segment {name}: {e}")
+            return [self._segments[name] for name in sorted(self._segments)]
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+
+    def count_for_user(self, user_id: uuid.UUID) -> int:
+        return sum(group[1] for segment in self.segments() for group in segment.stat_groups(user_id))
+
+    def stat_groups_for_user(self, user_id: uuid.UUID, exclude: AbstractSet[uuid.UUID] = frozenset()) -> List[list]:
+        return [group for segment in self.segments() for group in segment.stat_groups(user_id, exclude)]
+
+    def newest_for_user(self, user_id: uuid.UUID) -> Optional[datetime]:
+        newest = [micros for segment in self.segments() if (micros := segment.newest_for_user(user_id)) is not None]
+        return from_micros(max(newest)) if newest else None
+
+    def recent_for_user(self, user_id: uuid.UUID, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """The user's archived calculations, newest first, like Calculation.recent_for_user."""
+        candidates = []
+        for segment in self.segments():
+            bounds = segment.user_range(user_id)
+            if bounds is None:
+                continue
+            created = segment.column("created_at")
+            candidates.extend((created[i], i, segment) for i in range(*bounds))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        page = candidates[offset:offset + limit]
+
+        by_segment: Dict[ArchiveSegment, List[int]] = {}
+        for _, index, segment in page:
+            by_segment.setdefault(segment, []).append(index)
+        rows = [row for segment, indexes in by_segment.items() for row in segment.read_rows(indexes)]
+        rows.sort(key=lambda row: row["created_at"], reverse=True)
+        return rows
+
+calculation_archive = CalculationArchive()
+
+def history_for_user(db, user_id: uuid.UUID, limit: int, offset: int = 0,
+                     archive: Optional[CalculationArchive] = None) -> List[Any]:
+    """Recent calculations from the database followed by archived ones once those run out."""
+    archive = archive or calculation_archive
+    calculations = Calculation.recent_for_user(db, user_id, limit, offset)
+    if len(calculations) == limit:
+        return calculations
+    if calculations:
+        hot_total = offset + len(calculations)
+    else:
+        hot_total = db.query(func.count(Calculation.id)).filter(Calculation.user_id == user_id).scalar()
+    archived = archive.recent_for_user(user_id, limit - len(calculations), max(0, offset - hot_total))
+    # A crash between writing a segment and committing the delete leaves rows in both places.
+    seen = {calculation.id for calculation in calculations}
+    return calculations + [row for row in archived if row["id"] not in seen]
+
+def stats_for_user(db, user_id: uuid.UUID, archive: Optional[CalculationArchive] = None) -> Dict[str, Any]:
+    archive = archive or calculation_archive
+    # As in history_for_user, rows left in both places count once, from the database.
+    # Only rows no newer than the newest archived one can be such leftovers, so this
+    # normally reads no ids and the segments' precomputed aggregates are used as is.
+    newest = archive.newest_for_user(user_id)
+    hot_ids = set()
+    if newest is not None:
+        hot_ids = set(db.execute(
+            select(Calculation.id).where(Calculation.user_id == user_id, Calculation.created_at <= newest)
+        ).scalars())
+    groups = list(Calculation.stat_groups_for_user(db, user_id)) + archive.stat_groups_for_user(user_id, hot_ids)
+    return summarize_stat_groups(groups)
+
+def archive_calculations(db, cutoff: datetime, directory: Optional[str] = None,
+                         segment_rows: Optional[int] = None) -> List[str]:
+    """Move calculations created before cutoff into new segment files; returns their paths."""
+    directory = directory or settings.ARCHIVE_DIR
+    segment_rows = segment_rows or settings.ARCHIVE_SEGMENT_ROWS
+    os.makedirs(directory, exist_ok=True)
+    table = Calculation.__table__
+    columns = [table.c.id, table.c.user_id, table.c.type, table.c.inputs,
+               table.c.result, table.c.created_at, table.c.updated_at]
+
+    written = []
+    while True:
+        rows = [
+            dict(row._mapping) for row in db.execute(
+                select(*columns)
+                .where(table.c.created_at < cutoff)
+                .order_by(table.c.created_at, table.c.id)
+                .limit(segment_rows)
+            )
+        ]
+        if not rows:
+            return written
+
+        oldest = rows[0]["created_at"]
+        path = os.path.join(directory, f"calculations-{oldest:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}{SEGMENT_SUFFIX}")
+        write_segment(path, rows)
+        try:
+            ids = [row["id"] for row in rows]
+            for start in range(0, len(ids), 1000):
+                # created_at lets PostgreSQL prune to the partitions being archived.
+                db.execute(table.delete().where(table.c.id.in_(ids[start:start + 1000]), table.c.created_at < cutoff))
+            db.commit()
+        except Exception:
+            db.rollback()
+            os.remove(path)
+            raise
+        logger.info(f"Archived {len(rows)} calculations to {path}")
+        written.append(path)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m app.archive", description="Manage the calculations archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Archive calculations older than the cutoff")
+    run.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    commands.add_parser("list", help="Show archive segments")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+        db = SessionLocal()
+        try:
+            for path in archive_calculations(db, cutoff):
+                print(f"wrote {path}")
+        finally:
+            db.close()
+    else:
+        for segment in calculation_archive.segments():
+            header = segment.header
+            print(f"{os.path.basename(segment.path)}\t{header['rows']}\t"
+                  f"{from_micros(header['created_min']).isoformat()}\t{from_micros(header['created_max']).isoformat()}")
+
+if __name__ == "__main__":
+    main() # pragma: no cover
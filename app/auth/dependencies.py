@@ -1,12 +1,17 @@
 from fastapi import Depends, HTTPException, status
+from uuid import UUID
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import Session
+from app.cache.shared import default_shared_cache, user_cache_key
+from app.config import settings
+from app.database import get_read_db
 from app.models.user import User
 from app.schemas.user import UserResponse
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def get_current_user(
-    db,
+    db: Session = Depends(get_read_db),
     token: str = Depends(oauth2_scheme)
 ) -> UserResponse:
     credentials_exception = HTTPException(
@@ -18,12 +23,34 @@ def get_current_user(
     user_id = User.verify_token(token)
     if user_id is None:
         raise credentials_exception
-    
+
+    # Lets the routing session keep this user's reads on the primary right after a write.
+    db.info["user_id"] = user_id
+    cache = default_shared_cache()
+    if cache is not None:
+        cached = cache.get(user_cache_key(user_id), "user")
+        if cached is not None:
+            return UserResponse.model_validate_json(cached)
+
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise credentials_exception
     
-    return UserResponse.model_validate(user)
+    user_response = UserResponse.model_validate(user)
+    if cache is not None:
+        cache.set(user_cache_key(user_id), user_response.model_dump_json().encode(), settings.SHARED_CACHE_USER_TTL)
+    return user_response
+
+def get_current_user_id(token: str = Depends(oauth2_scheme)) -> UUID:
+    """Resolve the caller from the token alone, for endpoints that can answer without the database."""
+    user_id = User.verify_token(token)
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user_id
 
 def get_current_active_user(
     current_user: UserResponse= Depends(get_current_user)
@@ -33,4 +60,14 @@ def get_current_active_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Inactive user"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+def get_current_admin_user(
+    current_user: UserResponse = Depends(get_current_active_user)
+) -> UserResponse:
+    admins = {value.strip() for value in settings.ADMIN_USER_IDS.split(",") if value.strip()}
+    if str(current_user.id) not in admins:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import DateTime, Uuid, bindparam, cast, column, update, values
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config import settings
+from app.database import Base, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+class LastLoginBuffer:
+    """
+    Coalesces last_login writes in memory and persists them in one batched UPDATE.
+
+    Only the newest timestamp per user is kept, so a hot account costs one row
+    update per flush no matter how often it logs in.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        flush_interval: Optional[float] = None,
+        max_staleness: Optional[float] = None
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = settings.LAST_LOGIN_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.max_staleness = settings.LAST_LOGIN_MAX_STALENESS if max_staleness is None else max_staleness
+        self._pending: Dict[uuid.UUID, datetime] = {}
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.flush_interval > 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, user_id: uuid.UUID, timestamp: datetime) -> None:
+        with self._lock:
+            current = self._pending.get(user_id)
+            if current is None or timestamp > current:
+                self._pending[user_id] = timestamp
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            stale = time.monotonic() - self._oldest >= self.max_staleness
+        if stale:
+            self.flush()
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending, self._oldest = self._pending, {}, None
+        if not pending:
+            return 0
+
+        db = self.session_factory()
+        try:
+            self._write(db, pending)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Failed to flush {len(pending)} last_login updates: {e}")
+            self._requeue(pending)
+            return 0
+        finally:
+            db.close()
+        return len(pending)
+
+    def _write(self, db, pending: Dict[uuid.UUID, datetime]) -> None:
+        users = Base.metadata.tables["users"]
+        if db.get_bind().dialect.name == "postgresql":
+            rows = values(column("id", Uuid), column("last_login", DateTime), name="v").data(list(pending.items()))
+            stmt = (
+                update(users)
+                .where(users.c.id == cast(rows.c.id, Uuid))
+                .values(last_login=rows.c.last_login)
+            )
+            db.execute(stmt)
+        else:
+            stmt = (
+                update(users)
+                .where(users.c.id == bindparam("b_id"))
+                .values(last_login=bindparam("b_last_login"))
+            )
+            db.execute(stmt, [{"b_id": user_id, "b_last_login": ts} for user_id, ts in pending.items()])
+
+    def _requeue(self, pending: Dict[uuid.UUID, datetime]) -> None:
+        with self._lock:
+            for user_id, timestamp in pending.items():
+                current = self._pending.get(user_id)
+                if current is None or timestamp > current:
+                    self._pending[user_id] = timestamp
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="last-login-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+last_login_buffer = LastLoginBuffer()
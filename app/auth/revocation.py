@@ -0,0 +1,241 @@
+import hashlib
+import logging
+import math
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional, Tuple
+
+from jose import JWTError, jwt
+from sqlalchemy import delete, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config import settings
+from app.database import SessionLocal, dialect_insert
+from app.models.revoked_token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Double hashing (Kirsch-Mitzenmacher): k positions from one 128-bit digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class TokenRevocationList:
+    """
+    Per-worker view of revoked_tokens.
+
+    The Bloom filter holds every unexpired revocation and answers "not revoked"
+    for almost all tokens without touching the database. Positives are confirmed
+    against a bounded exact set of recent revocations and, only on a miss there,
+    against the database.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        capacity: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        exact_size: Optional[int] = None
+    ):
+        self.session_factory = session_factory
+        self.capacity = capacity or settings.REVOCATION_BLOOM_CAPACITY
+        self.error_rate = error_rate or settings.REVOCATION_BLOOM_ERROR_RATE
+        self.exact_size = exact_size or settings.REVOCATION_EXACT_SET_SIZE
+        self.bloom = BloomFilter(self.capacity, self.error_rate)
+        self._exact: "OrderedDict[str, Optional[datetime]]" = OrderedDict()
+        self._watermark: Optional[datetime] = None
+        self._last_rebuild = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.database_lookups = 0
+
+    def _remember(self, jti: str, expires_at: Optional[datetime]) -> None:
+        if jti not in self.bloom:
+            self.bloom.add(jti)
+        self._exact[jti] = expires_at
+        self._exact.move_to_end(jti)
+        while len(self._exact) > self.exact_size:
+            self._exact.popitem(last=False)
+
+    def add(self, jti: str, expires_at: Optional[datetime] = None) -> None:
+        with self._lock:
+            self._remember(jti, expires_at)
+
+    def is_revoked(self, jti: str) -> bool:
+        if jti not in self.bloom:
+            return False
+        if jti in self._exact:
+            return True
+
+        # Either a Bloom false positive or a revocation evicted from the exact set.
+        self.database_lookups += 1
+        db = self.session_factory()
+        try:
+            revoked = db.execute(select(RevokedToken.expires_at).where(RevokedToken.jti == jti)).first()
+        except SQLAlchemyError as e:
+            logger.error(f"Revocation lookup failed, treating token as revoked: {e}")
+            return True
+        finally:
+            db.close()
+        if revoked is not None:
+            self.add(jti, revoked.expires_at)
+        return revoked is not None
+
+    def refresh(self) -> int:
+        if time.monotonic() - self._last_rebuild >= settings.REVOCATION_REBUILD_INTERVAL:
+            return self.rebuild()
+
+        now = datetime.utcnow()
+        query = select(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at).where(
+            or_(RevokedToken.expires_at.is_(None), RevokedToken.expires_at > now)
+        )
+        if self._watermark is not None:
+            # revoked_at is stamped before commit, so a revocation can become visible
+            # after later-stamped ones already advanced the watermark. Re-read a
+            # margin behind it; jtis seen before are simply remembered again.
+            overlap = timedelta(seconds=settings.REVOCATION_REFRESH_OVERLAP)
+            query = query.where(RevokedToken.revoked_at >= self._watermark - overlap)
+
+        db = self.session_factory()
+        try:
+            rows = db.execute(query).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            for row in rows:
+                self._remember(row.jti, row.expires_at)
+                if self._watermark is None or row.revoked_at > self._watermark:
+                    self._watermark = row.revoked_at
+            for jti in [jti for jti, expires_at in self._exact.items() if expires_at is not None and expires_at <= now]:
+                del self._exact[jti]
+            overfull = self.bloom.count > self.capacity
+
+        if overfull:
+            self.capacity *= 2
+            return self.rebuild()
+        return len(rows)
+
+    def rebuild(self) -> int:
+        """Reload every unexpired revocation, dropping expired ones from the filter and the table."""
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+            db.commit()
+            rows = db.execute(select(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at)).all()
+        finally:
+            db.close()
+
+        capacity = max(self.capacity, len(rows) * 2)
+        bloom = BloomFilter(capacity, self.error_rate)
+        exact: "OrderedDict[str, Optional[datetime]]" = OrderedDict()
+        for row in sorted(rows, key=lambda row: row.revoked_at):
+            bloom.add(row.jti)
+            exact[row.jti] = row.expires_at
+        while len(exact) > self.exact_size:
+            exact.popitem(last=False)
+
+        with self._lock:
+            self.capacity = capacity
+            self.bloom = bloom
+            self._exact = exact
+            self._watermark = max((row.revoked_at for row in rows), default=None)
+            self._last_rebuild = time.monotonic()
+        return len(rows)
+
+    def _run(self) -> None:
+        while not self._stop.wait(settings.REVOCATION_REFRESH_INTERVAL):
+            try:
+                self.refresh()
+            except SQLAlchemyError as e:
+                logger.error(f"Failed to refresh token revocations: {e}")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        try:
+            self.rebuild()
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to load token revocations: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="token-revocation-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+token_revocations = TokenRevocationList()
+
+def revoke_token(db, jti: str, user_id: Optional[uuid.UUID] = None, expires_at: Optional[datetime] = None) -> None:
+    stmt = dialect_insert(db, RevokedToken).values(
+        jti=jti,
+        user_id=user_id,
+        expires_at=expires_at,
+        revoked_at=datetime.utcnow()
+    ).on_conflict_do_nothing()
+    db.execute(stmt)
+    token_revocations.add(jti, expires_at)
+
+def parse_revocation(value: str) -> Tuple[str, Optional[uuid.UUID], datetime]:
+    """
+    Resolve a CLI argument to (jti, user_id, expires_at).
+
+    An access token carries its own jti, sub and exp. A bare jti has no expiry on
+    record, so it is kept for one full token lifetime, the latest any token issued
+    now could still be valid. Either way rebuild() purges it once it expires.
+    """
+    lifetime = timedelta(minutes=float(settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+    try:
+        claims = jwt.get_unverified_claims(value)
+    except JWTError:
+        return value, None, datetime.utcnow() + lifetime
+    if not claims.get("jti"):
+        raise ValueError("Token has no jti claim and cannot be revoked")
+    try:
+        user_id = uuid.UUID(claims["sub"]) if claims.get("sub") else None
+    except (TypeError, ValueError):
+        user_id = None
+    expires_at = datetime.utcfromtimestamp(claims["exp"]) if "exp" in claims else datetime.utcnow() + lifetime
+    return claims["jti"], user_id, expires_at
+
+def main(values: Iterable[str]) -> None:
+    """Revoke each argument, given as an access token or a bare jti."""
+    db = SessionLocal()
+    try:
+        # Commit each revocation as it is stamped, keeping it inside the refresh overlap.
+        for value in values:
+            jti, user_id, expires_at = parse_revocation(value)
+            revoke_token(db, jti, user_id, expires_at)
+            db.commit()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:]) # pragma: no cover
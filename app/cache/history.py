@@ -0,0 +1,63 @@
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.config import settings
+from app.models.history_version import HistoryVersion
+
+class HistoryCache:
+    """
+    Serialized history/stats responses keyed by (user, kind, params) and tagged
+    with the user's version counter.
+
+    The version lives in the database (HistoryVersion) and every Calculation
+    write bumps it in the writing transaction, so a commit from any worker or
+    process both invalidates cached bodies here and changes the ETag clients
+    revalidate with. ETags are therefore the same in every worker.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.HISTORY_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[Tuple[uuid.UUID, str, str], Tuple[int, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def version(self, db, user_id: uuid.UUID) -> int:
+        return HistoryVersion.current(db, user_id)
+
+    def etag(self, user_id: uuid.UUID, kind: str, params: str, version: int) -> str:
+        return f'"{user_id.hex}-{version}-{kind}-{params}"'
+
+    def get(self, user_id: uuid.UUID, kind: str, params: str, version: int) -> Optional[bytes]:
+        key = (user_id, kind, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, user_id: uuid.UUID, kind: str, params: str, version: int, body: bytes) -> None:
+        key = (user_id, kind, params)
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+history_cache = HistoryCache()
+
+def _opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/"x" (as rewritten by the
+    # compression middleware) still matches "x".
+    if not if_none_match:
+        return False
+    candidates = {_opaque_tag(candidate.strip()) for candidate in if_none_match.split(",")}
+    return "*" in candidates or _opaque_tag(etag) in candidates
@@ -0,0 +1,289 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.config import settings
+from app.metrics import registry
+from app.models.calculation import Calculation
+from app.models.user import User
+
+cache_requests = registry.counter("shared_cache_requests_total", "Shared cache lookups", labels=("namespace", "outcome"))
+cache_evictions = registry.counter("shared_cache_evictions_total", "Live entries overwritten to make room")
+
+MAGIC = b"CALCSHM1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIII")  # magic, version, slot size, slot count, group size
+HEADER_SIZE = mmap.PAGESIZE
+SLOT = struct.Struct("<IQdHI")  # sequence, key hash, expires at (epoch seconds), key length, value length
+SEQUENCE = struct.Struct("<I")
+RESULT = struct.Struct("<d")
+READ_ATTEMPTS = 4
+
+def key_hash(key: bytes) -> int:
+    # 0 marks an empty slot.
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+def default_path() -> str:
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"calculator-cache-{os.getuid()}")
+
+class SharedMemoryCache:
+    """
+    Fixed-size hash table in a memory-mapped file shared by every worker on the host.
+
+    Keys hash to a group of group_size slots and live only in that group, so
+    memory never grows and a write touches one group. Writers serialize per
+    group through striped locks (an fcntl byte-range lock across processes,
+    plus a threading lock, since fcntl locks are per process). Readers take no
+    lock: each slot carries a sequence number that writers make odd while the
+    slot is being rewritten, and a read that sees it odd or changed is retried
+    and then treated as a miss. When a group is full, the entry closest to
+    expiry is evicted.
+    """
+
+    def __init__(self, path: str, size: int, slot_size: int = 512, group_size: int = 8, stripes: int = 256):
+        self.path = path
+        self.slot_size = slot_size
+        self.group_size = group_size
+        self.slot_count = max(group_size, (size - HEADER_SIZE) // slot_size // group_size * group_size)
+        self.groups = self.slot_count // group_size
+        self.stripes = min(stripes, HEADER_SIZE, self.groups)
+        self.capacity = slot_size - SLOT.size
+        self._thread_locks = [threading.Lock() for _ in range(self.stripes)]
+        self._file_size = HEADER_SIZE + self.slot_count * slot_size
+
+        # The file is named after its layout and never resized or rewritten once
+        # created: other workers may have it mapped, and truncating a mapped file
+        # kills them with SIGBUS on their next access. New settings or a new
+        # VERSION (e.g. a rolling restart) therefore get a new file.
+        self.file_path = f"{path}-v{VERSION}-{slot_size}-{self.slot_count}-{group_size}"
+        expected = HEADER.pack(MAGIC, VERSION, slot_size, self.slot_count, group_size)
+        # Serialize concurrently starting workers so they agree on one file.
+        lock_fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(lock_fd, fcntl.LOCK_EX)
+            self._fd = self._open_file(expected)
+            self._remove_other_layouts(path)
+        finally:
+            os.close(lock_fd)
+        self._mmap = mmap.mmap(self._fd, self._file_size)
+
+    def _open_file(self, expected: bytes) -> int:
+        try:
+            fd = os.open(self.file_path, os.O_RDWR)
+        except FileNotFoundError:
+            fd = None
+        if fd is not None:
+            if os.fstat(fd).st_size == self._file_size and os.pread(fd, HEADER.size, 0) == expected:
+                return fd
+            os.close(fd)
+        # Missing or damaged: build a new file and rename it into place, which leaves
+        # any existing mapping of the old one intact.
+        temporary = f"{self.file_path}.{os.getpid()}.tmp"
+        fd = os.open(temporary, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, self._file_size)
+            os.pwrite(fd, expected, 0)
+            os.replace(temporary, self.file_path)
+        except OSError:
+            os.close(fd)
+            raise
+        return fd
+
+    def _remove_other_layouts(self, path: str) -> None:
+        # Unlinking only drops the name: workers still using an old layout keep
+        # their mapping, and its memory is freed when the last of them exits.
+        directory, prefix = os.path.split(f"{path}-v")
+        for name in os.listdir(directory or "."):
+            other = os.path.join(directory, name)
+            if name.startswith(prefix) and not name.endswith(".tmp") and other != self.file_path:
+                try:
+                    os.unlink(other)
+                except FileNotFoundError:
+                    pass
+
+    def close(self) -> None:
+        self._mmap.close()
+        os.close(self._fd)
+
+    def _slots(self, hashed: int) -> range:
+        first = HEADER_SIZE + (hashed % self.groups) * self.group_size * self.slot_size
+        return range(first, first + self.group_size * self.slot_size, self.slot_size)
+
+    def _stripe(self, hashed: int) -> int:
+        return (hashed % self.groups) % self.stripes
+
+    @contextmanager
+    def _lock(self, stripe: int):
+        with self._thread_locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def get(self, key: bytes, namespace: str = "") -> Optional[bytes]:
+        hashed = key_hash(key)
+        now = time.time()
+        for offset in self._slots(hashed):
+            for _ in range(READ_ATTEMPTS):
+                sequence, slot_hash, expires_at, key_length, value_length = SLOT.unpack_from(self._mmap, offset)
+                if sequence & 1:
+                    continue
+                if slot_hash != hashed:
+                    break
+                length = min(key_length + value_length, self.capacity)
+                data = self._mmap[offset + SLOT.size:offset + SLOT.size + length]
+                if SEQUENCE.unpack_from(self._mmap, offset)[0] != sequence:
+                    continue
+                if data[:key_length] == key and expires_at > now:
+                    cache_requests.inc(namespace=namespace, outcome="hit")
+                    return data[key_length:]
+                break
+        cache_requests.inc(namespace=namespace, outcome="miss")
+        return None
+
+    def _write_slot(self, offset: int, hashed: int, expires_at: float, key: bytes, value: bytes) -> None:
+        sequence = SEQUENCE.unpack_from(self._mmap, offset)[0]
+        SEQUENCE.pack_into(self._mmap, offset, (sequence + 1) & 0xFFFFFFFF)
+        self._mmap[offset + SLOT.size:offset + SLOT.size + len(key) + len(value)] = key + value
+        SLOT.pack_into(self._mmap, offset, (sequence + 1) & 0xFFFFFFFF, hashed, expires_at, len(key), len(value))
+        SEQUENCE.pack_into(self._mmap, offset, (sequence + 2) & 0xFFFFFFFF)
+
+    def set(self, key: bytes, value: bytes, ttl: float) -> bool:
+        """Store value for ttl seconds; returns False when key + value do not fit in a slot."""
+        if len(key) + len(value) > self.capacity:
+            return False
+        hashed = key_hash(key)
+        now = time.time()
+        with self._lock(self._stripe(hashed)):
+            target, target_expiry = None, None
+            for offset in self._slots(hashed):
+                _, slot_hash, expires_at, key_length, _ = SLOT.unpack_from(self._mmap, offset)
+                if slot_hash == hashed and self._mmap[offset + SLOT.size:offset + SLOT.size + key_length] == key:
+                    target, target_expiry = offset, 0.0
+                    break
+                if slot_hash == 0 or expires_at <= now:
+                    expires_at = 0.0
+                if target is None or expires_at < target_expiry:
+                    target, target_expiry = offset, expires_at
+            if target_expiry > now:
+                cache_evictions.inc()
+            self._write_slot(target, hashed, now + ttl, key, value)
+        return True
+
+    def delete(self, key: bytes) -> bool:
+        hashed = key_hash(key)
+        with self._lock(self._stripe(hashed)):
+            for offset in self._slots(hashed):
+                _, slot_hash, _, key_length, _ = SLOT.unpack_from(self._mmap, offset)
+                if slot_hash == hashed and self._mmap[offset + SLOT.size:offset + SLOT.size + key_length] == key:
+                    self._write_slot(offset, 0, 0.0, b"", b"")
+                    return True
+        return False
+
+    def clear(self) -> None:
+        for stripe in range(self.stripes):
+            with self._lock(stripe):
+                for group in range(stripe, self.groups, self.stripes):
+                    first = HEADER_SIZE + group * self.group_size * self.slot_size
+                    for offset in range(first, first + self.group_size * self.slot_size, self.slot_size):
+                        if SLOT.unpack_from(self._mmap, offset)[1]:
+                            self._write_slot(offset, 0, 0.0, b"", b"")
+
+    def keys(self) -> List[bytes]:
+        """Live keys (for diagnostics; not a consistent snapshot)."""
+        now = time.time()
+        found = []
+        for offset in range(HEADER_SIZE, self._file_size, self.slot_size):
+            _, slot_hash, expires_at, key_length, _ = SLOT.unpack_from(self._mmap, offset)
+            if slot_hash and expires_at > now:
+                found.append(self._mmap[offset + SLOT.size:offset + SLOT.size + key_length])
+        return found
+
+_shared_cache: Optional[SharedMemoryCache] = None
+_init_lock = threading.Lock()
+
+def default_shared_cache() -> Optional[SharedMemoryCache]:
+    """The host-wide cache, opened on first use; None when SHARED_CACHE_ENABLED is off."""
+    global _shared_cache
+    if not settings.SHARED_CACHE_ENABLED:
+        return None
+    if _shared_cache is None:
+        with _init_lock:
+            if _shared_cache is None:
+                _shared_cache = SharedMemoryCache(
+                    settings.SHARED_CACHE_PATH or default_path(),
+                    settings.SHARED_CACHE_SIZE_MB * 1024 * 1024,
+                    slot_size=settings.SHARED_CACHE_SLOT_SIZE
+                )
+    return _shared_cache
+
+def user_cache_key(user_id: uuid.UUID) -> bytes:
+    return b"user:" + user_id.bytes
+
+def result_cache_key(calculation_type: str, inputs: List[float]) -> bytes:
+    # A little-endian float64 array (binary request bodies) already is the packed form.
+    packed = inputs.tobytes() if hasattr(inputs, "tobytes") else struct.pack(f"<{len(inputs)}d", *inputs)
+    digest = hashlib.blake2b(packed, digest_size=16).digest()
+    return b"result:" + calculation_type.encode() + b":" + digest
+
+def memoized_result(calculation: Calculation, values=None) -> float:
+    """
+    calculation.get_result(), shared across workers for inputs of at least
+    SHARED_CACHE_MIN_INPUTS numbers; below that, hashing the inputs costs about
+    as much as the arithmetic. Errors are never cached.
+
+    values, the inputs as a little-endian float64 array, is hashed and computed
+    on directly (app.operations.vectorized.array_result) instead of the list.
+    """
+    if values is None:
+        inputs, compute = calculation.inputs, calculation.get_result
+    else:
+        from app.operations.vectorized import array_result
+        inputs, compute = values, lambda: array_result(calculation.type, values)
+    cache = default_shared_cache()
+    if cache is None or (values is None and not isinstance(inputs, list)) or len(inputs) < settings.SHARED_CACHE_MIN_INPUTS:
+        return compute()
+    try:
+        key = result_cache_key(calculation.type, inputs)
+    except (struct.error, TypeError):
+        return compute()
+    cached = cache.get(key, "result")
+    if cached is not None:
+        return RESULT.unpack(cached)[0]
+    result = compute()
+    cache.set(key, RESULT.pack(result), settings.SHARED_CACHE_RESULT_TTL)
+    return result
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _forget_user(mapper, connection, target):
+    # Evicted once the change commits: evicting at flush would let a concurrent
+    # lookup re-cache the still-committed row. Other writers (bulk UPDATEs, other
+    # hosts) are bounded by SHARED_CACHE_USER_TTL instead.
+    session = object_session(target)
+    if session is not None and target.id is not None:
+        session.info.setdefault("forget_users", set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _forget_committed_users(session):
+    user_ids = session.info.pop("forget_users", None)
+    if user_ids and _shared_cache is not None:
+        for user_id in user_ids:
+            _shared_cache.delete(user_cache_key(user_id))
+
+@event.listens_for(Session, "after_soft_rollback")
+def _keep_rolled_back_users(session, previous_transaction):
+    session.info.pop("forget_users", None)
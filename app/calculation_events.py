@@ -0,0 +1,306 @@
+"""
+Live calculation changes for GET /calculations/events (Server-Sent Events).
+
+    python -m app.calculation_events install-trigger
+
+On PostgreSQL a trigger on calculations NOTIFYs the calculation_events channel
+for every inserted or updated row. NOTIFY is transactional, so events arrive
+only for committed changes, whichever process or statement made them (ORM
+flushes, bulk updates, the write-behind buffer, job workers). Each worker keeps
+one LISTEN connection, watched by the event loop, and fans events out to the
+streams of the user they belong to: one push instead of every dashboard
+polling the database. The trigger is created with the table; install-trigger
+adds it to an existing database.
+
+On other backends there is no NOTIFY; changes committed through the ORM in
+this process are published directly instead.
+"""
+import argparse
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Set
+
+from anyio import to_thread
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, object_session
+
+from app.config import settings
+from app.metrics import registry
+from app.models.types import CALCULATION_TYPE_NAMES
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "calculation_events"
+
+# Inputs are left out: a NOTIFY payload is limited to 8000 bytes. Clients that
+# need them fetch GET /calculations/{id}.
+NOTIFY_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION notify_calculation_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANNEL}', json_build_object(
+        'op', lower(TG_OP),
+        'id', NEW.id,
+        'user_id', NEW.user_id,
+        'type', NEW.type,
+        'result', NEW.result,
+        'created_at', NEW.created_at,
+        'updated_at', NEW.updated_at
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+NOTIFY_TRIGGER = (
+    "CREATE TRIGGER calculations_notify AFTER INSERT OR UPDATE ON calculations "
+    "FOR EACH ROW EXECUTE FUNCTION notify_calculation_change()"
+)
+
+stream_clients = registry.gauge("sse_clients", "Event streams open on this worker")
+events_delivered = registry.counter("sse_events_total", "Calculation events queued to event streams")
+events_dropped = registry.counter("sse_events_dropped_total", "Events dropped because a stream fell SSE_QUEUE_SIZE behind")
+listener_reconnects = registry.counter("sse_listener_reconnects_total", "Times the LISTEN connection was lost")
+
+def install_notify_trigger(connection) -> bool:
+    """Create (or replace) the NOTIFY trigger on calculations; returns False on backends without NOTIFY."""
+    if connection.dialect.name != "postgresql":
+        return False
+    connection.execute(text(NOTIFY_FUNCTION))
+    connection.execute(text("DROP TRIGGER IF EXISTS calculations_notify ON calculations"))
+    connection.execute(text(NOTIFY_TRIGGER))
+    return True
+
+def create_notify_trigger(target, connection, **kwargs) -> None:
+    install_notify_trigger(connection)
+
+def event_payload(target, op: str) -> dict:
+    """The event for a calculation, in the same shape as the trigger's payload."""
+    return {
+        "op": op,
+        "id": str(target.id),
+        "user_id": str(target.user_id),
+        "type": target.type,
+        "result": target.result,
+        "created_at": target.created_at.isoformat() if target.created_at else None,
+        "updated_at": target.updated_at.isoformat() if target.updated_at else None,
+    }
+
+def format_event(data: dict) -> str:
+    name = "resync" if data.get("op") == "resync" else "calculation"
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+class CalculationEventHub:
+    """
+    Fans calculation events out to this worker's event streams.
+
+    Every stream has a bounded queue; when a client can't keep up the oldest
+    events are dropped rather than letting memory grow. After the LISTEN
+    connection is re-established every stream gets a resync event, since
+    changes committed while it was down were never delivered.
+    """
+
+    def __init__(self, queue_size: Optional[int] = None, max_clients: Optional[int] = None,
+                 listen: Optional[bool] = None):
+        self.queue_size = settings.SSE_QUEUE_SIZE if queue_size is None else queue_size
+        self.max_clients = settings.SSE_MAX_CLIENTS if max_clients is None else max_clients
+        # None: LISTEN when the app's database is PostgreSQL.
+        self.listen = listen
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._clients = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+        stream_clients.set_function(lambda: self._clients)
+
+    @property
+    def clients(self) -> int:
+        return self._clients
+
+    def full(self) -> bool:
+        return self._clients >= self.max_clients
+
+    def has_subscribers(self, user_id) -> bool:
+        return str(user_id) in self._subscribers
+
+    def _uses_listen(self) -> bool:
+        if self.listen is None:
+            from app.database import default_engine
+            self.listen = default_engine().dialect.name == "postgresql"
+        return self.listen
+
+    def subscribe(self, user_id) -> asyncio.Queue:
+        """Register a stream for user_id; must be called on the event loop."""
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(str(user_id), set()).add(queue)
+        self._clients += 1
+        if self._listener is None and self._uses_listen():
+            self._listener = self._loop.create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, user_id, queue: asyncio.Queue) -> None:
+        key = str(user_id)
+        queues = self._subscribers.get(key)
+        if queues is None or queue not in queues:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[key]
+        self._clients -= 1
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, item) -> None:
+        if queue.full():
+            queue.get_nowait()
+            events_dropped.inc()
+        queue.put_nowait(item)
+
+    def publish(self, data: dict) -> None:
+        """Queue an event to every stream of its user; must be called on the event loop."""
+        queues = self._subscribers.get(data.get("user_id"))
+        if not queues:
+            return
+        for queue in queues:
+            self._put(queue, data)
+        events_delivered.inc(len(queues))
+
+    def publish_threadsafe(self, events: List[dict]) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        for data in events:
+            loop.call_soon_threadsafe(self.publish, data)
+
+    def _broadcast(self, item) -> None:
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._put(queue, item)
+
+    def record(self, connection, target, op: str) -> None:
+        """Remember an ORM change to publish when its session commits (backends without NOTIFY)."""
+        if connection.dialect.name == "postgresql" or not self.has_subscribers(target.user_id):
+            return
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault("calculation_events", []).append(event_payload(target, op))
+
+    def _dispatch(self, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed calculation event: {payload[:200]}")
+            return
+        data["type"] = CALCULATION_TYPE_NAMES.get(data.get("type"), data.get("type"))
+        self.publish(data)
+
+    def _connect(self):
+        """A DBAPI (psycopg2) connection of its own, outside the pool, listening on CHANNEL."""
+        from app.database import default_engine
+        engine = default_engine()
+        args, kwargs = engine.dialect.create_connect_args(engine.url)
+        connection = engine.dialect.connect(*args, **kwargs)
+        connection.autocommit = True
+        cursor = connection.cursor()
+        cursor.execute(f"LISTEN {CHANNEL}")
+        cursor.close()
+        return connection
+
+    async def _listen(self) -> None:
+        loop = asyncio.get_running_loop()
+        delay = 1.0
+        connected_before = False
+        while True:
+            try:
+                connection = await to_thread.run_sync(self._connect)
+            except Exception as e:
+                logger.warning(f"Could not LISTEN for calculation events, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            delay = 1.0
+            if connected_before:
+                self._broadcast({"op": "resync"})
+            connected_before = True
+
+            readable = asyncio.Event()
+            fd = connection.fileno()
+            loop.add_reader(fd, readable.set)
+            try:
+                while True:
+                    await readable.wait()
+                    readable.clear()
+                    connection.poll()
+                    while connection.notifies:
+                        self._dispatch(connection.notifies.pop(0).payload)
+            except Exception as e:
+                listener_reconnects.inc()
+                logger.warning(f"Lost the calculation event connection: {e}")
+            finally:
+                loop.remove_reader(fd)
+                connection.close()
+
+    async def stream(self, user_id):
+        """The text/event-stream body for one client; ends when the streams are closed."""
+        queue = self.subscribe(user_id)
+        try:
+            yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if data is None:
+                    return
+                yield format_event(data)
+        finally:
+            self.unsubscribe(user_id, queue)
+
+    def close_streams(self) -> None:
+        """
+        End every open stream; must be called on the event loop.
+
+        The server calls this as soon as it starts shutting down: it waits for
+        open responses before running the lifespan shutdown, and an event
+        stream would otherwise hold it for the whole graceful timeout.
+        """
+        self._broadcast(None)
+
+    async def stop(self) -> None:
+        """Close the LISTEN connection and end every open stream."""
+        self.close_streams()
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+calculation_events = CalculationEventHub()
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_changes(session):
+    events = session.info.pop("calculation_events", None)
+    if events:
+        calculation_events.publish_threadsafe(events)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back_changes(session, previous_transaction):
+    session.info.pop("calculation_events", None)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.database import engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.calculation_events", description="Manage calculation change notifications")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("install-trigger", help="Create or replace the NOTIFY trigger on calculations")
+    parser.parse_args(argv)
+
+    with engine.begin() as connection:
+        if install_notify_trigger(connection):
+            print("installed calculations_notify")
+        else:
+            print(f"{connection.dialect.name} has no LISTEN/NOTIFY; events are published in-process")
+
+if __name__ == "__main__":
+    main() # pragma: no cover
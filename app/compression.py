@@ -0,0 +1,68 @@
+"""Content-Encoding negotiation plus one-shot and streaming compressors."""
+import gzip
+import zlib
+from typing import Iterable, Optional
+
+import brotli
+
+def available_encodings() -> tuple:
+    """Supported encodings in server preference order."""
+    return ("br", "gzip")
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """
+    Pick the first of available (server preference order) the client accepts, or
+    None for identity. Honours q-values, including q=0 and "*".
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if level is None else level)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+class StreamCompressor:
+    """Incremental gzip/brotli compressor: feed chunks, flush each so clients can decode as they arrive."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            raise ValueError(f"Unsupported content encoding: {encoding}")
+
+    def compress(self, chunk: bytes, flush: bool = True) -> bytes:
+        if self.encoding == "gzip":
+            data = self._compressor.compress(chunk)
+            return data + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else data
+        data = self._compressor.process(chunk)
+        return data + self._compressor.flush() if flush else data
+
+    def finish(self, chunk: bytes = b"") -> bytes:
+        if self.encoding == "gzip":
+            return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_FINISH)
+        return self._compressor.process(chunk) + self._compressor.finish()
@@ -1,12 +1,41 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import SQLAlchemyError
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.exc import InterfaceError, OperationalError, SQLAlchemyError
+from sqlalchemy.sql import Select
 
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
+def configure_sqlite(engine: Engine) -> None:
+    """Tune SQLite for a single-node server: WAL for concurrent readers, fewer fsyncs, mmap reads."""
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
 def get_engine(database_url: str = settings.DATABASE_URL):
     try:
-        engine = create_engine(database_url, echo=True)
+        if database_url.startswith("sqlite"):
+            # Sessions are handed between the event loop and threadpool threads.
+            engine = create_engine(database_url, echo=True, connect_args={"check_same_thread": False})
+            configure_sqlite(engine)
+        else:
+            engine = create_engine(database_url, echo=True)
         return engine
     except SQLAlchemyError as e:
         print(f"Error creating engine: {e}")
@@ -19,14 +48,261 @@ def get_sessionmaker(engine):
         bind=engine
     )
 
-engine = get_engine()
-SessionLocal = get_sessionmaker(engine)
+class ReplicaRouter:
+    """
+    Chooses the engine for read-only work.
+
+    Replicas are used round-robin while they are up and within max_lag seconds
+    of the primary. After a user's write commits, that user's reads stay on the
+    primary for sticky_seconds so they always see their own writes. With a
+    shared store (the host-wide cache) the other workers on the host honour
+    that too, so the next request needn't land on the worker that wrote.
+    """
+
+    def __init__(self, primary: Engine, replicas: List[Engine], sticky_seconds: float = 5.0,
+                 max_lag: float = 5.0, down_seconds: float = 30.0, shared=None):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        self.shared = shared
+        self.max_lag = max_lag
+        self.down_seconds = down_seconds
+        self._down_until: Dict[Engine, float] = {}
+        self._lag: Dict[Engine, float] = {}
+        self._recent_writes: Dict[object, float] = {}
+        self._counter = itertools.count()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        for replica in self.replicas:
+            event.listen(replica, "handle_error", self._on_replica_error)
+
+    def healthy_replicas(self) -> List[Engine]:
+        now = time.monotonic()
+        return [
+            replica for replica in self.replicas
+            if self._down_until.get(replica, 0) <= now and self._lag.get(replica, 0) <= self.max_lag
+        ]
+
+    def reader(self, sticky_key=None) -> Engine:
+        if sticky_key is not None and self.is_sticky(sticky_key):
+            return self.primary
+        replicas = self.healthy_replicas()
+        if not replicas:
+            return self.primary
+        return replicas[next(self._counter) % len(replicas)]
+
+    @staticmethod
+    def _shared_key(key) -> bytes:
+        return b"sticky:" + str(key).encode()
+
+    def note_write(self, key) -> None:
+        now = time.monotonic()
+        self._recent_writes[key] = now + self.sticky_seconds
+        if len(self._recent_writes) > 10000:
+            self._recent_writes = {k: v for k, v in self._recent_writes.items() if v > now}
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), b"", self.sticky_seconds)
+
+    def is_sticky(self, key) -> bool:
+        if self._recent_writes.get(key, 0) > time.monotonic():
+            return True
+        return self.shared is not None and self.shared.get(self._shared_key(key), "sticky") is not None
+
+    def mark_down(self, replica: Engine) -> None:
+        self._down_until[replica] = time.monotonic() + self.down_seconds
+
+    def _on_replica_error(self, context) -> None:
+        if context.is_disconnect or context.connection is None:
+            logger.warning(f"Replica {context.engine.url!r} failed, routing reads to other nodes")
+            self.mark_down(context.engine)
+
+    def measure_lag(self, replica: Engine) -> float:
+        with replica.connect() as connection:
+            if replica.dialect.name != "postgresql":
+                connection.execute(text("SELECT 1"))
+                return 0.0
+            return connection.execute(text(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            )).scalar()
+
+    def check_health(self) -> None:
+        for replica in self.replicas:
+            try:
+                self._lag[replica] = float(self.measure_lag(replica))
+                self._down_until.pop(replica, None)
+            except SQLAlchemyError as e:
+                logger.warning(f"Replica {replica.url!r} health check failed: {e}")
+                self.mark_down(replica)
+
+    def _run(self) -> None:
+        while not self._stop.wait(settings.REPLICA_HEALTH_CHECK_INTERVAL):
+            self.check_health()
+
+    def start(self) -> None:
+        if not self.replicas or self._thread is not None:
+            return
+        self.check_health()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-health-check", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+class RoutingSession(Session):
+    """
+    Session for read-only request handlers: plain SELECTs go to a replica, anything
+    else (flushes, DML, SELECT ... FOR UPDATE, raw SQL) goes to the primary.
+
+    Set info["user_id"] to enable read-your-writes stickiness for that user. A
+    read that fails on a replica is retried on the primary, which then serves
+    the rest of the session.
+    """
+
+    def __init__(self, router: Optional[ReplicaRouter] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        router = self.router
+        if router is None or not router.replicas:
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if (
+            self._flushing
+            or self.info.get("wrote")
+            or self.info.get("replica_failed")
+            or not isinstance(clause, Select)
+            or clause._for_update_arg is not None
+        ):
+            return router.primary
+        return router.reader(self.info.get("user_id"))
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _retry_failed_replica_reads(orm_execute_state):
+    session = orm_execute_state.session
+    if session.router is None or not orm_execute_state.is_select or "bind" in orm_execute_state.bind_arguments:
+        return None
+    bind = session.get_bind(**orm_execute_state.bind_arguments)
+    if bind is session.router.primary:
+        return None
+    try:
+        return orm_execute_state.invoke_statement(bind_arguments={"bind": bind})
+    except (OperationalError, InterfaceError) as e:
+        # Connection loss, recovery conflicts, replica statement timeouts: the primary can answer.
+        logger.warning(f"Read on replica {bind.url!r} failed, retrying on the primary: {e}")
+        session.info["replica_failed"] = True
+        return orm_execute_state.invoke_statement(bind_arguments={"bind": session.router.primary})
+
+def replica_urls(value) -> List[str]:
+    if not isinstance(value, str):
+        return []
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+class LazySessionmaker(sessionmaker):
+    """sessionmaker whose bind (and other arguments) are resolved when the first session is made."""
+
+    def __init__(self, resolve: Callable[[], Dict[str, Any]], **kwargs):
+        super().__init__(**kwargs)
+        self._resolve = resolve
+
+    def __call__(self, **local_kw):
+        if self._resolve is not None:
+            self.configure(**self._resolve())
+            self._resolve = None
+        return super().__call__(**local_kw)
+
+# The engine and replica router are created on first use rather than at import,
+# so importing the app (tests, CLI commands, each worker before it forks) does
+# not load a database driver or build connection pools it may never use.
+_engine: Optional[Engine] = None
+_replica_router: Optional[ReplicaRouter] = None
+_init_lock = threading.Lock()
+
+def default_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _init_lock:
+            if _engine is None:
+                _engine = get_engine()
+    return _engine
+
+def default_replica_router() -> ReplicaRouter:
+    global _replica_router
+    if _replica_router is None:
+        from app.cache.shared import default_shared_cache
+        primary = default_engine()
+        with _init_lock:
+            if _replica_router is None:
+                replicas = [get_engine(url) for url in replica_urls(settings.DATABASE_REPLICA_URLS)]
+                _replica_router = ReplicaRouter(
+                    primary,
+                    replicas,
+                    sticky_seconds=settings.REPLICA_STICKY_SECONDS,
+                    max_lag=settings.REPLICA_MAX_LAG,
+                    shared=default_shared_cache() if replicas else None
+                )
+    return _replica_router
+
+def __getattr__(name: str):
+    if name == "engine":
+        return default_engine()
+    if name == "replica_router":
+        return default_replica_router()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+SessionLocal = LazySessionmaker(
+    lambda: {"bind": default_engine()},
+    autocommit=False,
+    autoflush=False
+)
+ReadSessionLocal = LazySessionmaker(
+    lambda: {"bind": default_engine(), "router": default_replica_router()},
+    class_=RoutingSession,
+    autocommit=False,
+    autoflush=False
+)
+
+@event.listens_for(Session, "after_flush")
+def _mark_session_wrote(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_statement_wrote(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(Session, "after_commit")
+def _note_committed_write(session):
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        router = getattr(session, "router", None) or default_replica_router()
+        router.note_write(session.info["user_id"])
 
 Base = declarative_base()
 
+def dialect_insert(db, model):
+    """Return an INSERT construct that supports ON CONFLICT for the session's (or connection's) backend."""
+    bind = db.get_bind() if isinstance(db, Session) else db
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"ON CONFLICT inserts are not supported on {dialect}")
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,11 +1,12 @@
-from app.database import engine
+from app.database import default_engine
+from app.models.job import CalculationJob  # noqa: F401 (registers calculation_jobs)
 from app.models.user import Base
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=default_engine())
 
 def drop_db():
-    Base.metadata.drop_all(bind=engine)
+    Base.metadata.drop_all(bind=default_engine())
 
 if __name__ == "__main__":
     init_db() # pragma: no cover
\ No newline at end of file
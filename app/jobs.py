@@ -0,0 +1,161 @@
+"""
+Background job workers for POST /jobs.
+
+    python -m app.jobs worker [--processes N]
+
+Each process claims one job at a time, evaluates it through the Calculation
+subclasses, stores the result as a calculation and records it on the job. The
+workers run at a lower CPU priority (JOB_WORKER_NICE) so that, on a host shared
+with the API, interactive requests win.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import registry
+from app.models.calculation import Calculation
+from app.models.job import CalculationJob
+
+logger = logging.getLogger(__name__)
+
+job_seconds = registry.histogram("job_run_seconds", "Time spent evaluating one job", labels=("type",))
+job_outcomes = registry.counter("job_outcomes_total", "Finished job attempts", labels=("outcome",))
+
+class JobWorker:
+    """Claims and runs jobs until stopped; run_once is the unit of work (and what tests drive)."""
+
+    def __init__(self, session_factory: Callable = SessionLocal, poll_interval: Optional[float] = None,
+                 worker_id: Optional[str] = None):
+        self.session_factory = session_factory
+        self.poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._last_recovery = 0.0
+
+    def stop(self, *args) -> None:
+        self._stop.set()
+
+    def run_once(self) -> Optional[CalculationJob]:
+        """Run the next runnable job, if any; returns it in its final state for this attempt."""
+        db = self.session_factory()
+        try:
+            if time.monotonic() - self._last_recovery >= settings.JOB_LEASE_SECONDS / 4:
+                self._last_recovery = time.monotonic()
+                recovered = CalculationJob.requeue_expired(db)
+                if recovered:
+                    logger.warning(f"Recovered {recovered} jobs from workers that stopped")
+            job = CalculationJob.claim(db, self.worker_id)
+            if job is None:
+                return None
+            self._run(db, job)
+            return job
+        finally:
+            db.close()
+
+    def _keep_lease(self, job_id, done: threading.Event) -> None:
+        """Renew the lease on job_id every quarter lease until done is set, so a long job isn't requeued under us."""
+        while not done.wait(settings.JOB_LEASE_SECONDS / 4):
+            db = self.session_factory()
+            try:
+                if not CalculationJob.renew_lease(db, job_id, self.worker_id):
+                    logger.warning(f"Job worker {self.worker_id} lost the lease on job {job_id}")
+                    return
+            except SQLAlchemyError as e:
+                logger.error(f"Job worker {self.worker_id} could not renew the lease on job {job_id}: {e}")
+            finally:
+                db.close()
+
+    def _finish(self, db, job: CalculationJob, released: bool, outcome: str) -> None:
+        if released:
+            db.commit()
+            job_outcomes.inc(outcome=outcome)
+        else:
+            # The lease ran out and the job went back to the queue: whatever this attempt did is dropped.
+            db.rollback()
+            logger.warning(f"Job {job.id} was requeued before worker {self.worker_id} finished it")
+            job_outcomes.inc(outcome="lost")
+
+    def _run(self, db, job: CalculationJob) -> None:
+        started = time.perf_counter()
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._keep_lease, args=(job.id, done), name=f"job-lease-{job.id}", daemon=True)
+        heartbeat.start()
+        try:
+            calculation = Calculation.create_calculation(job.type, job.user_id, job.inputs)
+            calculation.result = calculation.get_result()
+            db.add(calculation)
+            db.flush()
+            self._finish(db, job, job.succeed(db, self.worker_id, calculation.result, calculation.id), "succeeded")
+        except ValueError as e:
+            # Invalid inputs fail the same way every time: no retry.
+            db.rollback()
+            self._finish(db, job, job.fail(db, self.worker_id, str(e), retry=False), "invalid")
+        except Exception as e:
+            logger.exception(f"Job {job.id} failed on attempt {job.attempts}")
+            db.rollback()
+            released = job.fail(db, self.worker_id, f"{type(e).__name__}: {e}", retry=True)
+            self._finish(db, job, released, "retried" if job.status == "queued" else "failed")
+        finally:
+            done.set()
+            heartbeat.join()
+            job_seconds.observe(time.perf_counter() - started, type=job.type)
+
+    def run(self) -> None:
+        logger.info(f"Job worker {self.worker_id} started")
+        while not self._stop.is_set():
+            try:
+                job = self.run_once()
+            except SQLAlchemyError as e:
+                logger.error(f"Job worker {self.worker_id} could not reach the database: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+        logger.info(f"Job worker {self.worker_id} stopped")
+
+def run_worker_process() -> None:
+    if settings.JOB_WORKER_NICE and hasattr(os, "nice"):
+        os.nice(settings.JOB_WORKER_NICE)
+    worker = JobWorker()
+    # Finish the current job, then exit.
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.jobs", description="Run background calculation jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="Claim and run jobs until stopped")
+    worker.add_argument("--processes", type=int, default=settings.JOB_WORKER_PROCESSES)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(name)s - %(message)s")
+    if args.processes <= 1:
+        run_worker_process()
+        return
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker_process, name=f"job-worker-{i}") for i in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+if __name__ == "__main__":
+    main() # pragma: no cover
@@ -0,0 +1,254 @@
+"""
+Production launcher: imports the app once, then forks the workers.
+
+    python -m app.launcher [--host 0.0.0.0] [--port 8000] [--workers N]
+
+Unlike `uvicorn --workers`, which spawns fresh interpreters that each import
+everything again, the workers are forked from a parent that has already
+imported main and pre-rendered the UI, so they share those pages copy-on-write.
+The parent then only supervises: it replaces workers that exit, whether they
+crashed or retired after WORKER_MAX_REQUESTS requests or WORKER_MAX_MEMORY_MB
+of private memory, and forwards SIGTERM/SIGINT for a graceful shutdown.
+"""
+import argparse
+import gc
+import importlib.util
+import logging
+import os
+import random
+import resource
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import uvicorn
+
+from app.calculation_events import calculation_events
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting is most likely failing on
+# start-up (e.g. the database is down), so its replacement waits a little.
+MIN_WORKER_LIFETIME = 1.0
+
+def available_cpus(cgroup_root: str = "/sys/fs/cgroup") -> int:
+    """CPUs this process may use: its affinity mask, capped by a cgroup CPU quota (container limits)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not Linux
+        cpus = os.cpu_count() or 1
+    try:
+        with open(os.path.join(cgroup_root, "cpu.max")) as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period) + 0.5)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+def worker_count(requested: int = 0) -> int:
+    return requested if requested > 0 else available_cpus()
+
+def choose_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") is not None else "asyncio"
+
+def choose_http() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") is not None else "h11"
+
+def private_memory_mb() -> float:
+    """
+    Memory this process does not share with its siblings. Pages inherited
+    copy-on-write from the parent only count once a worker writes to them.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            kilobytes = sum(int(line.split()[1]) for line in f if line.startswith(("Private_Clean:", "Private_Dirty:")))
+        return kilobytes / 1024
+    except OSError:
+        # Peak RSS: kilobytes on Linux, bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def max_requests_for_worker(max_requests: int, jitter: int) -> Optional[int]:
+    """Per-worker request limit, jittered so workers started together don't all retire together."""
+    if max_requests <= 0:
+        return None
+    return max_requests + (random.randint(0, jitter) if jitter > 0 else 0)
+
+def preload(app_path: str):
+    """Import the app and build the per-process caches worth sharing, then freeze the heap."""
+    module_name, _, attribute = app_path.partition(":")
+    module = __import__(module_name, fromlist=[attribute or "app"])
+    app = getattr(module, attribute or "app")
+
+    from app.ui import index_page
+    index_page()
+
+    # Everything allocated so far lives as long as the process. Moving it into the
+    # permanent generation keeps the collector in each worker from writing to (and
+    # so un-sharing) those pages when it updates its bookkeeping.
+    gc.collect()
+    gc.freeze()
+    return app
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+class MemoryWatchdog:
+    """Asks a uvicorn server to shut down gracefully once the process's private memory exceeds the limit."""
+
+    def __init__(self, server: uvicorn.Server, limit_mb: float, interval: float):
+        self.server = server
+        self.limit_mb = limit_mb
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        used = private_memory_mb()
+        if used <= self.limit_mb:
+            return False
+        logger.warning(f"Worker {os.getpid()} uses {used:.0f} MB of private memory (limit {self.limit_mb:.0f} MB), restarting it")
+        self.server.should_exit = True
+        return True
+
+    def start(self) -> None:
+        if self.limit_mb <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="memory-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self.check():
+                return
+
+class Server(uvicorn.Server):
+    """
+    uvicorn.Server that ends the event streams as soon as it starts shutting down.
+
+    uvicorn waits up to timeout_graceful_shutdown for open responses before the
+    lifespan shutdown, and event streams never finish on their own.
+    """
+
+    async def shutdown(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        calculation_events.close_streams()
+        await super().shutdown(sockets=sockets)
+
+def run_worker(app, sock: socket.socket, args) -> None:
+    """Worker body (runs in the forked child)."""
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)
+    # Forked workers would otherwise share the parent's random state (and request-limit jitter).
+    random.seed()
+
+    config = uvicorn.Config(
+        app,
+        loop=choose_loop(),
+        http=choose_http(),
+        lifespan="on",
+        backlog=args.backlog,
+        limit_max_requests=max_requests_for_worker(args.max_requests, args.max_requests_jitter),
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    server = Server(config)
+    watchdog = MemoryWatchdog(server, args.max_memory_mb, args.memory_check_interval)
+    watchdog.start()
+    try:
+        server.run(sockets=[sock])
+    finally:
+        watchdog.stop()
+
+class Supervisor:
+    """Keeps `workers` forked workers running until told to stop."""
+
+    def __init__(self, app, sock: socket.socket, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers: Dict[int, float] = {}  # pid -> start time
+        self.stopping = False
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - child process
+            code = 0
+            try:
+                run_worker(self.app, self.sock, self.args)
+            except BaseException:
+                logger.exception("Worker crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+        return pid
+
+    def stop(self, signum=signal.SIGTERM, frame=None) -> None:
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info(
+            f"Starting {self.args.workers} workers (loop={choose_loop()}, http={choose_http()}) "
+            f"on {self.args.host}:{self.args.port}"
+        )
+        for _ in range(self.args.workers):
+            self.spawn()
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            lifetime = time.monotonic() - started
+            logger.info(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)} after {lifetime:.0f}s, replacing it")
+            if lifetime < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+                if self.stopping:
+                    continue
+            self.spawn()
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.launcher", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WORKERS, help="0: one per available CPU")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--max-requests", type=int, default=settings.WORKER_MAX_REQUESTS)
+    parser.add_argument("--max-requests-jitter", type=int, default=settings.WORKER_MAX_REQUESTS_JITTER)
+    parser.add_argument("--max-memory-mb", type=float, default=settings.WORKER_MAX_MEMORY_MB)
+    parser.add_argument("--memory-check-interval", type=float, default=settings.WORKER_MEMORY_CHECK_INTERVAL)
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    args = parser.parse_args(argv)
+    args.workers = worker_count(args.workers)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(name)s - %(message)s")
+    sock = bind_socket(args.host, args.port, args.backlog)
+    app = preload(args.app)
+    Supervisor(app, sock, args).run()
+
+if __name__ == "__main__":
+    main() # pragma: no cover
@@ -0,0 +1,188 @@
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import settings
+from app.metrics import registry
+from app.models.user import User
+
+rejected_requests = registry.counter(
+    "admission_rejected_total", "Requests shed by admission control", labels=("reason",)
+)
+concurrency_limit_gauge = registry.gauge("admission_concurrency_limit", "Current adaptive concurrency limit")
+inflight_gauge = registry.gauge("admission_inflight_requests", "Requests currently admitted")
+tracked_keys_gauge = registry.gauge("admission_tracked_keys", "Token buckets held in memory", labels=("limiter",))
+
+class TokenBucketLimiter:
+    """Token bucket per key; the least recently used buckets are evicted past max_keys."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, now: float) -> float:
+        """Take one token for key; returns 0 when admitted, else seconds until a token is available."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+class AIMDConcurrencyLimiter:
+    """
+    Additive-increase/multiplicative-decrease limit on in-flight requests, driven by latency.
+
+    Like TCP's once-per-RTT backoff, the limit decreases at most once per
+    window: a slow request that was already in flight at the last decrease
+    reflects the load that decrease responded to, so a burst of slow
+    completions cuts the limit once rather than once per request.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_latency: float,
+                 increase: float = 1.0, decrease: float = 0.9):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.inflight = 0
+        self._decreased_at = -math.inf
+
+    def try_acquire(self) -> bool:
+        if self.inflight >= int(self.limit):
+            return False
+        self.inflight += 1
+        return True
+
+    def release(self, latency: float, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        self.inflight -= 1
+        if latency > self.target_latency:
+            if now - latency >= self._decreased_at:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._decreased_at = now
+        elif self.inflight >= int(self.limit) - 1:
+            # Only grow while the limit is actually being used.
+            self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+class AdmissionControlMiddleware:
+    """
+    Pure ASGI middleware that sheds load before it reaches the route.
+
+    429 when the client IP or authenticated user is over its rate, 503 when the
+    worker is already running as many requests as the adaptive limit allows.
+    Requests to stream_paths (event streams that stay open for minutes) are
+    rate limited but bypass the concurrency limit, which they would otherwise
+    exhaust and drive down with their duration.
+    """
+
+    def __init__(
+        self,
+        app,
+        ip_rate: Optional[float] = None,
+        ip_burst: Optional[float] = None,
+        user_rate: Optional[float] = None,
+        user_burst: Optional[float] = None,
+        max_keys: Optional[int] = None,
+        concurrency: Optional[AIMDConcurrencyLimiter] = None,
+        exempt_paths: Optional[str] = None,
+        stream_paths: Optional[str] = None
+    ):
+        self.app = app
+        max_keys = max_keys or settings.ADMISSION_MAX_TRACKED_KEYS
+        self.ip_limiter = TokenBucketLimiter(
+            ip_rate or settings.ADMISSION_IP_RATE, ip_burst or settings.ADMISSION_IP_BURST, max_keys
+        )
+        self.user_limiter = TokenBucketLimiter(
+            user_rate or settings.ADMISSION_USER_RATE, user_burst or settings.ADMISSION_USER_BURST, max_keys
+        )
+        self.concurrency = concurrency or AIMDConcurrencyLimiter(
+            settings.ADMISSION_CONCURRENCY_INITIAL,
+            settings.ADMISSION_CONCURRENCY_MIN,
+            settings.ADMISSION_CONCURRENCY_MAX,
+            settings.ADMISSION_TARGET_LATENCY
+        )
+        paths = settings.ADMISSION_EXEMPT_PATHS if exempt_paths is None else exempt_paths
+        self.exempt_paths = {path.strip() for path in paths.split(",") if path.strip()}
+        paths = settings.ADMISSION_STREAM_PATHS if stream_paths is None else stream_paths
+        self.stream_paths = {path.strip() for path in paths.split(",") if path.strip()}
+
+        concurrency_limit_gauge.set_function(lambda: self.concurrency.limit)
+        inflight_gauge.set_function(lambda: self.concurrency.inflight)
+        tracked_keys_gauge.set_function(lambda: len(self.ip_limiter), limiter="ip")
+        tracked_keys_gauge.set_function(lambda: len(self.user_limiter), limiter="user")
+
+    @staticmethod
+    def _bearer_token(scope) -> Optional[str]:
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                return token if scheme.lower() == "bearer" and token else None
+        return None
+
+    async def _reject(self, send, status: int, reason: str, retry_after: float, message: str) -> None:
+        rejected_requests.inc(reason=reason)
+        body = json.dumps({"error": message}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        now = time.monotonic()
+        client = scope.get("client")
+        retry_after = self.ip_limiter.acquire(client[0] if client else "unknown", now)
+        if retry_after:
+            await self._reject(send, 429, "ip", retry_after, "Too many requests from this address")
+            return
+
+        # Key on the signed subject only: the revocation check can hit the database,
+        # which must not happen on the event loop here. Routes still reject revoked tokens.
+        token = self._bearer_token(scope)
+        payload = User.decode_token(token) if token else None
+        subject = payload.get("sub") if payload else None
+        if subject:
+            retry_after = self.user_limiter.acquire(str(subject), now)
+            if retry_after:
+                await self._reject(send, 429, "user", retry_after, "Too many requests for this user")
+                return
+
+        if scope["path"] in self.stream_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if not self.concurrency.try_acquire():
+            await self._reject(send, 503, "concurrency", 1, "Server is busy, please retry")
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            finished = time.monotonic()
+            self.concurrency.release(finished - now, finished)
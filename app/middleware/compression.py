@@ -0,0 +1,187 @@
+import functools
+import json
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.compression import StreamCompressor, available_encodings, negotiate_encoding
+from app.config import settings
+from app.metrics import registry
+
+bytes_in = registry.counter("compression_bytes_in_total", "Response bytes before compression", labels=("encoding",))
+bytes_out = registry.counter("compression_bytes_out_total", "Response bytes after compression", labels=("encoding",))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "application/xml", "image/svg+xml", "text/")
+LEVEL_CANDIDATES = {"gzip": range(1, 10), "br": range(0, 10)}
+
+def sample_payload(rows: int = 1000) -> bytes:
+    """Representative response body: a page of calculation history."""
+    rng = random.Random(42)
+    types = ("addition", "subtraction", "multiplication", "division")
+    return json.dumps([
+        {
+            "type": rng.choice(types),
+            "inputs": [round(rng.uniform(-1000, 1000), rng.randint(0, 4)) for _ in range(rng.randint(2, 5))],
+            "id": "%032x" % rng.getrandbits(128),
+            "user_id": "0b7e3a5c9d2f4e1a8b6c0d4e2f1a3b5c",
+            "created_at": f"2025-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T1{rng.randint(0, 9)}:2{rng.randint(0, 9)}:00",
+            "updated_at": f"2025-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T1{rng.randint(0, 9)}:2{rng.randint(0, 9)}:00",
+            "result": round(rng.uniform(-1e6, 1e6), 6),
+        }
+        for _ in range(rows)
+    ]).encode()
+
+def measure_level(encoding: str, level: int, payload: bytes, chunk_size: int = 16384) -> Tuple[float, float]:
+    """(CPU ms per MB of input, compressed/original ratio) when streaming payload in chunk_size pieces."""
+    compressor = StreamCompressor(encoding, level)
+    started = time.process_time()
+    output = 0
+    for start in range(0, len(payload), chunk_size):
+        output += len(compressor.compress(payload[start:start + chunk_size]))
+    output += len(compressor.finish())
+    elapsed = time.process_time() - started
+    return elapsed * 1000 / (len(payload) / 1e6), output / len(payload)
+
+def choose_levels(budget_ms_per_mb: float, payload: Optional[bytes] = None) -> Dict[str, int]:
+    """Highest level of each encoding whose measured cost fits the CPU budget (else the cheapest level)."""
+    payload = payload or sample_payload(400)
+    levels = {}
+    for encoding in available_encodings():
+        candidates = list(LEVEL_CANDIDATES[encoding])
+        levels[encoding] = candidates[0]
+        for level in candidates:
+            cost, _ = measure_level(encoding, level, payload)
+            if cost > budget_ms_per_mb:
+                # Cost grows with level, so stop measuring once over budget.
+                break
+            levels[encoding] = level
+    return levels
+
+@functools.lru_cache(maxsize=None)
+def measured_levels(budget_ms_per_mb: float) -> Dict[str, int]:
+    """choose_levels for the sample payload, measured once per process and budget."""
+    return choose_levels(budget_ms_per_mb)
+
+def configured_levels() -> Dict[str, int]:
+    if settings.COMPRESSION_CPU_BUDGET_MS_PER_MB > 0:
+        return dict(measured_levels(settings.COMPRESSION_CPU_BUDGET_MS_PER_MB))
+    return {"gzip": settings.COMPRESSION_GZIP_LEVEL, "br": settings.COMPRESSION_BR_LEVEL}
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware that compresses response bodies as they are sent.
+
+    Every body message is compressed and flushed on its own, so streaming
+    responses reach the client incrementally and nothing is buffered beyond
+    the first minimum_size bytes. Responses that are small, already encoded,
+    not a compressible type or a text/event-stream pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: Optional[int] = None, levels: Optional[Dict[str, int]] = None,
+                 cpu_budget: Optional[float] = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+        if levels is None:
+            levels = configured_levels() if cpu_budget is None else dict(measured_levels(cpu_budget))
+        self.levels = levels
+        self.encodings = tuple(encoding for encoding in available_encodings() if encoding in levels)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = None
+        for name, value in scope.get("headers", ()):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding, self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressingResponder(send, encoding, self.levels[encoding], self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+class CompressingResponder:
+    """Per-response state: decides on the first body bytes whether to compress, then streams."""
+
+    def __init__(self, send, encoding: str, level: int, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self._start = None
+        self._mode = "start"
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._compressor: Optional[StreamCompressor] = None
+
+    def _compressible(self, message) -> bool:
+        if message["status"] < 200 or message["status"] in (204, 304):
+            return False
+        content_type = b""
+        for name, value in message.get("headers", ()):
+            name = name.lower()
+            if name in (b"content-encoding", b"content-range"):
+                return False
+            if name == b"content-length" and int(value) < self.minimum_size:
+                return False
+            if name == b"content-type":
+                content_type = value.lower()
+        media_type = content_type.split(b";")[0].strip().decode("latin-1")
+        return media_type != "text/event-stream" and media_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _compressed_start(self):
+        headers = []
+        vary = None
+        for name, value in self._start.get("headers", ()):
+            lowered = name.lower()
+            if lowered == b"content-length":
+                continue
+            if lowered == b"vary":
+                vary = value
+                continue
+            if lowered == b"etag" and not value.startswith(b"W/"):
+                # The compressed bytes are a different representation of the same content.
+                value = b"W/" + value
+            headers.append((name, value))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+        return {**self._start, "headers": headers}
+
+    async def send(self, message) -> None:
+        if message["type"] == "http.response.start":
+            self._start = message
+            if self._compressible(message):
+                self._mode = "pending"
+            else:
+                self._mode = "passthrough"
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self._mode == "passthrough":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._mode == "pending":
+            self._buffer.append(body)
+            self._buffered += len(body)
+            if more_body and self._buffered < self.minimum_size:
+                return
+            body = b"".join(self._buffer)
+            self._buffer = []
+            if not more_body and len(body) < self.minimum_size:
+                self._mode = "passthrough"
+                await self._send(self._start)
+                await self._send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+            self._mode = "compressing"
+            self._compressor = StreamCompressor(self.encoding, self.level)
+            await self._send(self._compressed_start())
+
+        output = self._compressor.compress(body) if more_body else self._compressor.finish(body)
+        bytes_in.inc(len(body), encoding=self.encoding)
+        bytes_out.inc(len(output), encoding=self.encoding)
+        if output or not more_body:
+            await self._send({"type": "http.response.body", "body": output, "more_body": more_body})
@@ -1,11 +1,20 @@
-from datetime import datetime
+from datetime import datetime, timezone
+import json
+import math
 import uuid
-from typing import List
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Float
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship, declared_attr
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import Column, String, DateTime, ForeignKey, Float, Index, PrimaryKeyConstraint, Uuid, bindparam, cast, column, event, exists, func, inspect, type_coerce, update, values
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship, declared_attr, has_inherited_table
 from sqlalchemy.ext.declarative import declared_attr
+from app.calculation_events import calculation_events, create_notify_trigger
+from app.config import settings
 from app.database import Base
+from app.models.calculation_dependency import CalculationDependency
+from app.models.history_version import HistoryVersion
+from app.models.loading import loader_option
+from app.models.types import UUID, CalculationTypeCode, InputsType
+from app.partitions import create_initial_partitions
 
 class AbstractCalculation:
     
@@ -13,11 +22,35 @@ class AbstractCalculation:
     def __tablename__(cls):
         return 'calculations'
 
+    @declared_attr
+    def __table_args__(cls):
+        # On PostgreSQL the table is range-partitioned by month of created_at, which
+        # requires the partition key in the primary key. The mapper still identifies
+        # rows by id alone (see Calculation.__mapper_args__).
+        if has_inherited_table(cls):
+            return None
+        return (
+            PrimaryKeyConstraint('id', 'created_at'),
+            # Serves per-user type filters and the stats aggregation from the index
+            # alone; its leading user_id also covers lookups by user.
+            Index('ix_calculations_user_id_type', 'user_id', 'type', postgresql_include=['result']),
+            # Result-range search within a user's calculations.
+            Index('ix_calculations_user_id_result', 'user_id', 'result'),
+            # Rows arrive roughly in created_at order, so per-block-range min/max
+            # summaries answer date windows from an index a few pages in size.
+            Index('ix_calculations_created_at_brin', 'created_at', postgresql_using='brin').ddl_if(dialect='postgresql'),
+            # "inputs contain X" as JSONB containment (@>).
+            Index(
+                'ix_calculations_inputs_gin', 'inputs',
+                postgresql_using='gin', postgresql_ops={'inputs': 'jsonb_path_ops'}
+            ).ddl_if(dialect='postgresql'),
+            {"postgresql_partition_by": "RANGE (created_at)"},
+        )
+
     @declared_attr
     def id(cls):
         return Column(
             UUID(as_uuid=True), 
-            primary_key=True, 
             default=uuid.uuid4,
             nullable=False
         )
@@ -27,14 +60,13 @@ class AbstractCalculation:
         return Column(
             UUID(as_uuid=True),
             ForeignKey('users.id', ondelete='CASCADE'),
-            nullable=False,
-            index=True
+            nullable=False
         )
     
     @declared_attr
     def type(cls):
         return Column(
-            String(50),
+            CalculationTypeCode,
             nullable=False,
             index=True
         )
@@ -42,7 +74,7 @@ class AbstractCalculation:
     @declared_attr
     def inputs(cls):
         return Column(
-            JSON,
+            InputsType,
             nullable=False
         )
     
@@ -72,7 +104,7 @@ class AbstractCalculation:
     
     @declared_attr
     def user(cls):
-        return relationship("User", back_populates="calculations")
+        return relationship("User", back_populates="calculations", lazy=settings.RELATIONSHIP_LAZY_MODE)
     
     def get_result(self) -> float:
         raise NotImplementedError
@@ -85,18 +117,263 @@ class AbstractCalculation:
             'addition': Addition,
             'subtraction': Subtraction,
             'multiplication': Multiplication,
-            'division': Division
+            'division': Division,
+            'mean': Mean,
+            'variance': Variance,
+            'stddev': StandardDeviation,
+            'percentile': Percentile,
+            'power': Power,
+            'modulo': Modulo,
         }
         calculation = calculations.get(calculation_type.lower())
         if not calculation:
             raise ValueError(f"Unsupported calculation type: {calculation_type}")
         return calculation(user_id=user_id, inputs=inputs)
+
+    @classmethod
+    def rejection(cls, calculation_type: str, inputs: List[float]) -> str:
+        """The error get_result() raises for inputs it rejects."""
+        try:
+            cls.create_calculation(calculation_type, None, list(inputs)).get_result()
+        except ValueError as e:
+            return str(e)
+        return "Invalid inputs."
+
+    @classmethod
+    def query_with_user(cls, db, strategy: str = "joined"):
+        return db.query(cls).options(loader_option(cls.user, strategy))
+
+    @classmethod
+    def recent_for_user(cls, db, user_id: uuid.UUID, limit: int = 10, offset: int = 0) -> List["Calculation"]:
+        return (
+            db.query(cls)
+            .filter(cls.user_id == user_id)
+            .order_by(cls.created_at.desc())
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+    @classmethod
+    def search_filters(cls, dialect: str, user_id: uuid.UUID, types: Optional[Sequence[str]] = None,
+                       min_result: Optional[float] = None, max_result: Optional[float] = None,
+                       created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                       contains: Optional[Sequence[float]] = None) -> List[Any]:
+        """
+        WHERE conditions for a history search, one per given filter, each written the
+        way its index can serve it: (user_id, type) and (user_id, result) B-trees,
+        the created_at BRIN (which also prunes partitions) and the inputs GIN.
+        """
+        conditions = [cls.user_id == user_id]
+        if types:
+            conditions.append(cls.type.in_(list(types)))
+        if min_result is not None:
+            conditions.append(cls.result >= min_result)
+        if max_result is not None:
+            conditions.append(cls.result <= max_result)
+        if created_after is not None:
+            conditions.append(cls.created_at >= naive_utc(created_after))
+        if created_before is not None:
+            conditions.append(cls.created_at < naive_utc(created_before))
+        if contains:
+            if dialect == "postgresql":
+                conditions.append(type_coerce(cls.inputs, JSONB).contains(list(contains)))
+            else:
+                for value in contains:
+                    element = func.json_each(cls.inputs).table_valued("value")
+                    conditions.append(exists().select_from(element).where(element.c.value == value))
+        return conditions
+
+    @classmethod
+    def search_for_user(cls, db, user_id: uuid.UUID, limit: int = 50, offset: int = 0, **filters) -> List["Calculation"]:
+        """Newest first; covers calculations still in the database, not archived segments."""
+        conditions = cls.search_filters(db.get_bind().dialect.name, user_id, **filters)
+        return (
+            db.query(cls)
+            .filter(*conditions)
+            .order_by(cls.created_at.desc())
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+    @classmethod
+    def bulk_update_inputs(cls, db, user_id: uuid.UUID, updates: Sequence[Tuple[uuid.UUID, List[float]]]) -> List[Dict[str, Any]]:
+        """
+        Replace the inputs of many of a user's calculations and recompute their results.
+
+        Results are computed per type over the whole batch with numpy, and the rows
+        are written by one UPDATE ... FROM (VALUES ...) per chunk on PostgreSQL.
+        Ids that do not exist or belong to another user are reported as not_found.
+        """
+        import numpy as np
+        from app.operations.vectorized import invalid_rows, pack_inputs, reduce_inputs
+
+        results = [
+            {"index": index, "id": calculation_id, "status": "not_found", "result": None, "detail": None}
+            for index, (calculation_id, _) in enumerate(updates)
+        ]
+        ids = list({calculation_id for calculation_id, _ in updates})
+        chunk_size = settings.BULK_INSERT_CHUNK_SIZE
+        types: Dict[uuid.UUID, str] = {}
+        for start in range(0, len(ids), chunk_size):
+            types.update(
+                db.query(cls.id, cls.type)
+                .filter(cls.user_id == user_id, cls.id.in_(ids[start:start + chunk_size]))
+                .all()
+            )
+
+        by_type: Dict[str, List[int]] = {}
+        seen = set()
+        for index, (calculation_id, _) in enumerate(updates):
+            if calculation_id not in types:
+                continue
+            if calculation_id in seen:
+                results[index].update(status="invalid", detail="Calculation repeated in batch")
+                continue
+            seen.add(calculation_id)
+            by_type.setdefault(types[calculation_id], []).append(index)
+
+        rows = []
+        for calculation_type, indexes in by_type.items():
+            flat, offsets = pack_inputs([updates[index][1] for index in indexes])
+            try:
+                computed = reduce_inputs(calculation_type, flat, offsets)
+            except ValueError as e:
+                for index in indexes:
+                    results[index].update(status="invalid", detail=str(e))
+                continue
+            invalid = invalid_rows(calculation_type, flat, offsets)
+            finite = np.isfinite(computed)
+            for position, index in enumerate(indexes):
+                if invalid[position]:
+                    results[index].update(status="invalid", detail=cls.rejection(calculation_type, updates[index][1]))
+                elif not finite[position]:
+                    results[index].update(status="invalid", detail="Result is not a finite number.")
+                else:
+                    result = float(computed[position])
+                    results[index].update(status="updated", result=result)
+                    rows.append((updates[index][0], [float(value) for value in updates[index][1]], result))
+
+        now = datetime.utcnow()
+        table = cls.__table__
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            if db.get_bind().dialect.name == "postgresql":
+                data = values(column("id", Uuid), column("inputs", String), column("result", Float), name="v").data(
+                    [(calculation_id, json.dumps(inputs), result) for calculation_id, inputs, result in chunk]
+                )
+                stmt = (
+                    update(table)
+                    .where(table.c.id == cast(data.c.id, Uuid), table.c.user_id == user_id)
+                    .values(inputs=cast(data.c.inputs, table.c.inputs.type), result=data.c.result, updated_at=now)
+                )
+                db.execute(stmt)
+            else:
+                stmt = (
+                    update(table)
+                    .where(table.c.id == bindparam("b_id"), table.c.user_id == user_id)
+                    .values(
+                        inputs=bindparam("b_inputs", type_=table.c.inputs.type),
+                        result=bindparam("b_result"),
+                        updated_at=now
+                    )
+                )
+                db.execute(stmt, [
+                    {"b_id": calculation_id, "b_inputs": inputs, "b_result": result}
+                    for calculation_id, inputs, result in chunk
+                ])
+        # The core UPDATEs bypass the ORM events that do this for single updates.
+        CalculationDependency.mark_downstream_stale(db, [calculation_id for calculation_id, _, _ in rows])
+        if rows:
+            HistoryVersion.bump(db, [user_id])
+        return results
+
+    @classmethod
+    def stat_groups_for_user(cls, db, user_id: uuid.UUID) -> List[tuple]:
+        """Per-type (type, count, result_count, result_sum, result_min, result_max) rows."""
+        return (
+            db.query(
+                cls.type,
+                func.count(),
+                func.count(cls.result),
+                func.sum(cls.result),
+                func.min(cls.result),
+                func.max(cls.result)
+            )
+            .filter(cls.user_id == user_id)
+            .group_by(cls.type)
+            .all()
+        )
+
+    @classmethod
+    def stats_for_user(cls, db, user_id: uuid.UUID) -> Dict[str, Any]:
+        return summarize_stat_groups(cls.stat_groups_for_user(db, user_id))
+
+def naive_utc(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC; convert aware query values to match."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def summarize_stat_groups(groups) -> Dict[str, Any]:
+    """Combine per-type stat groups (possibly several per type) into the stats response shape."""
+    by_type: Dict[str, int] = {}
+    result_count = 0
+    result_sum = 0.0
+    result_min = result_max = None
+    for type_, count, type_result_count, type_sum, type_min, type_max in groups:
+        by_type[type_] = by_type.get(type_, 0) + count
+        result_count += type_result_count
+        result_sum += type_sum or 0
+        if type_min is not None:
+            result_min = type_min if result_min is None else min(result_min, type_min)
+        if type_max is not None:
+            result_max = type_max if result_max is None else max(result_max, type_max)
+    return {
+        "total": sum(by_type.values()),
+        "by_type": by_type,
+        "result_sum": result_sum if result_count else None,
+        "result_avg": result_sum / result_count if result_count else None,
+        "result_min": result_min,
+        "result_max": result_max,
+    }
     
 class Calculation(Base, AbstractCalculation):
-    __mapper_args__ = {
-        "polymorphic_on": "type",
-        "polymorphic_identity": "calculation",
-    }
+    @declared_attr.directive
+    def __mapper_args__(cls):
+        return {
+            "polymorphic_on": "type",
+            "polymorphic_identity": "calculation",
+            "primary_key": [cls.__table__.c.id],
+        }
+
+event.listen(Calculation.__table__, "after_create", create_initial_partitions)
+event.listen(Calculation.__table__, "after_create", create_notify_trigger)
+
+@event.listens_for(Calculation, "after_insert", propagate=True)
+def _record_insert_event(mapper, connection, target):
+    calculation_events.record(connection, target, "insert")
+
+@event.listens_for(Calculation, "after_update", propagate=True)
+def _record_update_event(mapper, connection, target):
+    calculation_events.record(connection, target, "update")
+
+@event.listens_for(Calculation, "after_update", propagate=True)
+def _mark_dependents_stale(mapper, connection, target):
+    added, _, deleted = inspect(target).attrs.result.history
+    if added and (not deleted or added[0] != deleted[0]):
+        CalculationDependency.mark_downstream_stale(connection, [target.id])
+
+@event.listens_for(Calculation, "after_delete", propagate=True)
+def _detach_from_graph(mapper, connection, target):
+    CalculationDependency.detach(connection, [target.id])
+
+@event.listens_for(Calculation, "after_insert", propagate=True)
+@event.listens_for(Calculation, "after_update", propagate=True)
+@event.listens_for(Calculation, "after_delete", propagate=True)
+def _bump_history_version(mapper, connection, target):
+    HistoryVersion.bump(connection, [target.user_id])
 
 
 class Addition(Calculation):
@@ -107,7 +384,7 @@ class Addition(Calculation):
             raise ValueError("Inputs must be a list of numbers.")
         if len(self.inputs) < 2:
             raise ValueError("Inputs must be a list with at least two numbers.")
-        return sum(self.inputs)
+        return finite(sum(self.inputs))
     
 class Subtraction(Calculation):
     __mapper_args__ = {"polymorphic_identity": "subtraction"}
@@ -120,7 +397,7 @@ class Subtraction(Calculation):
         result = self.inputs[0]
         for value in self.inputs[1:]:
             result -= value
-        return result
+        return finite(result)
     
 class Multiplication(Calculation):
     __mapper_args__ = {"polymorphic_identity": "multiplication"}
@@ -133,7 +410,7 @@ class Multiplication(Calculation):
         result = 1
         for value in self.inputs:
             result *= value
-        return result
+        return finite(result)
     
 class Division(Calculation):
     __mapper_args__ = {"polymorphic_identity": "division"}
@@ -148,4 +425,73 @@ class Division(Calculation):
             if value == 0:
                 raise ValueError("Cannot divide by zero.")
             result /= value
-        return result
\ No newline at end of file
+        return finite(result)
+
+def checked_inputs(inputs) -> List[float]:
+    if not isinstance(inputs, list):
+        raise ValueError("Inputs must be a list of numbers.")
+    if len(inputs) < 2:
+        raise ValueError("Inputs must be a list with at least two numbers.")
+    return inputs
+
+def finite(result) -> float:
+    if not math.isfinite(result):
+        raise ValueError("Result is not a finite number.")
+    return float(result)
+
+class Mean(Calculation):
+    __mapper_args__ = {"polymorphic_identity": "mean"}
+
+    def get_result(self) -> float:
+        from app.operations.statistics import moments
+        return finite(moments(checked_inputs(self.inputs)).mean)
+
+class Variance(Calculation):
+    """Sample variance (n - 1 denominator)."""
+    __mapper_args__ = {"polymorphic_identity": "variance"}
+
+    def get_result(self) -> float:
+        from app.operations.statistics import moments
+        return finite(moments(checked_inputs(self.inputs)).variance())
+
+class StandardDeviation(Calculation):
+    """Sample standard deviation."""
+    __mapper_args__ = {"polymorphic_identity": "stddev"}
+
+    def get_result(self) -> float:
+        from app.operations.statistics import moments
+        return finite(math.sqrt(moments(checked_inputs(self.inputs)).variance()))
+
+class Percentile(Calculation):
+    """The first input is the percentile (0-100) of the remaining inputs."""
+    __mapper_args__ = {"polymorphic_identity": "percentile"}
+
+    def get_result(self) -> float:
+        from app.operations.statistics import percentile
+        inputs = checked_inputs(self.inputs)
+        return finite(percentile(inputs[1:], inputs[0]))
+
+class Power(Calculation):
+    """Left to right, like subtraction: [2, 3, 2] is (2 ** 3) ** 2."""
+    __mapper_args__ = {"polymorphic_identity": "power"}
+
+    def get_result(self) -> float:
+        result = float(checked_inputs(self.inputs)[0])
+        try:
+            for value in self.inputs[1:]:
+                result = math.pow(result, value)
+        except (OverflowError, ValueError):
+            # Overflow, 0 ** negative, or a fractional power of a negative number.
+            raise ValueError("Result is not a finite number.") from None
+        return finite(result)
+
+class Modulo(Calculation):
+    """Left to right; the remainder takes the sign of the divisor, as Python's %."""
+    __mapper_args__ = {"polymorphic_identity": "modulo"}
+
+    def get_result(self) -> float:
+        import numpy as np
+        inputs = checked_inputs(self.inputs)
+        if any(value == 0 for value in inputs[1:]):
+            raise ValueError("Cannot divide by zero.")
+        return finite(np.mod.reduce(np.asarray(inputs, dtype=np.float64)))
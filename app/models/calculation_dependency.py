@@ -0,0 +1,229 @@
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, delete, literal, select, text, update
+from sqlalchemy.orm import aliased
+
+from app.database import Base
+from app.models.types import UUID
+
+class CalculationGraphError(ValueError):
+    """A requested change to the calculation graph is invalid."""
+
+class CalculationCycleError(CalculationGraphError):
+    pass
+
+class CalculationSourceNotFound(CalculationGraphError):
+    pass
+
+class CalculationDependency(Base):
+    """
+    Edge of a user's calculation graph: inputs[position] of calculation_id is the
+    result of source_id.
+
+    There are no foreign keys to calculations, whose primary key on PostgreSQL is
+    (id, created_at) because of partitioning, so id alone cannot be referenced;
+    edges are removed by Calculation delete events instead (see detach).
+
+    stale is set on every edge downstream of a calculation whose result changed
+    (transitively, when the change happens) and cleared when the dependent is
+    recomputed, so a calculation needs recomputing exactly when one of its
+    incoming edges is stale.
+    """
+    __tablename__ = 'calculation_dependencies'
+
+    calculation_id = Column(UUID(as_uuid=True), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    source_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    stale = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f"<CalculationDependency({self.source_id} -> {self.calculation_id}[{self.position}])>"
+
+    @classmethod
+    def downstream_of(cls, ids: Iterable[uuid.UUID]):
+        """Recursive CTE of every calculation that (transitively) depends on ids."""
+        table = cls.__table__
+        ids = list(ids)
+        downstream = (
+            select(table.c.calculation_id.label("id"))
+            .where(table.c.source_id.in_(ids))
+            .cte("downstream", recursive=True)
+        )
+        edge = aliased(table)
+        # UNION (not UNION ALL) also stops the recursion on a cycle.
+        return downstream.union(
+            select(edge.c.calculation_id).join(downstream, edge.c.source_id == downstream.c.id)
+        )
+
+    @classmethod
+    def mark_downstream_stale(cls, connection, ids: Sequence[uuid.UUID]) -> None:
+        """Flag every edge below the calculations in ids, whose results just changed."""
+        if not ids:
+            return
+        table = cls.__table__
+        ids = list(ids)
+        # Most calculations feed nothing; an index probe settles that without the recursive UPDATE.
+        if connection.execute(select(table.c.position).where(table.c.source_id.in_(ids)).limit(1)).first() is None:
+            return
+        downstream = cls.downstream_of(ids)
+        connection.execute(
+            update(table)
+            .where(table.c.source_id.in_(ids) | table.c.source_id.in_(select(downstream.c.id)))
+            .where(table.c.stale.is_(False))
+            .values(stale=True)
+        )
+
+    @classmethod
+    def detach(cls, connection, ids: Sequence[uuid.UUID]) -> None:
+        """Drop the edges into and out of deleted calculations; dependents keep the last value they saw."""
+        table = cls.__table__
+        connection.execute(delete(table).where(table.c.calculation_id.in_(list(ids)) | table.c.source_id.in_(list(ids))))
+
+    @classmethod
+    def sources_for(cls, db, calculation_id: uuid.UUID) -> List[Tuple[int, uuid.UUID]]:
+        return [
+            (position, source_id)
+            for position, source_id in db.query(cls.position, cls.source_id)
+            .filter(cls.calculation_id == calculation_id)
+            .order_by(cls.position)
+        ]
+
+    @classmethod
+    def lock_user_graph(cls, db, user_id: uuid.UUID) -> None:
+        # Serializes graph edits per user so two concurrent edits cannot each pass
+        # the cycle check and together close a cycle. SQLite serializes writers anyway.
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": user_id.int & 0x7FFFFFFFFFFFFFFF})
+
+    @classmethod
+    def set_sources(cls, db, calculation, sources: Sequence[Tuple[int, uuid.UUID]]):
+        """
+        Replace the inputs of calculation that are fed by other calculations, then
+        bring it up to date. Sources must belong to the same user; positions must be
+        within its inputs.
+        """
+        from app.models.calculation import Calculation
+
+        positions = [position for position, _ in sources]
+        if len(set(positions)) != len(positions):
+            raise CalculationGraphError("Each input position can have only one source")
+        if any(position >= len(calculation.inputs) for position in positions):
+            raise CalculationGraphError(f"Input positions must be below {len(calculation.inputs)}")
+
+        cls.lock_user_graph(db, calculation.user_id)
+        source_ids = {source_id for _, source_id in sources}
+        if calculation.id in source_ids:
+            raise CalculationCycleError("A calculation cannot use its own result")
+        if source_ids:
+            found = {
+                row[0] for row in db.query(Calculation.id)
+                .filter(Calculation.user_id == calculation.user_id, Calculation.id.in_(source_ids))
+            }
+            missing = source_ids - found
+            if missing:
+                raise CalculationSourceNotFound(f"Calculation {sorted(missing)[0]} not found")
+            downstream = cls.downstream_of([calculation.id])
+            if db.execute(select(downstream.c.id).where(downstream.c.id.in_(source_ids)).limit(1)).first():
+                raise CalculationCycleError("These sources would make the calculation depend on itself")
+
+        db.query(cls).filter(cls.calculation_id == calculation.id).delete(synchronize_session=False)
+        db.add_all([
+            cls(calculation_id=calculation.id, position=position, source_id=source_id,
+                user_id=calculation.user_id, stale=True)
+            for position, source_id in sources
+        ])
+        db.flush()
+        return cls.refresh(db, calculation.user_id, calculation.id)
+
+    @classmethod
+    def refresh(cls, db, user_id: uuid.UUID, calculation_id: uuid.UUID):
+        """
+        Return the calculation, first recomputing it and any stale calculations it
+        depends on, upstream first. Only stale nodes are touched: the walk up the
+        graph follows stale edges only, which (because staleness is propagated
+        transitively) reach every out-of-date ancestor. Raises ValueError if a
+        recomputation fails (e.g. an upstream result of 0 now feeds a divisor), after
+        which the caller should roll back.
+        """
+        from app.models.calculation import Calculation
+
+        table = cls.__table__
+        dirty = select(literal(calculation_id, UUID(as_uuid=True)).label("id")).cte("dirty", recursive=True)
+        edge = aliased(table)
+        dirty = dirty.union(
+            select(edge.c.source_id)
+            .join(dirty, edge.c.calculation_id == dirty.c.id)
+            .where(edge.c.stale.is_(True), edge.c.user_id == user_id)
+        )
+        edges = db.execute(
+            select(table.c.calculation_id, table.c.position, table.c.source_id, table.c.stale)
+            .where(table.c.calculation_id.in_(select(dirty.c.id)), table.c.user_id == user_id)
+        ).all()
+
+        inbound: Dict[uuid.UUID, List[Tuple[int, uuid.UUID]]] = defaultdict(list)
+        stale_nodes = set()
+        for node, position, source_id, stale in edges:
+            inbound[node].append((position, source_id))
+            if stale:
+                stale_nodes.add(node)
+
+        order = topological_order(stale_nodes, inbound)
+        needed = set(stale_nodes) | {source_id for node in stale_nodes for _, source_id in inbound[node]} | {calculation_id}
+        calculations = {
+            calculation.id: calculation
+            for calculation in db.query(Calculation).filter(Calculation.user_id == user_id, Calculation.id.in_(needed))
+        }
+        target = calculations.get(calculation_id)
+        if target is None:
+            return None
+
+        for node in order:
+            calculation = calculations.get(node)
+            if calculation is None:
+                continue
+            inputs = list(calculation.inputs)
+            detached = []
+            for position, source_id in inbound[node]:
+                source = calculations.get(source_id)
+                if source is None:
+                    # Removed without ORM events (e.g. archived); keep the last value.
+                    detached.append(source_id)
+                elif source.result is None:
+                    raise CalculationGraphError(f"Calculation {source_id} has no result")
+                elif position < len(inputs):
+                    inputs[position] = source.result
+            calculation.inputs = inputs
+            calculation.result = calculation.get_result()
+            calculation.updated_at = datetime.utcnow()
+            # Flush first: the update event re-marks this node's outgoing edges,
+            # and only then are its own incoming edges cleared.
+            db.flush()
+            db.execute(update(table).where(table.c.calculation_id == node).values(stale=False))
+            if detached:
+                db.execute(delete(table).where(table.c.calculation_id == node, table.c.source_id.in_(detached)))
+        return target
+
+def topological_order(nodes: Iterable[uuid.UUID], inbound: Dict[uuid.UUID, List[Tuple[int, uuid.UUID]]]) -> List[uuid.UUID]:
+    """Order nodes so every node comes after those of its sources that are also in nodes (Kahn's algorithm)."""
+    nodes = set(nodes)
+    waiting = {node: {source for _, source in inbound.get(node, ()) if source in nodes} for node in nodes}
+    dependents: Dict[uuid.UUID, List[uuid.UUID]] = defaultdict(list)
+    for node, sources in waiting.items():
+        for source in sources:
+            dependents[source].append(node)
+    ready = sorted((node for node, sources in waiting.items() if not sources), key=str)
+    order = []
+    while ready:
+        node = ready.pop()
+        order.append(node)
+        for dependent in dependents[node]:
+            waiting[dependent].discard(node)
+            if not waiting[dependent]:
+                ready.append(dependent)
+    if len(order) != len(nodes):
+        raise CalculationCycleError("Calculation graph contains a cycle")
+    return order
@@ -0,0 +1,46 @@
+import time
+import uuid
+from typing import Iterable
+
+from sqlalchemy import BigInteger, Column, ForeignKey, select
+from app.database import Base, dialect_insert
+from app.models.types import UUID
+
+class HistoryVersion(Base):
+    """
+    Per-user counter of changes to the user's calculations, tagging cached
+    history and stats bodies (app.cache.history).
+
+    Writers bump it in their own transaction, so every process sees the new
+    version exactly when the change commits, never before. New rows start from
+    the current time in microseconds, so a recreated row never reuses a
+    version an ETag was already issued for.
+    """
+    __tablename__ = 'history_versions'
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
+    @classmethod
+    def current(cls, db, user_id: uuid.UUID) -> int:
+        return db.execute(select(cls.version).where(cls.user_id == user_id)).scalar() or 0
+
+    @classmethod
+    def bump(cls, db, user_ids: Iterable[uuid.UUID]) -> None:
+        """Increment the users' versions in db's (a Session or Connection) current transaction."""
+        # Sorted, so concurrent transactions lock the rows in the same order.
+        user_ids = sorted(set(user_ids))
+        if not user_ids:
+            return
+        table = cls.__table__
+        start = int(time.time() * 1_000_000)
+        for offset in range(0, len(user_ids), 1000):
+            stmt = dialect_insert(db, table).values(
+                [{"user_id": user_id, "version": start} for user_id in user_ids[offset:offset + 1000]]
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.user_id], set_={"version": table.c.version + 1}
+            ))
+
+    def __repr__(self):
+        return f"<HistoryVersion(user_id={self.user_id}, version={self.version})>"
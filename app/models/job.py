@@ -0,0 +1,188 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, Text, func, select, text, update
+
+from app.config import settings
+from app.database import Base
+from app.models.types import UUID, CalculationTypeCode, InputsType
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+class JobQueueFull(Exception):
+    """The user already has JOB_MAX_QUEUED_PER_USER jobs waiting."""
+
+class CalculationJob(Base):
+    """
+    A calculation evaluated outside the request by `python -m app.jobs worker`.
+
+    Jobs are claimed highest priority first (then oldest) with SELECT ... FOR
+    UPDATE SKIP LOCKED, so workers never wait on each other's rows, and at most
+    JOB_MAX_RUNNING_PER_USER of a user's jobs run at once. A claim is a lease
+    that the worker renews while it runs the job: if the worker dies, the job
+    is requeued once locked_until passes. Results are only recorded while the
+    worker still holds the lease.
+    """
+    __tablename__ = 'calculation_jobs'
+    __table_args__ = (
+        # Claim order among runnable jobs; partial on PostgreSQL so finished jobs cost nothing.
+        Index('ix_calculation_jobs_claim', 'priority', 'created_at', postgresql_where=text("status = 'queued'")),
+        Index('ix_calculation_jobs_user_id_status', 'user_id', 'status'),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    type = Column(CalculationTypeCode, nullable=False)
+    inputs = Column(InputsType, nullable=False)
+    priority = Column(Integer, nullable=False, default=0)
+    status = Column(String(16), nullable=False, default=QUEUED)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=lambda: settings.JOB_MAX_ATTEMPTS)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = Column(String(64), nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    result = Column(Float, nullable=True)
+    calculation_id = Column(UUID(as_uuid=True), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<CalculationJob(id={self.id}, type={self.type}, status={self.status})>"
+
+    @classmethod
+    def submit(cls, db, user_id: uuid.UUID, calculation_type: str, inputs: List[float], priority: int = 0) -> "CalculationJob":
+        queued = db.query(func.count()).select_from(cls).filter(cls.user_id == user_id, cls.status == QUEUED).scalar()
+        if queued >= settings.JOB_MAX_QUEUED_PER_USER:
+            raise JobQueueFull(f"{queued} jobs are already waiting")
+        job = cls(user_id=user_id, type=calculation_type, inputs=inputs, priority=priority)
+        db.add(job)
+        db.flush()
+        return job
+
+    @classmethod
+    def _running_for_user(cls, user_id):
+        running = cls.__table__.alias("running")
+        return (
+            select(func.count())
+            .select_from(running)
+            .where(running.c.user_id == user_id, running.c.status == RUNNING)
+            .scalar_subquery()
+        )
+
+    @classmethod
+    def claim(cls, db, worker_id: str, max_running_per_user: Optional[int] = None) -> Optional["CalculationJob"]:
+        """
+        Lease the next runnable job to worker_id and commit, or return None when
+        there is nothing to do.
+        """
+        cap = settings.JOB_MAX_RUNNING_PER_USER if max_running_per_user is None else max_running_per_user
+        postgresql = db.get_bind().dialect.name == "postgresql"
+        skipped_users = set()
+        while True:
+            now = datetime.utcnow()
+            query = db.query(cls.id, cls.user_id).filter(cls.status == QUEUED, cls.run_after <= now)
+            if cap > 0:
+                query = query.filter(cls._running_for_user(cls.user_id) < cap)
+            if skipped_users:
+                query = query.filter(cls.user_id.notin_(skipped_users))
+            candidate = (
+                query.order_by(cls.priority.desc(), cls.created_at)
+                .with_for_update(skip_locked=True, of=cls)
+                .first()
+            )
+            if candidate is None:
+                db.rollback()
+                return None
+            job_id, user_id = candidate
+
+            if postgresql and cap > 0:
+                # The cap filter above can't see claims other workers have not
+                # committed yet; serialize claims per user and count again.
+                db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": user_id.int & 0x7FFFFFFFFFFFFFFF})
+                if db.execute(select(cls._running_for_user(user_id))).scalar() >= cap:
+                    db.rollback()
+                    skipped_users.add(user_id)
+                    continue
+
+            # The status condition makes the claim safe on backends without row locks.
+            claimed = db.execute(
+                update(cls.__table__)
+                .where(cls.__table__.c.id == job_id, cls.__table__.c.status == QUEUED)
+                .values(
+                    status=RUNNING,
+                    attempts=cls.__table__.c.attempts + 1,
+                    locked_by=worker_id,
+                    locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                    started_at=now,
+                )
+            ).rowcount
+            db.commit()
+            if claimed:
+                return db.get(cls, job_id)
+
+    @classmethod
+    def renew_lease(cls, db, job_id: uuid.UUID, worker_id: str) -> bool:
+        """Extend worker_id's lease on a running job and commit; False when the lease was lost."""
+        table = cls.__table__
+        renewed = db.execute(
+            update(table)
+            .where(table.c.id == job_id, table.c.status == RUNNING, table.c.locked_by == worker_id)
+            .values(locked_until=datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS))
+        ).rowcount
+        db.commit()
+        return bool(renewed)
+
+    def _release(self, db, worker_id: str, **values) -> bool:
+        """
+        Record the attempt's outcome and release the lease, unless worker_id no
+        longer holds it (it expired and the job was requeued, maybe claimed again).
+        """
+        table = self.__table__
+        released = db.execute(
+            update(table)
+            .where(table.c.id == self.id, table.c.status == RUNNING, table.c.locked_by == worker_id)
+            .values(locked_by=None, locked_until=None, **values)
+        ).rowcount
+        db.expire(self)
+        return bool(released)
+
+    def succeed(self, db, worker_id: str, result: float, calculation_id: uuid.UUID) -> bool:
+        return self._release(
+            db, worker_id, status=SUCCEEDED, result=result, calculation_id=calculation_id, error=None,
+            finished_at=datetime.utcnow(),
+        )
+
+    def fail(self, db, worker_id: str, error: str, retry: bool) -> bool:
+        """Record a failed attempt: requeued with exponential backoff while attempts remain and retry is set."""
+        now = datetime.utcnow()
+        if retry and self.attempts < self.max_attempts:
+            return self._release(
+                db, worker_id, status=QUEUED, error=error,
+                run_after=now + timedelta(seconds=settings.JOB_RETRY_BACKOFF * 2 ** (self.attempts - 1)),
+            )
+        return self._release(db, worker_id, status=FAILED, error=error, finished_at=now)
+
+    @classmethod
+    def requeue_expired(cls, db) -> int:
+        """Return jobs whose lease ran out (their worker died) to the queue, or fail them when out of attempts."""
+        now = datetime.utcnow()
+        table = cls.__table__
+        expired = (table.c.status == RUNNING) & (table.c.locked_until < now)
+        failed = db.execute(
+            update(table)
+            .where(expired, table.c.attempts >= table.c.max_attempts)
+            .values(status=FAILED, error="Worker stopped before finishing", locked_by=None, locked_until=None, finished_at=now)
+        ).rowcount
+        requeued = db.execute(
+            update(table)
+            .where(expired)
+            .values(status=QUEUED, error="Worker stopped before finishing", locked_by=None, locked_until=None)
+        ).rowcount
+        db.commit()
+        return failed + requeued
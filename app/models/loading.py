@@ -0,0 +1,15 @@
+from sqlalchemy.orm import joinedload, lazyload, raiseload, selectinload, subqueryload
+
+LOADER_STRATEGIES = {
+    "selectin": selectinload,
+    "joined": joinedload,
+    "subquery": subqueryload,
+    "select": lazyload,
+    "raise": raiseload,
+}
+
+def loader_option(attribute, strategy: str = "selectin"):
+    loader = LOADER_STRATEGIES.get(strategy)
+    if not loader:
+        raise ValueError(f"Unsupported loader strategy: {strategy}")
+    return loader(attribute)
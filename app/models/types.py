@@ -0,0 +1,44 @@
+from sqlalchemy import JSON, SmallInteger, TypeDecorator, Uuid
+from sqlalchemy.dialects.postgresql import JSONB
+
+# Native UUID on PostgreSQL, CHAR(32) on backends without one (SQLite).
+UUID = Uuid
+
+# Binary, indexable JSONB on PostgreSQL; JSON text elsewhere.
+InputsType = JSON().with_variant(JSONB(), "postgresql")
+
+# Stored codes for Calculation.type. Append new types; never renumber, the codes
+# are persisted in every row and index.
+CALCULATION_TYPE_CODES = {
+    "calculation": 0,
+    "addition": 1,
+    "subtraction": 2,
+    "multiplication": 3,
+    "division": 4,
+    "mean": 5,
+    "variance": 6,
+    "stddev": 7,
+    "percentile": 8,
+    "power": 9,
+    "modulo": 10,
+}
+CALCULATION_TYPE_NAMES = {code: name for name, code in CALCULATION_TYPE_CODES.items()}
+
+class CalculationTypeCode(TypeDecorator):
+    """Calculation type names in Python, two-byte SMALLINT codes in the database."""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        try:
+            return CALCULATION_TYPE_CODES[value]
+        except KeyError:
+            raise ValueError(f"Unsupported calculation type: {value}") from None
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return CALCULATION_TYPE_NAMES[value]
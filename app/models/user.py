@@ -1,24 +1,56 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
+import multiprocessing
+import threading
 import uuid
-from typing import Optional, Dict, Any
+from functools import lru_cache
+from typing import Optional, Dict, Any, List
 
 from sqlalchemy import Column, String, DateTime, Boolean
-from sqlalchemy.dialects.postgresql import UUID
+from app.models.types import UUID
 from sqlalchemy.orm import relationship
-from passlib.context import CryptContext
+from sqlalchemy.orm.attributes import set_committed_value
 from jose import JWTError, jwt
 from pydantic import ValidationError
 
+from app.auth.last_login import last_login_buffer
+from app.auth.revocation import token_revocations
 from app.schemas.base import UserCreate
 from app.schemas.user import UserResponse, Token
-from dotenv import load_dotenv
 from app.config import settings
-from app.database import Base
+from app.database import Base, dialect_insert
 from app.models.calculation import Calculation
+from app.models.loading import loader_option
 
-load_dotenv()
+@lru_cache(maxsize=None)
+def password_context():
+    # passlib and the bcrypt backend are only loaded once a password is hashed or checked.
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+
+def hash_pool() -> ProcessPoolExecutor:
+    """
+    The BULK_HASH_WORKERS processes bulk registrations hash passwords on: started
+    on first use and shared, so concurrent batches queue instead of each
+    spawning interpreters of their own.
+    """
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # bcrypt is CPU-bound, so spread it across processes; spawn avoids forking
+            # a server process that may hold locks in other threads.
+            _hash_pool = ProcessPoolExecutor(max_workers=settings.BULK_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _hash_pool
+
+def shutdown_hash_pool() -> None:
+    global _hash_pool
+    with _hash_pool_lock:
+        pool, _hash_pool = _hash_pool, None
+    if pool is not None:
+        pool.shutdown()
 
 class User(Base):
     __tablename__ = 'users'
@@ -34,32 +66,75 @@ class User(Base):
     last_login = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
-    calculations = relationship("Calculation", back_populates="user", cascade="all, delete-orphan")
+    calculations = relationship(
+        "Calculation",
+        back_populates="user",
+        cascade="all, delete-orphan",
+        lazy=settings.RELATIONSHIP_LAZY_MODE
+    )
 
     def __repr__(self):
         return f"<User(name={self.first_name} {self.last_name}, email={self.email})>"
     
+    @classmethod
+    def query_with_calculations(cls, db, strategy: str = "selectin"):
+        return db.query(cls).options(loader_option(cls.calculations, strategy))
+
+    @classmethod
+    def get_with_recent_calculations(cls, db, user_id: uuid.UUID, limit: int = 10) -> Optional["User"]:
+        user = db.query(cls).filter(cls.id == user_id).first()
+        if user is None:
+            return None
+        # Populate only the most recent rows as the loaded collection, so callers
+        # never fall back to a lazy load of the full history.
+        recent = Calculation.recent_for_user(db, user_id, limit)
+        set_committed_value(user, "calculations", recent)
+        for calculation in recent:
+            set_committed_value(calculation, "user", user)
+        return user
+
     @staticmethod
     def hash_password(password: str) -> str:
-        return pwd_context.hash(password)
+        return password_context().hash(password)
     
+    @staticmethod
+    def hash_passwords(passwords: List[str]) -> List[str]:
+        if len(passwords) < settings.BULK_HASH_MIN_BATCH or settings.BULK_HASH_WORKERS <= 1:
+            return [User.hash_password(password) for password in passwords]
+
+        chunksize = max(1, len(passwords) // (settings.BULK_HASH_WORKERS * 4))
+        return list(hash_pool().map(User.hash_password, passwords, chunksize=chunksize))
+
     def verify_password(self, plain_password: str) -> bool:
-        return pwd_context.verify(plain_password, self.password)
+        return password_context().verify(plain_password, self.password)
     
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
         to_encode = data.copy()
         expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=float(settings.ACCESS_TOKEN_EXPIRE_MINUTES)))
         to_encode.update({"exp": expire})
+        to_encode.setdefault("jti", uuid.uuid4().hex)
         return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
     @staticmethod
-    def verify_token(token: str) -> Optional[UUID]:
+    def decode_token(token: str) -> Optional[Dict[str, Any]]:
+        try:
+            return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            return None
+
+    @staticmethod
+    def verify_token(token: str) -> Optional[uuid.UUID]:
+        payload = User.decode_token(token)
+        if payload is None:
+            return None
+        jti = payload.get("jti")
+        if jti and token_revocations.is_revoked(jti):
+            return None
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
             user_id = payload.get("sub")
             return uuid.UUID(user_id) if user_id else None
-        except (JWTError, ValueError):
+        except (TypeError, ValueError):
             return None
         
     @classmethod
@@ -98,6 +173,78 @@ class User(Base):
         except ValueError as e:
             raise e
     
+    @classmethod
+    def bulk_register(cls, db, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results = []
+        accepted = []
+        seen_emails, seen_usernames = set(), set()
+
+        for index, record in enumerate(records):
+            result = {"index": index, "email": None, "username": None, "status": "invalid", "detail": None, "id": None}
+            results.append(result)
+            if not isinstance(record, dict):
+                result["detail"] = "Record must be an object"
+                continue
+            for field in ("email", "username"):
+                if isinstance(record.get(field), str):
+                    result[field] = record[field]
+
+            try:
+                user_create = UserCreate.model_validate(record)
+            except (ValidationError, ValueError, TypeError) as e:
+                result["detail"] = str(e)
+                continue
+
+            result["email"], result["username"] = user_create.email, user_create.username
+            if user_create.email in seen_emails or user_create.username in seen_usernames:
+                result["status"] = "duplicate"
+                result["detail"] = "Username or email repeated in batch"
+                continue
+            seen_emails.add(user_create.email)
+            seen_usernames.add(user_create.username)
+            accepted.append((result, user_create))
+
+        if not accepted:
+            return results
+
+        hashes = cls.hash_passwords([user_create.password for _, user_create in accepted])
+        now = datetime.utcnow()
+        rows = []
+        for (result, user_create), hashed in zip(accepted, hashes):
+            result["id"] = uuid.uuid4()
+            rows.append({
+                "id": result["id"],
+                "first_name": user_create.first_name,
+                "last_name": user_create.last_name,
+                "email": user_create.email,
+                "username": user_create.username,
+                "password": hashed,
+                "is_active": True,
+                "is_verified": False,
+                "created_at": now,
+                "updated_at": now,
+            })
+
+        created_ids = set()
+        chunk_size = settings.BULK_INSERT_CHUNK_SIZE
+        for start in range(0, len(rows), chunk_size):
+            stmt = (
+                dialect_insert(db, cls)
+                .values(rows[start:start + chunk_size])
+                .on_conflict_do_nothing()
+                .returning(cls.id)
+            )
+            created_ids.update(db.execute(stmt).scalars())
+
+        for result, _ in accepted:
+            if result["id"] in created_ids:
+                result["status"] = "created"
+            else:
+                result["status"] = "duplicate"
+                result["detail"] = "Username or email already exists"
+                result["id"] = None
+        return results
+
     @classmethod
     def authenticate(cls, db, username: str, password: str) -> Optional[Dict[str, Any]]:
         user = db.query(cls).filter(
@@ -107,8 +254,15 @@ class User(Base):
         if not user or not user.verify_password(password):
             return None # pragma: no cover
         
-        user.last_login = datetime.utcnow()
-        db.commit()
+        now = datetime.utcnow()
+        if last_login_buffer.enabled:
+            last_login_buffer.record(user.id, now)
+            # Reflect the login in the response without dirtying the row;
+            # the buffer owns the write.
+            set_committed_value(user, "last_login", now)
+        else:
+            user.last_login = now
+            db.commit()
 
         user_response = UserResponse.model_validate(user)
         token_response = Token(
@@ -0,0 +1,151 @@
+"""
+Single-pass statistics over inputs that may be too large to hold at once.
+
+Values are consumed in chunks of STATISTICS_CHUNK_SIZE; each chunk is reduced
+with numpy and folded into a fixed-size summary, so memory stays bounded
+whether the inputs are a list, an array or a stream of arrays.
+"""
+import math
+from itertools import islice
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from app.config import settings
+
+Values = Union[np.ndarray, Iterable[float]]
+
+def iter_chunks(values: Values, chunk_size: Optional[int] = None) -> Iterator[np.ndarray]:
+    """float64 chunks of values; array and list slices avoid a per-item Python loop."""
+    chunk_size = chunk_size or settings.STATISTICS_CHUNK_SIZE
+    if isinstance(values, (np.ndarray, list, tuple)):
+        for start in range(0, len(values), chunk_size):
+            yield np.asarray(values[start:start + chunk_size], dtype=np.float64)
+        return
+    iterator = iter(values)
+    while True:
+        chunk = np.fromiter(islice(iterator, chunk_size), dtype=np.float64)
+        if not len(chunk):
+            return
+        yield chunk
+
+class RunningMoments:
+    """
+    Count, mean and sum of squared deviations (M2), updated a chunk at a time.
+
+    Welford's update generalised to batches (Chan et al.): each chunk's mean
+    and M2 are computed around its own mean, then combined with the running
+    totals, which avoids the cancellation of the sum-of-squares formula.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, chunk: np.ndarray) -> None:
+        n = len(chunk)
+        if not n:
+            return
+        chunk_mean = float(np.mean(chunk))
+        deviations = chunk - chunk_mean
+        chunk_m2 = float(np.dot(deviations, deviations))
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def variance(self, ddof: int = 1) -> float:
+        if self.count <= ddof:
+            raise ValueError(f"Inputs must contain more than {ddof} number{'s' if ddof != 1 else ''}.")
+        return self.m2 / (self.count - ddof)
+
+class TDigest:
+    """
+    Merging t-digest (Dunning) for quantiles of a stream in O(compression) memory.
+
+    Incoming values are buffered and periodically merged with the centroids:
+    everything is sorted by mean and grouped so that no group spans more than
+    one unit of the arcsine scale function. Groups are therefore tiny near
+    the tails and large around the median, which keeps the error on extreme
+    percentiles small.
+    """
+
+    def __init__(self, compression: Optional[float] = None):
+        self.compression = compression or settings.TDIGEST_COMPRESSION
+        self.buffer_size = int(self.compression) * 10
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._means = np.empty(0, dtype=np.float64)
+        self._weights = np.empty(0, dtype=np.float64)
+        self._buffer = []
+        self._buffered = 0
+
+    def __len__(self) -> int:
+        self._merge()
+        return len(self._means)
+
+    def update(self, chunk: np.ndarray) -> None:
+        if not len(chunk):
+            return
+        self.count += len(chunk)
+        self.min = min(self.min, float(chunk.min()))
+        self.max = max(self.max, float(chunk.max()))
+        for start in range(0, len(chunk), self.buffer_size):
+            part = chunk[start:start + self.buffer_size]
+            self._buffer.append(part)
+            self._buffered += len(part)
+            if self._buffered >= self.buffer_size:
+                self._merge()
+
+    def _merge(self) -> None:
+        if not self._buffer:
+            return
+        means = np.concatenate([self._means, *self._buffer])
+        weights = np.concatenate([self._weights, np.ones(self._buffered)])
+        self._buffer, self._buffered = [], 0
+
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        # Quantile at the middle of each centroid, mapped through k(q) = compression/pi * asin(2q - 1).
+        middle = (np.cumsum(weights) - weights / 2) / total
+        k = np.floor(self.compression / math.pi * np.arcsin(np.clip(2 * middle - 1, -1, 1)))
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        self._weights = np.add.reduceat(weights, starts)
+        self._means = np.add.reduceat(means * weights, starts) / self._weights
+
+    def quantile(self, q: float) -> float:
+        """Estimate for quantile q in [0, 1], interpolating between centroid centres and the exact min/max."""
+        self._merge()
+        if not self.count:
+            raise ValueError("Inputs must contain at least one number.")
+        centres = np.cumsum(self._weights) - self._weights / 2
+        positions = np.r_[0.0, centres, float(self.count)]
+        values = np.r_[self.min, self._means, self.max]
+        return float(np.interp(q * self.count, positions, values))
+
+def moments(values: Values) -> RunningMoments:
+    summary = RunningMoments()
+    for chunk in iter_chunks(values):
+        summary.update(chunk)
+    return summary
+
+def percentile(values: Values, p: float) -> float:
+    """
+    The p-th percentile (0-100). Exact (linear interpolation, as numpy.percentile)
+    for up to PERCENTILE_EXACT_MAX_INPUTS values in memory; a t-digest estimate
+    for longer lists and for streams.
+    """
+    if not 0 <= p <= 100:
+        raise ValueError("Percentile must be between 0 and 100.")
+    if isinstance(values, (np.ndarray, list, tuple)) and len(values) <= settings.PERCENTILE_EXACT_MAX_INPUTS:
+        if not len(values):
+            raise ValueError("Inputs must contain at least one number.")
+        return float(np.percentile(np.asarray(values, dtype=np.float64), p))
+    digest = TDigest()
+    for chunk in iter_chunks(values):
+        digest.update(chunk)
+    return digest.quantile(p / 100)
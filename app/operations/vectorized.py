@@ -0,0 +1,156 @@
+"""Array versions of the calculation types, for computing many results in one pass."""
+import math
+from itertools import chain
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+# Each type folds a row's inputs left to right with one binary ufunc, so
+# ufunc.reduceat over the flattened inputs matches get_result() exactly.
+REDUCERS = {
+    "addition": np.add,
+    "subtraction": np.subtract,
+    "multiplication": np.multiply,
+    "division": np.divide,
+    "modulo": np.mod,
+}
+
+# Types whose inputs after the first must be non-zero.
+DIVIDING_TYPES = ("division", "modulo")
+
+def pack_inputs(inputs: Sequence[Sequence[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Flatten ragged rows into (values, offsets); row i is values[offsets[i]:offsets[i + 1]]."""
+    lengths = np.fromiter((len(row) for row in inputs), dtype=np.int64, count=len(inputs))
+    offsets = np.zeros(len(inputs) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    values = np.fromiter(chain.from_iterable(inputs), dtype=np.float64, count=int(offsets[-1]))
+    return values, offsets
+
+def _first_of_row(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    lengths = np.diff(offsets)
+    first = np.zeros(len(values), dtype=bool)
+    first[offsets[:-1][lengths > 0]] = True
+    return first
+
+def invalid_rows(calculation_type: str, values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Boolean mask of rows get_result() would reject before computing: fewer than
+    two inputs, a zero divisor or a percentile outside 0-100. Results that are
+    not finite (0 ** -1, overflow) are left for the caller to check.
+    """
+    lengths = np.diff(offsets)
+    invalid = lengths < 2
+    if calculation_type in DIVIDING_TYPES and len(values):
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        invalid[rows[~_first_of_row(values, offsets) & (values == 0)]] = True
+    elif calculation_type == "percentile" and len(values):
+        present = lengths > 0
+        p = values[offsets[:-1][present]]
+        invalid[np.flatnonzero(present)[(p < 0) | (p > 100)]] = True
+    return invalid
+
+def _row_moments(values: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row mean and sample variance, two-pass (mean first, then squared deviations) for stability."""
+    lengths = np.diff(offsets)
+    starts = np.minimum(offsets[:-1], len(values) - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.add.reduceat(values, starts) / lengths
+        deviations = values - np.repeat(means, lengths)
+        variances = np.add.reduceat(deviations * deviations, starts) / (lengths - 1)
+    return means, variances
+
+def _row_percentiles(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Each row's first value is the percentile of the rest, interpolated linearly as numpy.percentile."""
+    from app.operations.statistics import percentile
+
+    lengths = np.diff(offsets)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    data = ~_first_of_row(values, offsets)
+    # Sort every row's data at once: by row, then by value.
+    order = np.lexsort((values[data], rows[data]))
+    ordered = values[data][order]
+    counts = np.maximum(lengths - 1, 0)
+    data_starts = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(counts[:-1], out=data_starts[1:])
+
+    results = np.full(len(lengths), np.nan)
+    valid = counts > 0
+    p = values[offsets[:-1][valid]]
+    position = np.clip(p, 0, 100) / 100 * (counts[valid] - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, counts[valid] - 1)
+    below = ordered[data_starts[valid] + low]
+    above = ordered[data_starts[valid] + high]
+    results[valid] = below + (above - below) * (position - low)
+
+    # Rows too long for an exact answer get the same estimate as get_result().
+    for row in np.flatnonzero(counts > settings.PERCENTILE_EXACT_MAX_INPUTS):
+        results[row] = percentile(values[offsets[row] + 1:offsets[row + 1]], float(values[offsets[row]]))
+    return results
+
+def _row_powers(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Left-to-right powers, one input position at a time across all rows. Not
+    reduceat: ufunc reductions of np.power don't fold left to right. Results
+    can differ from get_result() in the last bit, as numpy's pow and libm's may.
+    """
+    lengths = np.diff(offsets)
+    results = values[np.minimum(offsets[:-1], len(values) - 1)].copy()
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for position in range(1, int(lengths.max(initial=0))):
+            rows = np.flatnonzero(lengths > position)
+            results[rows] = np.power(results[rows], values[offsets[rows] + position])
+    return results
+
+# Types that aren't a single left fold, computed per row by their own function.
+ROW_FUNCTIONS = {
+    "mean": lambda values, offsets: _row_moments(values, offsets)[0],
+    "variance": lambda values, offsets: _row_moments(values, offsets)[1],
+    "stddev": lambda values, offsets: np.sqrt(_row_moments(values, offsets)[1]),
+    "percentile": _row_percentiles,
+    "power": _row_powers,
+}
+
+def reduce_inputs(calculation_type: str, values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Result of every row; rows flagged by invalid_rows() produce meaningless values."""
+    reducer = REDUCERS.get(calculation_type)
+    function = ROW_FUNCTIONS.get(calculation_type)
+    if reducer is None and function is None:
+        raise ValueError(f"Unsupported calculation type: {calculation_type}")
+    if len(offsets) == 1:
+        return np.empty(0, dtype=np.float64)
+    if not len(values):
+        return np.full(len(offsets) - 1, np.nan)
+    if function is not None:
+        return function(values, offsets)
+    # reduceat needs in-range start indexes even for empty rows, which are invalid anyway.
+    starts = np.minimum(offsets[:-1], len(values) - 1)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        return reducer.reduceat(values, starts)
+
+def validation_error(calculation_type: str, values: np.ndarray) -> Optional[str]:
+    """
+    CalculationBase's rules for one row of inputs held in an array (binary request
+    bodies), or None when they pass. Non-finite values, which JSON cannot carry,
+    are rejected too.
+    """
+    if calculation_type not in REDUCERS and calculation_type not in ROW_FUNCTIONS:
+        return f"Unsupported calculation type: {calculation_type}"
+    if len(values) < 2:
+        return "At least two numbers are required for calculation"
+    if not np.isfinite(values).all():
+        return "Inputs must be finite numbers"
+    if calculation_type in DIVIDING_TYPES and not values[1:].all():
+        return "Cannot divide by zero"
+    if calculation_type == "percentile" and not 0 <= values[0] <= 100:
+        return "Percentile must be between 0 and 100"
+    return None
+
+def array_result(calculation_type: str, values: np.ndarray) -> float:
+    """get_result() for inputs that passed validation_error(), without converting them to a list."""
+    result = float(reduce_inputs(calculation_type, values, np.array([0, len(values)]))[0])
+    if not math.isfinite(result):
+        raise ValueError("Result is not a finite number.")
+    return result
@@ -0,0 +1,152 @@
+"""
+Monthly range partitions for the calculations table (PostgreSQL only).
+
+    python -m app.partitions list
+    python -m app.partitions create [--months-ahead N]
+    python -m app.partitions prune [--retention-months N] [--drop]
+
+Partitions are named calculations_pYYYYMM and cover [first of month, first of
+next month). A DEFAULT partition catches rows outside every managed range;
+creating a partition moves any such rows out of it first.
+"""
+import argparse
+import logging
+import re
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.models.history_version import HistoryVersion
+from app.models.types import UUID
+
+logger = logging.getLogger(__name__)
+
+TABLE = "calculations"
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_PATTERN = re.compile(rf"^{TABLE}_p(\d{{4}})(\d{{2}})$")
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month.year:04d}{month.month:02d}"
+
+def is_partitioned(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(connection.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": TABLE}
+    ).scalar())
+
+def list_partitions(connection) -> List[Tuple[str, date]]:
+    """Managed (monthly) partitions currently attached, oldest first."""
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table)"
+    ), {"table": TABLE}).scalars()
+    partitions = []
+    for name in rows:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+def create_partition(connection, month: date) -> bool:
+    name = partition_name(month)
+    lower, upper = month, add_months(month, 1)
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return False
+
+    # Build the partition standalone and attach it, moving any rows the DEFAULT
+    # partition already holds for this month; a plain CREATE ... PARTITION OF
+    # fails when the default partition contains matching rows.
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    bounds = {"lower": lower, "upper": upper}
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar():
+        connection.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            "WHERE created_at >= :lower AND created_at < :upper RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ), bounds)
+    connection.execute(text(
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+    ))
+    logger.info(f"Created partition {name} for [{lower}, {upper})")
+    return True
+
+def ensure_partitions(connection, months_ahead: Optional[int] = None, today: Optional[date] = None) -> List[str]:
+    """Create the DEFAULT partition and monthly partitions from this month through months_ahead."""
+    if not is_partitioned(connection):
+        return []
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    current = month_start(today or datetime.utcnow().date())
+
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if create_partition(connection, month):
+            created.append(partition_name(month))
+    return created
+
+def expire_partitions(connection, retention_months: Optional[int] = None, drop: Optional[bool] = None,
+                      today: Optional[date] = None) -> List[str]:
+    """Detach (or drop) monthly partitions that end before the retention cutoff."""
+    if not is_partitioned(connection):
+        return []
+    retention_months = settings.PARTITION_RETENTION_MONTHS if retention_months is None else retention_months
+    drop = settings.PARTITION_EXPIRED_ACTION == "drop" if drop is None else drop
+    cutoff = add_months(month_start(today or datetime.utcnow().date()), -retention_months)
+
+    expired = []
+    for name, month in list_partitions(connection):
+        if add_months(month, 1) > cutoff:
+            break
+        # The partition's rows leave every user's history; invalidate what is cached of it.
+        user_ids = connection.execute(text(f"SELECT DISTINCT user_id FROM {name}").columns(user_id=UUID(as_uuid=True))).scalars().all()
+        HistoryVersion.bump(connection, user_ids)
+        connection.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+        if drop:
+            connection.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"{'Dropped' if drop else 'Detached'} expired partition {name}")
+        expired.append(name)
+    return expired
+
+def create_initial_partitions(target, connection, **kwargs) -> None:
+    ensure_partitions(connection)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.database import engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.partitions", description="Manage calculations partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show attached monthly partitions")
+    create = commands.add_parser("create", help="Create partitions for upcoming months")
+    create.add_argument("--months-ahead", type=int, default=None)
+    prune = commands.add_parser("prune", help="Detach or drop partitions past retention")
+    prune.add_argument("--retention-months", type=int, default=None)
+    prune.add_argument("--drop", action="store_true", default=None, help="Drop instead of detaching")
+    args = parser.parse_args(argv)
+
+    with engine.begin() as connection:
+        if args.command == "list":
+            for name, month in list_partitions(connection):
+                print(f"{name}\t{month.isoformat()}\t{add_months(month, 1).isoformat()}")
+        elif args.command == "create":
+            for name in ensure_partitions(connection, args.months_ahead):
+                print(f"created {name}")
+        else:
+            for name in expire_partitions(connection, args.retention_months, args.drop):
+                print(f"expired {name}")
+
+if __name__ == "__main__":
+    main() # pragma: no cover
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import List, Optional
+
+from anyio import to_thread
+
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+loop_lag = registry.histogram("event_loop_lag_seconds", "How late the event loop ran a timer scheduled for now", buckets=LAG_BUCKETS)
+loop_stalls = registry.counter("event_loop_stalls_total", "Times the event loop was blocked longer than LOOP_LAG_WARN_SECONDS")
+threadpool_size = registry.gauge("threadpool_size", "Worker threads AnyIO may run sync endpoints and dependencies on")
+threadpool_busy = registry.gauge("threadpool_busy", "Worker threads currently running sync code")
+threadpool_waiting = registry.gauge("threadpool_waiting", "Sync calls waiting for a free worker thread")
+threadpool_queue_wait = registry.histogram(
+    "threadpool_queue_wait_seconds", "Time a probe call waited for a worker thread", buckets=LAG_BUCKETS
+)
+
+class RuntimeMonitor:
+    """
+    Watches the event loop and the AnyIO threadpool of the running worker.
+
+    A task on the loop sleeps for interval and records how late it wakes up
+    (scheduling lag); every wake-up is also a heartbeat. A separate thread
+    watches the heartbeat, so when the loop stops making progress it can log
+    the stack of whatever is running on the loop thread while it is still
+    blocked, rather than only noticing afterwards. A second task sends a no-op
+    to the threadpool each interval; how long it waits for a thread is the
+    queue wait real sync dependencies see.
+    """
+
+    def __init__(self, interval: Optional[float] = None, warn_after: Optional[float] = None,
+                 threadpool_limit: Optional[int] = None):
+        self.interval = settings.LOOP_MONITOR_INTERVAL if interval is None else interval
+        self.warn_after = settings.LOOP_LAG_WARN_SECONDS if warn_after is None else warn_after
+        self.threadpool_limit = settings.THREADPOOL_SIZE if threadpool_limit is None else threadpool_limit
+        self._tasks: List[asyncio.Task] = []
+        self._limiter = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._reported_heartbeat: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self) -> None:
+        """Call from the event loop (the app lifespan)."""
+        self._limiter = to_thread.current_default_thread_limiter()
+        if self.threadpool_limit > 0:
+            self._limiter.total_tokens = self.threadpool_limit
+        self.sample_threadpool()
+        if not self.enabled or self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._tasks = [loop.create_task(self._measure_lag()), loop.create_task(self._probe_threadpool())]
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def sample_threadpool(self) -> None:
+        if self._limiter is None:
+            return
+        threadpool_size.set(self._limiter.total_tokens)
+        threadpool_busy.set(self._limiter.borrowed_tokens)
+        threadpool_waiting.set(self._limiter.statistics().tasks_waiting)
+
+    async def _measure_lag(self) -> None:
+        while True:
+            scheduled = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            loop_lag.observe(max(0.0, now - scheduled - self.interval))
+            self.sample_threadpool()
+
+    async def _probe_threadpool(self) -> None:
+        while True:
+            queued = time.monotonic()
+            started = await to_thread.run_sync(time.monotonic)
+            threadpool_queue_wait.observe(max(0.0, started - queued))
+            await asyncio.sleep(self.interval)
+
+    def check_stall(self) -> Optional[str]:
+        """Log (once per stall) what the loop thread is running if it has missed its heartbeat; returns the stack."""
+        heartbeat = self._heartbeat
+        blocked_for = time.monotonic() - heartbeat - self.interval
+        if blocked_for < self.warn_after or heartbeat == self._reported_heartbeat:
+            return None
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        self._reported_heartbeat = heartbeat
+        stack = "".join(traceback.format_stack(frame))
+        loop_stalls.inc()
+        logger.warning(f"Event loop blocked for {blocked_for:.3f}s; loop thread is running:\n{stack}")
+        return stack
+
+    def _watch(self) -> None:
+        poll = max(0.01, min(self.interval, self.warn_after) / 2)
+        while not self._stop.wait(poll):
+            try:
+                self.check_stall()
+            except Exception as e:
+                logger.error(f"Event loop watchdog failed: {e}")
+
+runtime_monitor = RuntimeMonitor()
@@ -1,5 +1,13 @@
 from .base import UserBase, PasswordMixin, UserCreate, UserLogin
-from .user import UserResponse, Token, TokenData
+from .user import (
+    UserResponse,
+    UserWithCalculationsResponse,
+    BulkRegistrationRequest,
+    BulkRegistrationResult,
+    BulkRegistrationResponse,
+    Token,
+    TokenData,
+)
 
 __all__ = [
     "UserBase",
@@ -7,6 +15,10 @@ __all__ = [
     "UserCreate",
     "UserLogin",
     "UserResponse",
+    "UserWithCalculationsResponse",
+    "BulkRegistrationRequest",
+    "BulkRegistrationResult",
+    "BulkRegistrationResponse",
     "Token",
     "TokenData",
 ]
\ No newline at end of file
@@ -1,6 +1,6 @@
 from enum import Enum
 from pydantic import BaseModel, Field, ConfigDict, model_validator, field_validator
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 from uuid import UUID
 from datetime import datetime
 
@@ -9,11 +9,18 @@ class CalculationType(str, Enum):
     SUBTRACTION = "subtraction"
     MULTIPLICATION = "multiplication"
     DIVISION = "division"
+    MEAN = "mean"
+    VARIANCE = "variance"
+    STDDEV = "stddev"
+    PERCENTILE = "percentile"
+    POWER = "power"
+    MODULO = "modulo"
 
 class CalculationBase(BaseModel):
     type: CalculationType = Field(
         ...,
-        description="Type of calculation (addition, subtraction, multiplication, division)",
+        description="Type of calculation (addition, subtraction, multiplication, division, mean, variance, "
+                    "stddev, percentile, power, modulo)",
         example="addition"
     )
     inputs: List[float] = Field(
@@ -42,9 +49,11 @@ class CalculationBase(BaseModel):
     def validate_inputs(self) -> "CalculationBase":
         if len(self.inputs) < 2:
             raise ValueError("At least two numbers are required for calculation")
-        if self.type == CalculationType.DIVISION:
+        if self.type in (CalculationType.DIVISION, CalculationType.MODULO):
             if any(x == 0 for x in self.inputs[1:]):
                 raise ValueError("Cannot divide by zero")
+        if self.type == CalculationType.PERCENTILE and not 0 <= self.inputs[0] <= 100:
+            raise ValueError("Percentile must be between 0 and 100")
         return self
     
     model_config = ConfigDict(
@@ -52,7 +61,8 @@ class CalculationBase(BaseModel):
         json_schema_extra={
             "examples": [
                 {"type": "addition", "inputs": [10.5, 3, 2]},
-                {"type": "division", "inputs": [100, 2]}
+                {"type": "division", "inputs": [100, 2]},
+                {"type": "percentile", "inputs": [95, 12, 15, 11, 40, 13]}
             ]
         }
     )
@@ -126,3 +136,42 @@ class CalculationResponse(CalculationBase):
             }
         }
     )
+
+
+class CalculationStatsResponse(BaseModel):
+    total: int = Field(..., description="Number of calculations", example=3)
+    by_type: Dict[str, int] = Field(..., description="Number of calculations per type", example={"addition": 2, "division": 1})
+    result_sum: Optional[float] = Field(None, description="Sum of all results", example=42.5)
+    result_avg: Optional[float] = Field(None, description="Mean result", example=14.17)
+    result_min: Optional[float] = Field(None, description="Smallest result", example=2)
+    result_max: Optional[float] = Field(None, description="Largest result", example=25.5)
+
+class CalculationBulkUpdateItem(BaseModel):
+    id: UUID = Field(..., description="Calculation to update")
+    inputs: List[float] = Field(..., min_length=2, description="New inputs", example=[42, 7])
+
+class CalculationBulkUpdateRequest(BaseModel):
+    updates: List[CalculationBulkUpdateItem] = Field(..., min_length=1, description="Calculations and their new inputs")
+
+class CalculationBulkUpdateResult(BaseModel):
+    index: int
+    id: UUID
+    status: Literal["updated", "not_found", "invalid"]
+    result: Optional[float] = None
+    detail: Optional[str] = None
+
+class CalculationBulkUpdateResponse(BaseModel):
+    updated: int
+    not_found: int
+    invalid: int
+    results: List[CalculationBulkUpdateResult]
+
+class CalculationSource(BaseModel):
+    position: int = Field(..., ge=0, description="Index in inputs that takes the source's result", example=0)
+    calculation_id: UUID = Field(..., description="Calculation whose result feeds that input")
+
+class CalculationSourcesRequest(BaseModel):
+    sources: List[CalculationSource] = Field(..., description="Inputs fed by other calculations; an empty list unlinks them all")
+
+class CalculationNodeResponse(CalculationResponse):
+    sources: List[CalculationSource] = Field(default_factory=list, description="Inputs fed by other calculations")
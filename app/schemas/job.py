@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Literal, Optional
+from uuid import UUID
+from pydantic import BaseModel, ConfigDict, Field
+
+from .calculation import CalculationBase
+
+class JobCreate(CalculationBase):
+    priority: int = Field(0, ge=-10, le=10, description="Jobs with higher priority are claimed first; capped at JOB_MAX_PRIORITY", example=0)
+
+class JobResponse(BaseModel):
+    id: UUID
+    type: str
+    priority: int
+    status: Literal["queued", "running", "succeeded", "failed"]
+    attempts: int
+    max_attempts: int
+    result: Optional[float] = None
+    calculation_id: Optional[UUID] = Field(None, description="Calculation stored when the job succeeded")
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,7 +1,9 @@
-from typing import Optional
+from typing import Any, List, Literal, Optional
 from uuid import UUID
 from datetime import datetime
-from pydantic import BaseModel, EmailStr, ConfigDict
+from pydantic import BaseModel, EmailStr, ConfigDict, Field
+
+from .calculation import CalculationResponse
 
 class UserResponse(BaseModel):
     id: UUID
@@ -16,6 +18,26 @@ class UserResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class UserWithCalculationsResponse(UserResponse):
+    calculations: List[CalculationResponse] = []
+
+class BulkRegistrationRequest(BaseModel):
+    users: List[Any] = Field(..., min_length=1, description="User records to register")
+
+class BulkRegistrationResult(BaseModel):
+    index: int
+    email: Optional[str] = None
+    username: Optional[str] = None
+    status: Literal["created", "duplicate", "invalid"]
+    detail: Optional[str] = None
+    id: Optional[UUID] = None
+
+class BulkRegistrationResponse(BaseModel):
+    created: int
+    duplicates: int
+    invalid: int
+    results: List[BulkRegistrationResult]
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
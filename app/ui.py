@@ -0,0 +1,53 @@
+import hashlib
+from functools import lru_cache
+from typing import Dict
+
+from fastapi import Request, Response
+
+from app.cache.history import etag_matches
+from app.compression import available_encodings, compress, negotiate_encoding
+from app.config import settings
+
+class PrecompressedPage:
+    """
+    A static page rendered once, with every Content-Encoding variant compressed
+    ahead of time at maximum level, so serving it is a dict lookup.
+
+    ETags are derived from the content, so they stay valid across restarts and
+    workers; each encoding gets its own tag because the bytes differ.
+    """
+
+    def __init__(self, body: bytes, media_type: str = "text/html; charset=utf-8", max_age: int = 0):
+        self.media_type = media_type
+        self.cache_control = f"public, max-age={max_age}"
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        self.variants: Dict[str, bytes] = {"identity": body}
+        for encoding in available_encodings():
+            compressed = compress(body, encoding)
+            if len(compressed) < len(body):
+                self.variants[encoding] = compressed
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+            for encoding in self.variants
+        }
+
+    def response(self, request: Request) -> Response:
+        encodings = [encoding for encoding in self.variants if encoding != "identity"]
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), encodings) or "identity"
+        headers = {"ETag": self.etags[encoding], "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        # Only the negotiated variant's tag validates: a cache holding another
+        # encoding must not revalidate it for a client that cannot decode it.
+        if etag_matches(request.headers.get("if-none-match"), self.etags[encoding]):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.variants[encoding], media_type=self.media_type, headers=headers)
+
+@lru_cache(maxsize=None)
+def index_page() -> PrecompressedPage:
+    # index.html has no per-request data, so render it once with an empty context.
+    from fastapi.templating import Jinja2Templates
+    templates = Jinja2Templates(directory="templates")
+    body = templates.get_template("index.html").render().encode()
+    return PrecompressedPage(body, max_age=settings.UI_CACHE_MAX_AGE)
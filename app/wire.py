@@ -0,0 +1,102 @@
+"""
+Binary request and response bodies for calculations, alongside JSON.
+
+application/octet-stream is one frame: a 16-byte little-endian header
+(magic b"CALC", version, flags, type code, value count) followed by the values
+as little-endian float64, 8-byte aligned so they are read in place with
+numpy.frombuffer. A request frame carries the inputs; a response frame carries
+the result, with the calculation id in the X-Calculation-Id header.
+
+application/msgpack is the JSON document as a MessagePack map, except that
+inputs may be, and in responses are, a bin of little-endian float64 values.
+"""
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+import msgpack
+
+from app.compression import negotiate_encoding
+from app.models.types import CALCULATION_TYPE_CODES, CALCULATION_TYPE_NAMES
+
+JSON = "application/json"
+OCTET_STREAM = "application/octet-stream"
+MSGPACK = "application/msgpack"
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": MSGPACK}
+
+MAGIC = b"CALC"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHQ")
+
+class WireFormatError(ValueError):
+    """The body does not match its Content-Type."""
+
+def available_media_types() -> tuple:
+    """Supported calculation media types in server preference order."""
+    return (JSON, OCTET_STREAM, MSGPACK)
+
+def media_type(content_type: Optional[str]) -> str:
+    name = (content_type or JSON).partition(";")[0].strip().lower()
+    return MEDIA_TYPE_ALIASES.get(name, name)
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """The response type for an Accept header, by the same q-value rules as Content-Encoding; JSON by default."""
+    if accept:
+        for alias, name in MEDIA_TYPE_ALIASES.items():
+            accept = accept.replace(alias, name)
+    return negotiate_encoding(accept, available_media_types()) or JSON
+
+def float64_view(data: bytes):
+    """Little-endian float64 values of data, without copying."""
+    import numpy as np
+
+    if len(data) % 8:
+        raise WireFormatError("Inputs must be a whole number of 8-byte floats")
+    return np.frombuffer(data, dtype="<f8")
+
+def float64_bytes(values) -> bytes:
+    import numpy as np
+
+    return np.asarray(values, dtype="<f8").tobytes()
+
+def decode_frame(body: bytes) -> Tuple[str, Any]:
+    """(calculation type, inputs array viewing body) from an octet-stream request."""
+    if len(body) < HEADER.size:
+        raise WireFormatError(f"Body is shorter than the {HEADER.size}-byte header")
+    magic, version, _flags, code, count = HEADER.unpack_from(body)
+    if magic != MAGIC or version != VERSION:
+        raise WireFormatError("Body is not a version 1 calculation frame")
+    if len(body) != HEADER.size + 8 * count:
+        raise WireFormatError(f"Header announces {count} values but the body holds {(len(body) - HEADER.size) / 8:g}")
+    calculation_type = CALCULATION_TYPE_NAMES.get(code)
+    if calculation_type is None or code == CALCULATION_TYPE_CODES["calculation"]:
+        raise WireFormatError(f"Unsupported calculation type code: {code}")
+    return calculation_type, float64_view(memoryview(body)[HEADER.size:])
+
+def encode_frame(calculation_type: str, values) -> bytes:
+    data = float64_bytes(values)
+    return HEADER.pack(MAGIC, VERSION, 0, CALCULATION_TYPE_CODES[calculation_type], len(data) // 8) + data
+
+def decode_msgpack(body: bytes) -> Dict[str, Any]:
+    """
+    The request map with its inputs as a float64 array: a view of the unpacked
+    bytes for bin inputs, a copy for an array of numbers.
+    """
+    try:
+        data = msgpack.unpackb(body, raw=False)
+    except (ValueError, TypeError) as e:
+        raise WireFormatError(f"Invalid MessagePack body: {e}") from None
+    if not isinstance(data, dict):
+        raise WireFormatError("MessagePack body must be a map")
+    inputs = data.get("inputs")
+    if isinstance(inputs, bytes):
+        data["inputs"] = float64_view(inputs)
+    elif isinstance(inputs, list):
+        import numpy as np
+
+        if not all(isinstance(x, (int, float)) and not isinstance(x, bool) for x in inputs):
+            raise WireFormatError("Inputs must be numbers")
+        data["inputs"] = np.array(inputs, dtype="<f8")
+    return data
+
+def encode_msgpack(document: Dict[str, Any]) -> bytes:
+    return msgpack.packb(document, use_bin_type=True)
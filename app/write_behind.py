@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.config import settings
+from app.database import SessionLocal, default_replica_router
+from app.metrics import registry
+from app.models.calculation import Calculation
+from app.models.history_version import HistoryVersion
+
+logger = logging.getLogger(__name__)
+
+flush_seconds = registry.histogram("write_behind_flush_seconds", "Time spent writing one batch of calculations")
+batch_size_histogram = registry.histogram(
+    "write_behind_batch_size", "Calculations written per batch",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+queue_depth_gauge = registry.gauge("write_behind_queue_depth", "Calculations waiting to be written")
+rejected_counter = registry.counter("write_behind_rejected_total", "Calculations refused because the queue was full")
+dropped_counter = registry.counter("write_behind_dropped_total", "Queued calculations the database refused to store")
+
+class WriteBufferFull(Exception):
+    pass
+
+class CalculationWriteBuffer:
+    """
+    Queues new calculations in memory and persists them with multi-row INSERTs.
+
+    The flusher thread writes when batch_size rows are waiting or every
+    flush_interval seconds. The queue is bounded: submit raises WriteBufferFull
+    instead of growing without limit when the database falls behind. Queued
+    rows are not visible to reads until flushed and are lost if the process
+    dies before the flush on shutdown.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        flush_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        max_queue: Optional[int] = None
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = settings.WRITE_BEHIND_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.batch_size = batch_size or settings.WRITE_BEHIND_BATCH_SIZE
+        self.max_queue = max_queue or settings.WRITE_BEHIND_MAX_QUEUE
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        queue_depth_gauge.set_function(lambda: len(self._queue))
+
+    @property
+    def enabled(self) -> bool:
+        return self.flush_interval > 0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def submit(self, calculation: Calculation) -> Calculation:
+        """Queue a calculation (result already computed); assigns its id and timestamps."""
+        now = datetime.utcnow()
+        if calculation.id is None:
+            calculation.id = uuid.uuid4()
+        calculation.created_at = calculation.updated_at = now
+        row = {
+            "id": calculation.id,
+            "user_id": calculation.user_id,
+            "type": calculation.type,
+            "inputs": calculation.inputs,
+            "result": calculation.result,
+            "created_at": now,
+            "updated_at": now,
+        }
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                rejected_counter.inc()
+                raise WriteBufferFull(f"{len(self._queue)} calculations are already waiting to be written")
+            self._queue.append(row)
+            full = len(self._queue) >= self.batch_size
+        if full:
+            self._wake.set()
+        return calculation
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of rows stored."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    return written
+                stored = self._write_batch(batch)
+                if stored is None:
+                    with self._lock:
+                        self._queue.extendleft(reversed(batch))
+                    return written
+                written += stored
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> Optional[int]:
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            try:
+                db.execute(insert(Calculation.__table__).values(batch))
+                # Core inserts skip the ORM event that bumps the users' history versions.
+                HistoryVersion.bump(db, {row["user_id"] for row in batch})
+                db.commit()
+                stored = batch
+            except IntegrityError:
+                # One bad row (e.g. its user was deleted meanwhile) must not block the rest.
+                db.rollback()
+                stored = self._write_individually(db, batch)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Failed to write {len(batch)} queued calculations, will retry: {e}")
+            return None
+        finally:
+            db.close()
+        flush_seconds.observe(time.perf_counter() - started)
+        batch_size_histogram.observe(len(stored))
+
+        replica_router = default_replica_router()
+        for user_id in {row["user_id"] for row in stored}:
+            replica_router.note_write(user_id)
+        return len(stored)
+
+    def _write_individually(self, db, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        stored = []
+        for row in batch:
+            try:
+                db.execute(insert(Calculation.__table__).values(row))
+                HistoryVersion.bump(db, [row["user_id"]])
+                db.commit()
+                stored.append(row)
+            except IntegrityError as e:
+                db.rollback()
+                dropped_counter.inc()
+                logger.error(f"Dropping queued calculation {row['id']}: {e}")
+        return stored
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="calculation-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+calculation_write_buffer = CalculationWriteBuffer()
@@ -0,0 +1,68 @@
+"""
+Measure what each response-compression choice costs and saves.
+
+    python -m benchmarks.bench_compression [rows] [budget ms CPU/MB]
+
+For a calculation-history JSON body of the given size, prints CPU cost and
+compressed size for every gzip/brotli level the middleware may pick, marks the
+strongest levels within the budget (default 20) and prints them as the
+COMPRESSION_*_LEVEL settings to deploy, then times CompressionMiddleware end
+to end on a streaming response.
+"""
+import asyncio
+import sys
+import time
+
+from app.compression import available_encodings
+from app.middleware.compression import LEVEL_CANDIDATES, CompressionMiddleware, choose_levels, measure_level, sample_payload
+
+def streaming_app(payload: bytes, chunk_size: int = 16384):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        for start in range(0, len(payload), chunk_size):
+            await send({"type": "http.response.body", "body": payload[start:start + chunk_size], "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+    return app
+
+async def run(app, encoding: str, requests: int) -> float:
+    scope = {"type": "http", "path": "/bench", "headers": [(b"accept-encoding", encoding.encode())]}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / requests
+
+def main(rows: int = 1000, budget: float = 20.0) -> None:
+    payload = sample_payload(rows)
+    chosen = choose_levels(budget, payload)
+
+    print(f"payload {len(payload) / 1024:.0f} KiB, budget {budget:g} ms CPU/MB")
+    print(f"{'encoding':<10}{'level':>6}{'ms/MB':>10}{'ratio':>8}{'KiB':>8}")
+    for encoding in available_encodings():
+        for level in LEVEL_CANDIDATES[encoding]:
+            cost, ratio = measure_level(encoding, level, payload)
+            marker = "  <- chosen" if chosen[encoding] == level else ""
+            print(f"{encoding:<10}{level:>6}{cost:>10.1f}{ratio:>8.3f}{len(payload) * ratio / 1024:>8.0f}{marker}")
+
+    print()
+    setting_names = {"gzip": "COMPRESSION_GZIP_LEVEL", "br": "COMPRESSION_BR_LEVEL"}
+    for encoding in available_encodings():
+        print(f"{setting_names[encoding]}={chosen[encoding]}")
+
+    requests = 50
+    baseline = asyncio.run(run(streaming_app(payload), "identity", requests))
+    middleware = CompressionMiddleware(streaming_app(payload), levels=chosen)
+    print()
+    print(f"{'uncompressed response':<30}{baseline * 1000:>10.2f} ms")
+    for encoding in available_encodings():
+        elapsed = asyncio.run(run(middleware, encoding, requests))
+        print(f"{encoding + ' level ' + str(chosen[encoding]):<30}{elapsed * 1000:>10.2f} ms")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, float(sys.argv[2]) if len(sys.argv) > 2 else 20.0)
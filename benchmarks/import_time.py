@@ -0,0 +1,63 @@
+"""
+Show where worker start-up time goes while importing the app.
+
+    python -m benchmarks.import_time [--module main] [--top 25] [--runs 5]
+
+Imports the module in fresh interpreters with -X importtime and reports, for the
+fastest run, the cumulative import time of the module and of each app module
+and third-party package it pulls in. Run it before and after adding an import
+to the request path to see what that import costs every worker.
+"""
+import argparse
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+def profile_import(module: str) -> Tuple[float, List[Tuple[str, int, int, int]]]:
+    """Returns wall seconds and (name, depth, self_us, cumulative_us) per imported module."""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - started
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return wall, entries
+
+def group_by_package(entries: List[Tuple[str, int, int, int]], app_packages=("app", "main")) -> Dict[str, int]:
+    """Self time summed per app module, and per top-level package for everything else."""
+    totals: Dict[str, int] = {}
+    for name, _, self_us, _ in entries:
+        top = name.split(".")[0]
+        key = name if top in app_packages else top
+        totals[key] = totals.get(key, 0) + self_us
+    return totals
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.import_time", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    # Keep the fastest run: the later ones have a warm filesystem cache, like a real restart.
+    wall, entries = min((profile_import(args.module) for _ in range(args.runs)), key=lambda run: run[0])
+    cumulative = next((total for name, _, _, total in entries if name == args.module), 0)
+
+    print(f"{'interpreter + import ' + args.module:<40}{wall * 1000:>10.1f} ms")
+    print(f"{'import ' + args.module:<40}{cumulative / 1000:>10.1f} ms")
+    print()
+    print(f"{'module / package':<40}{'self ms':>10}{'share':>8}")
+    for name, self_us in sorted(group_by_package(entries).items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<40}{self_us / 1000:>10.1f}{self_us / max(cumulative, 1):>8.0%}")
+
+if __name__ == "__main__":
+    main()
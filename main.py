@@ -1,9 +1,65 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
-from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel, Field, field_validator 
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from uuid import UUID
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator 
 from fastapi.exceptions import RequestValidationError
+from sqlalchemy.orm import Session
+from app import archive
+from app.auth.dependencies import get_current_active_user, get_current_admin_user, get_current_user, get_current_user_id, oauth2_scheme
+from app.auth.last_login import last_login_buffer
+from app.auth.revocation import revoke_token, token_revocations
+from app.cache.history import etag_matches, history_cache
+from app.cache.shared import memoized_result
+from app.calculation_events import calculation_events
+from app.config import settings
+from app.database import default_replica_router, get_db, get_read_db
+from app.metrics import registry
+from app.middleware.admission import AdmissionControlMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.models.calculation import Calculation
+from app.models.job import CalculationJob, JobQueueFull
+from app.models.calculation_dependency import CalculationCycleError, CalculationDependency, CalculationSourceNotFound
+from app.models.user import User, shutdown_hash_pool
 from app.operations import add, subtract, multiply, divide
+from app.runtime_monitor import runtime_monitor
+from app.schemas.calculation import (
+    CalculationBase,
+    CalculationBulkUpdateRequest,
+    CalculationBulkUpdateResponse,
+    CalculationNodeResponse,
+    CalculationResponse,
+    CalculationSourcesRequest,
+    CalculationStatsResponse,
+    CalculationType,
+)
+from app.schemas.job import JobCreate, JobResponse
+from app.schemas.user import (
+    BulkRegistrationRequest,
+    BulkRegistrationResponse,
+    UserResponse,
+    UserWithCalculationsResponse,
+)
+from app.ui import index_page
+from app.wire import (
+    JSON,
+    MSGPACK,
+    OCTET_STREAM,
+    WireFormatError,
+    available_media_types,
+    decode_frame,
+    decode_msgpack,
+    encode_frame,
+    encode_msgpack,
+    float64_bytes,
+    media_type,
+    negotiate_media_type,
+)
+from app.write_behind import WriteBufferFull, calculation_write_buffer
 import uvicorn
 import logging
 
@@ -11,9 +67,32 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(name)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    replica_router = default_replica_router()
+    replica_router.start()
+    last_login_buffer.start()
+    token_revocations.start()
+    calculation_write_buffer.start()
+    index_page()
+    runtime_monitor.start()
+    yield
+    await calculation_events.stop()
+    shutdown_hash_pool()
+    runtime_monitor.stop()
+    calculation_write_buffer.stop()
+    token_revocations.stop()
+    last_login_buffer.stop()
+    replica_router.stop()
 
-templates = Jinja2Templates(directory="templates")
+app = FastAPI(lifespan=lifespan)
+
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+calculation_list_adapter = TypeAdapter(List[CalculationResponse])
 
 class OperationRequest(BaseModel):
     a: float = Field(..., description="The first number")
@@ -37,6 +116,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
         status_code=exc.status_code,
         content={"error": exc.detail},
+        headers=exc.headers,
     )
 
 @app.exception_handler(RequestValidationError)
@@ -48,9 +128,18 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"error": error_messages}
     )
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_route():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health")
+async def health_route():
+    # Liveness only, for the container HEALTHCHECK; admission control exempts it.
+    return {"status": "ok"}
+
 @app.get("/")
 async def read_root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return index_page().response(request)
 
 @app.post("/add", response_model=OperationResponse, responses={400: {"model": ErrorResponse}})
 async def add_route(operation: OperationRequest):
@@ -107,5 +196,380 @@ async def divide_route(operation: OperationRequest):
         logger.error(f"Divide Operation Internal Error: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@app.get("/users/me/calculations/recent", response_model=UserWithCalculationsResponse, responses={401: {"model": ErrorResponse}})
+async def recent_calculations_route(
+    limit: int = Query(10, ge=1, le=100),
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    user = User.get_with_recent_calculations(db, current_user.id, limit)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return UserWithCalculationsResponse.model_validate(user)
+
+@app.post("/users/bulk-register", response_model=BulkRegistrationResponse, responses={401: {"model": ErrorResponse}, 403: {"model": ErrorResponse}, 413: {"model": ErrorResponse}})
+async def bulk_register_route(
+    request: BulkRegistrationRequest,
+    current_user: UserResponse = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    if len(request.users) > settings.BULK_REGISTER_MAX_RECORDS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BULK_REGISTER_MAX_RECORDS} users per request")
+    # Hashing a large batch takes seconds to minutes; keep it off the event loop.
+    results = await run_in_threadpool(User.bulk_register, db, request.users)
+    db.commit()
+    counts = Counter(result["status"] for result in results)
+    logger.info(f"Bulk registration: {counts['created']} created, {counts['duplicate']} duplicate, {counts['invalid']} invalid")
+    return BulkRegistrationResponse(
+        created=counts["created"],
+        duplicates=counts["duplicate"],
+        invalid=counts["invalid"],
+        results=results
+    )
+
+@app.post("/auth/logout", status_code=204, responses={401: {"model": ErrorResponse}})
+async def logout_route(
+    token: str = Depends(oauth2_scheme),
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    payload = User.decode_token(token)
+    if payload and payload.get("jti"):
+        expires_at = datetime.utcfromtimestamp(payload["exp"]) if "exp" in payload else None
+        revoke_token(db, payload["jti"], current_user.id, expires_at)
+        db.commit()
+    return Response(status_code=204)
+
+def calculation_body_openapi(model: Type[BaseModel]) -> Dict[str, Any]:
+    """OpenAPI requestBody for routes that parse a calculation themselves with read_calculation_body()."""
+    binary = {"schema": {"type": "string", "format": "binary"}}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {JSON: {"schema": model.model_json_schema()}, OCTET_STREAM: binary, MSGPACK: binary},
+        }
+    }
+
+def body_validation_error(error: ValidationError) -> RequestValidationError:
+    # Located under "body", as FastAPI reports errors in a declared body model.
+    return RequestValidationError([{**detail, "loc": ("body", *detail["loc"])} for detail in error.errors()])
+
+async def read_calculation_body(request: Request, model: Type[CalculationBase]) -> Tuple[CalculationBase, Optional[Any]]:
+    """
+    The request body as model, from JSON or from a binary body (app.wire). Binary
+    inputs are checked in one vectorized pass instead of number by number and are
+    also returned as a float64 array, None for JSON.
+    """
+    content_type = media_type(request.headers.get("content-type"))
+    body = await request.body()
+    if content_type == JSON:
+        try:
+            return model.model_validate_json(body), None
+        except ValidationError as e:
+            raise body_validation_error(e)
+    if content_type not in available_media_types():
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Type {content_type}; use one of {', '.join(available_media_types())}")
+
+    from app.operations.vectorized import validation_error
+
+    try:
+        if content_type == OCTET_STREAM:
+            calculation_type, values = decode_frame(body)
+            fields = {"type": calculation_type}
+        else:
+            fields = decode_msgpack(body)
+            values = fields.pop("inputs", None)
+    except WireFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if values is None:
+        raise HTTPException(status_code=400, detail="inputs: Field required")
+    try:
+        # The remaining fields get the model's own validation; the placeholder
+        # inputs stand in for the array, which validation_error() checks.
+        calculation_in = model.model_validate({**fields, "inputs": [1.0, 1.0]})
+    except ValidationError as e:
+        raise body_validation_error(e)
+    error = validation_error(calculation_in.type.value, values)
+    if error is not None:
+        raise HTTPException(status_code=400, detail=error)
+    return calculation_in.model_copy(update={"inputs": values.tolist()}), values
+
+def binary_calculation_response(content_type: str, calculation: CalculationResponse, status_code: int, values=None) -> Response:
+    """
+    calculation as an octet-stream result frame, its id in X-Calculation-Id, or
+    as a MessagePack map with bin inputs. JSON goes through response_model instead.
+    """
+    if content_type == OCTET_STREAM:
+        return Response(
+            encode_frame(calculation.type.value, [calculation.result]),
+            status_code=status_code,
+            media_type=OCTET_STREAM,
+            headers={"X-Calculation-Id": str(calculation.id)},
+        )
+    document = calculation.model_dump(mode="json")
+    document["inputs"] = float64_bytes(calculation.inputs if values is None else values)
+    return Response(encode_msgpack(document), status_code=status_code, media_type=MSGPACK)
+
+@app.post(
+    "/calculations",
+    response_model=CalculationResponse,
+    status_code=201,
+    responses={
+        201: {"content": {OCTET_STREAM: {}, MSGPACK: {}}},
+        202: {"model": CalculationResponse, "description": "Queued for write-behind"},
+        400: {"model": ErrorResponse},
+        401: {"model": ErrorResponse},
+        415: {"model": ErrorResponse},
+        503: {"model": ErrorResponse},
+    },
+    openapi_extra=calculation_body_openapi(CalculationBase),
+)
+async def create_calculation_route(
+    request: Request,
+    response: Response,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    calculation_in, values = await read_calculation_body(request, CalculationBase)
+    accept = negotiate_media_type(request.headers.get("accept"))
+    calculation = Calculation.create_calculation(calculation_in.type.value, current_user.id, calculation_in.inputs)
+    try:
+        calculation.result = memoized_result(calculation, values)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if calculation_write_buffer.enabled:
+        try:
+            calculation_write_buffer.submit(calculation)
+        except WriteBufferFull as e:
+            logger.warning(f"Write-behind queue full: {e}")
+            raise HTTPException(status_code=503, detail="Too many calculations waiting to be saved, please retry", headers={"Retry-After": "1"})
+        response.status_code = 202
+    else:
+        db.info["user_id"] = current_user.id
+        db.add(calculation)
+        db.commit()
+        db.refresh(calculation)
+
+    calculation_out = CalculationResponse.model_validate(calculation)
+    if accept != JSON:
+        return binary_calculation_response(accept, calculation_out, response.status_code or 201, values)
+    return calculation_out
+
+@app.patch("/calculations", response_model=CalculationBulkUpdateResponse, responses={401: {"model": ErrorResponse}, 413: {"model": ErrorResponse}})
+async def bulk_update_calculations_route(
+    request: CalculationBulkUpdateRequest,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    if len(request.updates) > settings.BULK_UPDATE_MAX_RECORDS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BULK_UPDATE_MAX_RECORDS} calculations per request")
+    db.info["user_id"] = current_user.id
+    results = Calculation.bulk_update_inputs(db, current_user.id, [(update.id, update.inputs) for update in request.updates])
+    db.commit()
+    counts = Counter(result["status"] for result in results)
+    return CalculationBulkUpdateResponse(
+        updated=counts["updated"],
+        not_found=counts["not_found"],
+        invalid=counts["invalid"],
+        results=results
+    )
+
+def cached_user_response(request: Request, db: Session, user_id: UUID, kind: str, params: str, build: Callable[[], bytes]) -> Response:
+    # Keeps the version read (and the build) on the primary right after this user writes.
+    db.info["user_id"] = user_id
+    # Read the version before building so a concurrent write can only make the
+    # stored body look older than it is, never newer.
+    version = history_cache.version(db, user_id)
+    etag = history_cache.etag(user_id, kind, params, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    body = history_cache.get(user_id, kind, params, version)
+    if body is None:
+        body = build()
+        history_cache.put(user_id, kind, params, version, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/calculations/history", response_model=List[CalculationResponse], responses={304: {"description": "Not modified"}, 400: {"model": ErrorResponse}, 401: {"model": ErrorResponse}})
+async def calculation_history_route(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    user_id = current_user.id
+
+    def build() -> bytes:
+        calculations = archive.history_for_user(db, user_id, limit, offset)
+        return calculation_list_adapter.dump_json(
+            [CalculationResponse.model_validate(calculation) for calculation in calculations]
+        )
+    return cached_user_response(request, db, user_id, "history", f"{limit}.{offset}", build)
+
+@app.get("/calculations/stats", response_model=CalculationStatsResponse, responses={304: {"description": "Not modified"}, 400: {"model": ErrorResponse}, 401: {"model": ErrorResponse}})
+async def calculation_stats_route(
+    request: Request,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    user_id = current_user.id
+
+    def build() -> bytes:
+        return CalculationStatsResponse(**archive.stats_for_user(db, user_id)).model_dump_json().encode()
+    return cached_user_response(request, db, user_id, "stats", "all", build)
+
+@app.get("/calculations/search", response_model=List[CalculationResponse], responses={401: {"model": ErrorResponse}})
+async def search_calculations_route(
+    type: Optional[List[CalculationType]] = Query(None, description="Any of these types"),
+    min_result: Optional[float] = Query(None),
+    max_result: Optional[float] = Query(None),
+    created_after: Optional[datetime] = Query(None, description="Inclusive"),
+    created_before: Optional[datetime] = Query(None, description="Exclusive"),
+    contains: Optional[List[float]] = Query(None, max_length=20, description="Values that must all appear in inputs"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    db.info["user_id"] = current_user.id
+    calculations = Calculation.search_for_user(
+        db, current_user.id, limit, offset,
+        types=[calculation_type.value for calculation_type in type or ()],
+        min_result=min_result,
+        max_result=max_result,
+        created_after=created_after,
+        created_before=created_before,
+        contains=contains,
+    )
+    return Response(
+        content=calculation_list_adapter.dump_json([CalculationResponse.model_validate(calculation) for calculation in calculations]),
+        media_type="application/json"
+    )
+
+@app.get("/calculations/events", response_class=StreamingResponse, responses={200: {"content": {"text/event-stream": {}}}, 401: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def calculation_events_route(user_id: UUID = Depends(get_current_user_id)):
+    """Server-Sent Events: one `calculation` event per calculation of the caller inserted or updated."""
+    if calculation_events.full():
+        raise HTTPException(status_code=503, detail="Too many open event streams, please retry", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        calculation_events.stream(user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def calculation_node_response(db: Session, calculation: Calculation) -> CalculationNodeResponse:
+    return CalculationNodeResponse.model_validate({
+        **CalculationResponse.model_validate(calculation).model_dump(),
+        "sources": [
+            {"position": position, "calculation_id": source_id}
+            for position, source_id in CalculationDependency.sources_for(db, calculation.id)
+        ],
+    })
+
+# Declared after the other GET /calculations/... routes so their paths are not taken as ids.
+@app.get("/calculations/{calculation_id}", response_model=CalculationNodeResponse, responses={401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 409: {"model": ErrorResponse}})
+async def get_calculation_route(
+    calculation_id: UUID,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    db.info["user_id"] = current_user.id
+    try:
+        # Recomputes the calculation first if anything it depends on has changed.
+        calculation = CalculationDependency.refresh(db, current_user.id, calculation_id)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Cannot recompute calculation: {e}")
+    if calculation is None:
+        raise HTTPException(status_code=404, detail="Calculation not found")
+    db.commit()
+    return calculation_node_response(db, calculation)
+
+@app.put("/calculations/{calculation_id}/sources", response_model=CalculationNodeResponse, responses={400: {"model": ErrorResponse}, 401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 409: {"model": ErrorResponse}})
+async def set_calculation_sources_route(
+    calculation_id: UUID,
+    request: CalculationSourcesRequest,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    db.info["user_id"] = current_user.id
+    calculation = db.query(Calculation).filter(Calculation.id == calculation_id, Calculation.user_id == current_user.id).first()
+    if calculation is None:
+        raise HTTPException(status_code=404, detail="Calculation not found")
+    try:
+        calculation = CalculationDependency.set_sources(
+            db, calculation, [(source.position, source.calculation_id) for source in request.sources]
+        )
+    except CalculationSourceNotFound as e:
+        db.rollback()
+        raise HTTPException(status_code=404, detail=str(e))
+    except CalculationCycleError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    return calculation_node_response(db, calculation)
+
+@app.post(
+    "/jobs",
+    response_model=JobResponse,
+    status_code=202,
+    responses={400: {"model": ErrorResponse}, 401: {"model": ErrorResponse}, 415: {"model": ErrorResponse}, 429: {"model": ErrorResponse}},
+    openapi_extra=calculation_body_openapi(JobCreate),
+)
+async def submit_job_route(
+    request: Request,
+    response: Response,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    job_in, _ = await read_calculation_body(request, JobCreate)
+    try:
+        # Above JOB_MAX_PRIORITY a user would jump everyone else's queued jobs.
+        priority = min(job_in.priority, settings.JOB_MAX_PRIORITY)
+        job = CalculationJob.submit(db, current_user.id, job_in.type.value, job_in.inputs, priority)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Too many jobs waiting: {e}", headers={"Retry-After": "10"})
+    db.commit()
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return JobResponse.model_validate(job)
+
+def get_user_job(db: Session, user_id: UUID, job_id: UUID) -> CalculationJob:
+    db.info["user_id"] = user_id
+    job = db.query(CalculationJob).filter(CalculationJob.id == job_id, CalculationJob.user_id == user_id).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}", response_model=JobResponse, responses={401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}})
+async def get_job_route(
+    job_id: UUID,
+    user_id: UUID = Depends(get_current_user_id),
+    db: Session = Depends(get_read_db)
+):
+    return JobResponse.model_validate(get_user_job(db, user_id, job_id))
+
+@app.get("/jobs/{job_id}/result", response_model=CalculationResponse, responses={401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 409: {"model": ErrorResponse}})
+async def get_job_result_route(
+    job_id: UUID,
+    user_id: UUID = Depends(get_current_user_id),
+    db: Session = Depends(get_read_db)
+):
+    job = get_user_job(db, user_id, job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=409, detail=f"Job failed: {job.error}")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}", headers={"Retry-After": "1"})
+    calculation = db.query(Calculation).filter(Calculation.id == job.calculation_id).first()
+    if calculation is None:
+        raise HTTPException(status_code=404, detail="Job result no longer exists")
+    return CalculationResponse.model_validate(calculation)
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    from app.launcher import Server
+    Server(uvicorn.Config(app, host="127.0.0.1", port=8000)).run()
@@ -0,0 +1,85 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.revocation import token_revocations
+from app.middleware.admission import AdmissionControlMiddleware, AIMDConcurrencyLimiter
+from app.metrics import registry
+from app.models.user import User
+from tests.integration.test_fastapi_calculator import client
+
+def make_app(**kwargs):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/metrics")
+    async def metrics():
+        return {"ok": True}
+
+    app.add_middleware(AdmissionControlMiddleware, **kwargs)
+    return app
+
+def test_ip_rate_limit_returns_429_with_retry_after():
+    with TestClient(make_app(ip_rate=1, ip_burst=2)) as test_client:
+        assert test_client.get("/ping").status_code == 200
+        assert test_client.get("/ping").status_code == 200
+        response = test_client.get("/ping")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert "error" in response.json()
+
+def test_user_rate_limit_is_per_user():
+    first = User.create_access_token({"sub": "8a0d3b4e-0f1c-4e5b-9d8e-1a2b3c4d5e6f"})
+    second = User.create_access_token({"sub": "1b2c3d4e-5f60-4718-92a3-b4c5d6e7f809"})
+    with TestClient(make_app(user_rate=1, user_burst=1)) as test_client:
+        assert test_client.get("/ping", headers={"Authorization": f"Bearer {first}"}).status_code == 200
+        assert test_client.get("/ping", headers={"Authorization": f"Bearer {first}"}).status_code == 429
+        assert test_client.get("/ping", headers={"Authorization": f"Bearer {second}"}).status_code == 200
+
+def test_user_key_never_checks_revocations(monkeypatch):
+    def fail(jti):
+        raise AssertionError("revocation lookup on the event loop")
+
+    monkeypatch.setattr(token_revocations, "is_revoked", fail)
+    token = User.create_access_token({"sub": "8a0d3b4e-0f1c-4e5b-9d8e-1a2b3c4d5e6f"})
+    with TestClient(make_app(user_rate=1, user_burst=1)) as test_client:
+        assert test_client.get("/ping", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+        assert test_client.get("/ping", headers={"Authorization": f"Bearer {token}"}).status_code == 429
+
+def test_concurrency_limit_returns_503():
+    limiter = AIMDConcurrencyLimiter(initial=1, minimum=1, maximum=1, target_latency=1)
+    limiter.inflight = 1
+    with TestClient(make_app(concurrency=limiter)) as test_client:
+        response = test_client.get("/ping")
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+
+def test_exempt_paths_bypass_limits():
+    with TestClient(make_app(ip_rate=1, ip_burst=1)) as test_client:
+        statuses = {test_client.get("/metrics").status_code for _ in range(5)}
+    assert statuses == {200}
+
+def test_stream_paths_skip_concurrency_but_not_rate_limits():
+    limiter = AIMDConcurrencyLimiter(initial=1, minimum=1, maximum=1, target_latency=1)
+    limiter.inflight = 1
+    with TestClient(make_app(concurrency=limiter, ip_rate=1, ip_burst=2, stream_paths="/ping")) as test_client:
+        assert test_client.get("/ping").status_code == 200
+        assert test_client.get("/ping").status_code == 200
+        assert test_client.get("/ping").status_code == 429
+    assert limiter.inflight == 1
+
+def test_metrics_endpoint_exposes_limiter_state(client):
+    client.post('/add', json={'a': 1, 'b': 2})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "admission_concurrency_limit" in response.text
+    assert 'admission_tracked_keys{limiter="ip"}' in response.text
+    assert registry.get("admission_rejected_total") is not None
+
+def test_health_endpoint_exists(client):
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
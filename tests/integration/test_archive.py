@@ -0,0 +1,151 @@
+import pytest
+import uuid
+from datetime import datetime, timedelta
+
+from app.archive import (
+    ArchiveSegment,
+    CalculationArchive,
+    ColumnCache,
+    archive_calculations,
+    history_for_user,
+    stats_for_user,
+    write_segment,
+)
+from app.models.calculation import Addition, Calculation, Division
+from app.models.user import User
+from tests.integration.test_fastapi_calculator import client
+
+def add_calculation(db_session, user, created_at, calculation_cls=Addition, inputs=(1, 2)):
+    calculation = calculation_cls(user_id=user.id, inputs=list(inputs), created_at=created_at, updated_at=created_at)
+    calculation.result = calculation.get_result()
+    db_session.add(calculation)
+    db_session.commit()
+    return calculation
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = CalculationArchive(str(tmp_path))
+    yield archive
+    archive.close()
+
+def test_segment_round_trip(tmp_path):
+    user_a, user_b = uuid.uuid4(), uuid.uuid4()
+    created = datetime(2020, 1, 1, 12, 30, 15, 123456)
+    rows = [
+        {"id": uuid.uuid4(), "user_id": user_a, "type": "addition", "inputs": [1, 2.5],
+         "result": 3.5, "created_at": created, "updated_at": created},
+        {"id": uuid.uuid4(), "user_id": user_b, "type": "division", "inputs": [9, 3, 3],
+         "result": None, "created_at": created + timedelta(days=1), "updated_at": created},
+        {"id": uuid.uuid4(), "user_id": user_a, "type": "multiplication", "inputs": [2, 4],
+         "result": 8.0, "created_at": created + timedelta(days=2), "updated_at": created},
+    ]
+    path = str(tmp_path / "test.seg")
+    write_segment(path, rows)
+
+    segment = ArchiveSegment(path)
+    try:
+        assert segment.rows == 3
+        start, end = segment.user_range(user_a)
+        read = segment.read_rows(list(range(start, end)))
+        assert read == [rows[2], {**rows[0], "inputs": [1.0, 2.5]}]
+        assert segment.read_rows(list(range(*segment.user_range(user_b))))[0]["result"] is None
+        assert segment.user_range(uuid.uuid4()) is None
+        assert sorted(segment.stat_groups(user_a)) == [
+            ["addition", 1, 1, 3.5, 3.5, 3.5],
+            ["multiplication", 1, 1, 8.0, 8.0, 8.0],
+        ]
+    finally:
+        segment.close()
+
+def test_rejects_non_segment_files(tmp_path):
+    path = tmp_path / "bogus.seg"
+    path.write_bytes(b"not a segment")
+    with pytest.raises(ValueError):
+        ArchiveSegment(str(path))
+
+def test_archive_moves_old_rows_and_merges_reads(db_session, test_user, archive):
+    now = datetime.utcnow()
+    old = [add_calculation(db_session, test_user, now - timedelta(days=400 + i), inputs=(i, 1)).id for i in range(5)]
+    add_calculation(db_session, test_user, now - timedelta(days=500), Division, inputs=(8, 0.5))
+    recent = [add_calculation(db_session, test_user, now - timedelta(minutes=i), inputs=(100, i)).id for i in range(3)]
+    stats_before = stats_for_user(db_session, test_user.id, archive)
+    history_before = [calc.id for calc in history_for_user(db_session, test_user.id, 100, 0, archive)]
+
+    paths = archive_calculations(db_session, now - timedelta(days=365), archive.directory, segment_rows=4)
+    assert len(paths) == 2
+    assert db_session.query(Calculation).filter(Calculation.user_id == test_user.id).count() == 3
+    assert archive.count_for_user(test_user.id) == 6
+
+    assert stats_for_user(db_session, test_user.id, archive) == stats_before
+    history = history_for_user(db_session, test_user.id, 100, 0, archive)
+    assert [row["id"] if isinstance(row, dict) else row.id for row in history] == history_before
+
+    # Pages that straddle the hot/archived boundary and pages entirely in the archive.
+    page = history_for_user(db_session, test_user.id, 3, 2, archive)
+    assert [recent[2], old[0], old[1]] == [row["id"] if isinstance(row, dict) else row.id for row in page]
+    page = history_for_user(db_session, test_user.id, 2, 6, archive)
+    assert [row["id"] for row in page] == [old[3], old[4]]
+
+def test_archive_picks_up_new_segments(db_session, test_user, archive):
+    assert archive.segments() == []
+    add_calculation(db_session, test_user, datetime(2001, 1, 1))
+    archive_calculations(db_session, datetime(2002, 1, 1), archive.directory)
+    assert len(archive.segments()) == 1
+    assert archive.count_for_user(test_user.id) == 1
+
+def test_stats_count_rows_left_in_both_places_once(db_session, test_user, archive):
+    now = datetime.utcnow()
+    calculations = [add_calculation(db_session, test_user, now - timedelta(days=400 + i), inputs=(i, 1)) for i in range(3)]
+    add_calculation(db_session, test_user, now, inputs=(10, 10))
+    expected = stats_for_user(db_session, test_user.id, archive)
+
+    # As if archiving crashed after writing the segment but before deleting the rows.
+    table = Calculation.__table__
+    rows = [dict(row._mapping) for row in db_session.execute(
+        table.select().where(table.c.id.in_([calculation.id for calculation in calculations[:2]]))
+    )]
+    write_segment(f"{archive.directory}/leftover.seg", rows)
+    assert archive.count_for_user(test_user.id) == 2
+    assert stats_for_user(db_session, test_user.id, archive) == expected
+    assert len(history_for_user(db_session, test_user.id, 100, 0, archive)) == 4
+
+def test_column_cache_reuses_decoded_columns_within_budget(tmp_path):
+    user_id = uuid.uuid4()
+    created = datetime(2020, 1, 1)
+    rows = [{"id": uuid.uuid4(), "user_id": user_id, "type": "addition", "inputs": [i, 1],
+             "result": i + 1.0, "created_at": created + timedelta(seconds=i), "updated_at": created} for i in range(100)]
+    write_segment(str(tmp_path / "a.seg"), rows)
+    cache = ColumnCache(max_bytes=1000)
+    loads = []
+
+    def load(name):
+        loads.append(name)
+        return segment._decode(name)
+
+    segment = ArchiveSegment(str(tmp_path / "a.seg"))
+    try:
+        assert cache.get((segment.path, "created_at"), lambda: load("created_at")) is cache.get((segment.path, "created_at"), lambda: load("created_at"))
+        assert loads == ["created_at"] and cache.size == 800
+        cache.get((segment.path, "result"), lambda: load("result"))
+        # Over budget: the least recently used column goes.
+        assert cache.size == 800
+        cache.get((segment.path, "created_at"), lambda: load("created_at"))
+        assert loads == ["created_at", "result", "created_at"]
+        cache.discard(segment.path)
+        assert cache.size == 0
+    finally:
+        segment.close()
+
+def test_history_and_stats_routes_include_archive(client, db_session, test_user, tmp_path, monkeypatch):
+    archive = CalculationArchive(str(tmp_path))
+    monkeypatch.setattr("app.archive.calculation_archive", archive)
+    add_calculation(db_session, test_user, datetime(2001, 1, 1), inputs=(2, 3))
+    archive_calculations(db_session, datetime(2002, 1, 1), archive.directory)
+    add_calculation(db_session, test_user, datetime.utcnow(), inputs=(4, 4))
+
+    headers = {"Authorization": f"Bearer {User.create_access_token({'sub': str(test_user.id)})}"}
+    history = client.get("/calculations/history", headers=headers).json()
+    assert [calc["result"] for calc in history] == [8, 5]
+    stats = client.get("/calculations/stats", headers=headers).json()
+    assert stats["total"] == 2 and stats["result_sum"] == 13
+    archive.close()
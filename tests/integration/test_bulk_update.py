@@ -0,0 +1,88 @@
+import pytest
+import uuid
+from sqlalchemy import event
+
+from app.cache.history import history_cache
+from app.models.calculation import Addition, Calculation, Division, Multiplication
+from app.models.user import User
+from tests.integration.test_fastapi_calculator import client
+
+def add_calculation(db_session, user, calculation_cls, inputs):
+    calculation = calculation_cls(user_id=user.id, inputs=list(inputs))
+    calculation.result = calculation.get_result()
+    db_session.add(calculation)
+    db_session.commit()
+    return calculation.id
+
+def test_bulk_update_recomputes_results_in_one_statement(db_session, test_user):
+    addition = add_calculation(db_session, test_user, Addition, (1, 2))
+    division = add_calculation(db_session, test_user, Division, (8, 2))
+    multiplication = add_calculation(db_session, test_user, Multiplication, (2, 3))
+
+    statements = []
+    engine = db_session.get_bind()
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        results = Calculation.bulk_update_inputs(db_session, test_user.id, [
+            (addition, [10, 20, 30]),
+            (division, [9, 3, 3]),
+            (multiplication, [4, 0.5]),
+        ])
+        db_session.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert [result["status"] for result in results] == ["updated"] * 3
+    assert [result["result"] for result in results] == [60, 1, 2]
+    assert len([s for s in statements if s.startswith("UPDATE")]) == 1
+
+    db_session.expire_all()
+    updated = db_session.get(Calculation, division)
+    assert updated.inputs == [9, 3, 3] and updated.result == 1
+
+def test_bulk_update_reports_missing_foreign_and_invalid_rows(db_session, test_user, seed_users):
+    other = seed_users[0]
+    own = add_calculation(db_session, test_user, Division, (8, 2))
+    foreign = add_calculation(db_session, other, Addition, (1, 1))
+
+    results = Calculation.bulk_update_inputs(db_session, test_user.id, [
+        (uuid.uuid4(), [1, 2]),
+        (foreign, [5, 5]),
+        (own, [1, 0]),
+        (own, [4, 2]),
+    ])
+    db_session.commit()
+    assert [result["status"] for result in results] == ["not_found", "not_found", "invalid", "invalid"]
+    assert results[2]["detail"] == "Cannot divide by zero."
+    assert results[3]["detail"] == "Calculation repeated in batch"
+
+    db_session.expire_all()
+    assert db_session.get(Calculation, foreign).inputs == [1, 1]
+    assert db_session.get(Calculation, own).inputs == [8, 2]
+
+def test_overflowing_results_are_rejected_by_single_and_bulk_updates(db_session, test_user):
+    calculation_id = add_calculation(db_session, test_user, Multiplication, (2, 3))
+    calculation = db_session.get(Calculation, calculation_id)
+    calculation.inputs = [1e200, 1e200]
+    with pytest.raises(ValueError, match="Result is not a finite number."):
+        calculation.get_result()
+    db_session.rollback()
+
+    results = Calculation.bulk_update_inputs(db_session, test_user.id, [(calculation_id, [1e200, 1e200])])
+    assert (results[0]["status"], results[0]["detail"]) == ("invalid", "Result is not a finite number.")
+
+def test_bulk_update_route(client, db_session, test_user):
+    calculation_id = add_calculation(db_session, test_user, Addition, (1, 2))
+    version = history_cache.version(db_session, test_user.id)
+    headers = {"Authorization": f"Bearer {User.create_access_token({'sub': str(test_user.id)})}"}
+
+    response = client.patch("/calculations", json={"updates": [
+        {"id": str(calculation_id), "inputs": [2, 2]},
+        {"id": str(uuid.uuid4()), "inputs": [2, 2]},
+    ]}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["updated"], body["not_found"], body["invalid"]) == (1, 1, 0)
+    assert body["results"][0]["result"] == 4
+    assert history_cache.version(db_session, test_user.id) > version
@@ -7,6 +7,12 @@ from app.models.calculation import (
     Subtraction,
     Multiplication,
     Division,
+    Mean,
+    Modulo,
+    Percentile,
+    Power,
+    StandardDeviation,
+    Variance,
 )
 
 def dummy_user_id():
@@ -113,10 +119,44 @@ def test_calculation_factory_division():
     assert isinstance(calc, Division), "Factory did not return a Division instance."
     assert calc.get_result() == 5, "Incorrect division result."
 
+def test_statistical_get_results():
+    inputs = [2, 4, 4, 4, 5, 5, 7, 9]
+    assert Mean(user_id=dummy_user_id(), inputs=inputs).get_result() == 5
+    assert Variance(user_id=dummy_user_id(), inputs=inputs).get_result() == pytest.approx(32 / 7)
+    assert StandardDeviation(user_id=dummy_user_id(), inputs=inputs).get_result() == pytest.approx((32 / 7) ** 0.5)
+    # First input is the percentile of the rest.
+    assert Percentile(user_id=dummy_user_id(), inputs=[50] + inputs).get_result() == 4.5
+    assert Percentile(user_id=dummy_user_id(), inputs=[100] + inputs).get_result() == 9
+
+def test_percentile_out_of_range():
+    with pytest.raises(ValueError, match="between 0 and 100"):
+        Percentile(user_id=dummy_user_id(), inputs=[150, 1, 2]).get_result()
+
+def test_power_and_modulo_fold_left_to_right():
+    assert Power(user_id=dummy_user_id(), inputs=[2, 3, 2]).get_result() == 64
+    assert Modulo(user_id=dummy_user_id(), inputs=[17, 5]).get_result() == 2
+    assert Modulo(user_id=dummy_user_id(), inputs=[-7, 3]).get_result() == -7 % 3
+    with pytest.raises(ValueError, match="Cannot divide by zero."):
+        Modulo(user_id=dummy_user_id(), inputs=[5, 0]).get_result()
+
+@pytest.mark.parametrize("inputs", [[0, -1], [10, 400], [-8, 0.5]])
+def test_power_rejects_non_finite_results(inputs):
+    with pytest.raises(ValueError, match="not a finite number"):
+        Power(user_id=dummy_user_id(), inputs=inputs).get_result()
+
+@pytest.mark.parametrize("calculation_type, expected_cls", [
+    ("mean", Mean), ("variance", Variance), ("stddev", StandardDeviation),
+    ("percentile", Percentile), ("power", Power), ("modulo", Modulo),
+])
+def test_calculation_factory_statistical_types(calculation_type, expected_cls):
+    calc = Calculation.create_calculation(calculation_type, dummy_user_id(), [1, 2])
+    assert isinstance(calc, expected_cls)
+    assert calc.type == calculation_type
+
 def test_calculation_factory_invalid_type():
     with pytest.raises(ValueError, match="Unsupported calculation type"):
         Calculation.create_calculation(
-            calculation_type="power",
+            calculation_type="square_root",
             user_id=dummy_user_id(),
             inputs=[2, 3]
         )
\ No newline at end of file
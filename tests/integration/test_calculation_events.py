@@ -0,0 +1,141 @@
+import asyncio
+import json
+import select
+import uuid
+
+import pytest
+
+from app.calculation_events import CHANNEL, CalculationEventHub, calculation_events, format_event, install_notify_trigger
+from app.config import settings
+from app.models.calculation import Addition
+from app.models.user import User
+from tests.conftest import test_engine
+from tests.integration.test_fastapi_calculator import client
+
+requires_postgres = pytest.mark.skipif(
+    test_engine.dialect.name != "postgresql", reason="LISTEN/NOTIFY requires PostgreSQL"
+)
+
+def event_for(user_id, result=1.0):
+    return {"op": "insert", "id": str(uuid.uuid4()), "user_id": str(user_id), "type": "addition", "result": result}
+
+def test_events_fan_out_to_the_users_streams():
+    hub = CalculationEventHub(queue_size=10, listen=False)
+    user, other = uuid.uuid4(), uuid.uuid4()
+
+    async def run():
+        first, second, unrelated = hub.subscribe(user), hub.subscribe(user), hub.subscribe(other)
+        assert hub.clients == 3
+        hub.publish(event_for(user))
+        assert first.qsize() == second.qsize() == 1
+        assert unrelated.empty()
+        hub.unsubscribe(user, first)
+        hub.unsubscribe(user, second)
+        assert not hub.has_subscribers(user)
+        hub.publish(event_for(user))
+        assert hub.clients == 1
+
+    asyncio.run(run())
+
+def test_slow_streams_drop_the_oldest_events():
+    hub = CalculationEventHub(queue_size=2, listen=False)
+    user = uuid.uuid4()
+
+    async def run():
+        queue = hub.subscribe(user)
+        for result in (1, 2, 3):
+            hub.publish(event_for(user, result))
+        return [queue.get_nowait()["result"] for _ in range(queue.qsize())]
+
+    assert asyncio.run(run()) == [2, 3]
+
+def test_stream_sends_retry_events_heartbeats_and_ends_on_stop(monkeypatch):
+    monkeypatch.setattr(settings, "SSE_HEARTBEAT_SECONDS", 0.01)
+    hub = CalculationEventHub(listen=False)
+    user = uuid.uuid4()
+
+    async def run():
+        stream = hub.stream(user)
+        chunks = [await stream.__anext__()]
+        hub.publish(event_for(user, 42))
+        chunks.append(await stream.__anext__())
+        chunks.append(await stream.__anext__())
+        await hub.stop()
+        chunks.extend([chunk async for chunk in stream])
+        return chunks
+
+    chunks = asyncio.run(run())
+    assert chunks[0] == f"retry: {settings.SSE_RETRY_MS}\n\n"
+    assert chunks[1].startswith("event: calculation\ndata: ")
+    assert json.loads(chunks[1].split("data: ", 1)[1])["result"] == 42
+    assert chunks[2] == ": keepalive\n\n"
+    assert hub.clients == 0
+
+def test_resync_event_format():
+    assert format_event({"op": "resync"}) == 'event: resync\ndata: {"op": "resync"}\n\n'
+
+def test_committed_orm_changes_are_published(db_session, test_user):
+    if test_engine.dialect.name == "postgresql":
+        pytest.skip("PostgreSQL delivers changes through NOTIFY")
+
+    async def run():
+        queue = calculation_events.subscribe(test_user.id)
+        try:
+            calculation = Addition(user_id=test_user.id, inputs=[1, 2])
+            calculation.result = calculation.get_result()
+            db_session.add(calculation)
+            db_session.commit()
+            inserted = await asyncio.wait_for(queue.get(), 5)
+
+            calculation.inputs = [2, 2]
+            calculation.result = calculation.get_result()
+            db_session.flush()
+            db_session.rollback()
+            calculation.result = 10
+            db_session.commit()
+            updated = await asyncio.wait_for(queue.get(), 5)
+            return calculation.id, inserted, updated, queue.qsize()
+        finally:
+            calculation_events.unsubscribe(test_user.id, queue)
+
+    calculation_id, inserted, updated, remaining = asyncio.run(run())
+    assert inserted["op"] == "insert"
+    assert inserted["id"] == str(calculation_id)
+    assert inserted["type"] == "addition"
+    assert inserted["result"] == 3
+    # The rolled-back update was never published.
+    assert (updated["op"], updated["result"]) == ("update", 10)
+    assert remaining == 0
+
+def test_events_endpoint_requires_auth_and_caps_streams(client, test_user, monkeypatch):
+    assert client.get("/calculations/events").status_code == 401
+    monkeypatch.setattr(calculation_events, "max_clients", 0)
+    token = User.create_access_token({"sub": str(test_user.id)})
+    response = client.get("/calculations/events", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+def test_install_trigger_is_noop_without_notify(db_session):
+    if test_engine.dialect.name == "postgresql":
+        pytest.skip("PostgreSQL supports NOTIFY")
+    assert install_notify_trigger(db_session.connection()) is False
+
+@requires_postgres
+def test_trigger_notifies_committed_changes(db_session, test_user):
+    listener = test_engine.raw_connection()
+    try:
+        connection = listener.driver_connection
+        connection.autocommit = True
+        connection.cursor().execute(f"LISTEN {CHANNEL}")
+
+        calculation = Addition(user_id=test_user.id, inputs=[1, 2])
+        calculation.result = calculation.get_result()
+        db_session.add(calculation)
+        db_session.commit()
+
+        select.select([connection], [], [], 5)
+        connection.poll()
+        payloads = [json.loads(notify.payload) for notify in connection.notifies]
+    finally:
+        listener.close()
+    assert {"op": "insert", "id": str(calculation.id), "user_id": str(test_user.id), "result": 3.0}.items() <= payloads[0].items()
@@ -0,0 +1,157 @@
+import uuid
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.models.calculation import Addition, Calculation, Division, Multiplication, Subtraction
+from app.models.calculation_dependency import CalculationCycleError, CalculationDependency, topological_order
+from app.models.user import User
+from tests.integration.test_fastapi_calculator import client
+
+@pytest.fixture
+def auth_headers(test_user):
+    token = User.create_access_token({"sub": str(test_user.id)})
+    return {"Authorization": f"Bearer {token}"}
+
+def add_calculation(db_session, user, calculation_cls, inputs):
+    calculation = calculation_cls(user_id=user.id, inputs=list(inputs))
+    calculation.result = calculation.get_result()
+    db_session.add(calculation)
+    db_session.commit()
+    return calculation.id
+
+def link(client, headers, calculation_id, sources):
+    return client.put(
+        f"/calculations/{calculation_id}/sources",
+        json={"sources": [{"position": position, "calculation_id": str(source)} for position, source in sources]},
+        headers=headers
+    )
+
+@pytest.fixture
+def chain(client, db_session, test_user, auth_headers):
+    """a = 1 + 2; b = a * 10; c = b - 5"""
+    a = add_calculation(db_session, test_user, Addition, (1, 2))
+    b = add_calculation(db_session, test_user, Multiplication, (0, 10))
+    c = add_calculation(db_session, test_user, Subtraction, (0, 5))
+    assert link(client, auth_headers, b, [(0, a)]).json()["result"] == 30
+    assert link(client, auth_headers, c, [(0, b)]).json()["result"] == 25
+    return a, b, c
+
+def stored(db_session, calculation_id):
+    db_session.expire_all()
+    return db_session.get(Calculation, calculation_id)
+
+def test_linking_computes_from_sources(client, chain, auth_headers):
+    a, b, c = chain
+    response = client.get(f"/calculations/{c}", headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["inputs"] == [30, 5]
+    assert body["result"] == 25
+    assert body["sources"] == [{"position": 0, "calculation_id": str(b)}]
+
+def test_upstream_change_marks_downstream_stale_and_recomputes_on_read(client, db_session, chain, auth_headers):
+    a, b, c = chain
+    upstream = stored(db_session, a)
+    upstream.inputs = [5, 5]
+    upstream.result = upstream.get_result()
+    db_session.commit()
+
+    assert {edge.stale for edge in db_session.query(CalculationDependency)} == {True}
+    # Nothing downstream is recomputed until it is read.
+    assert stored(db_session, c).result == 25
+
+    response = client.get(f"/calculations/{c}", headers=auth_headers)
+    assert response.json()["inputs"] == [100, 5]
+    assert response.json()["result"] == 95
+    assert stored(db_session, b).inputs == [10, 10]
+    assert {edge.stale for edge in db_session.query(CalculationDependency)} == {False}
+
+def test_only_stale_nodes_are_recomputed(client, db_session, test_user, chain, auth_headers):
+    a, b, c = chain
+    other_source = add_calculation(db_session, test_user, Addition, (2, 2))
+    sibling = add_calculation(db_session, test_user, Addition, (0, 1))
+    link(client, auth_headers, sibling, [(0, other_source)])
+    unrelated_updated_at = stored(db_session, sibling).updated_at
+
+    upstream = stored(db_session, b)
+    upstream.inputs = [30, 2]
+    upstream.result = upstream.get_result()
+    db_session.commit()
+
+    updates = []
+    listener = lambda conn, cursor, statement, params, *args: updates.append(statement) if statement.startswith("UPDATE calculations") else None
+    # The app has its own engine; listen on all of them.
+    event.listen(Engine, "before_cursor_execute", listener)
+    try:
+        assert client.get(f"/calculations/{c}", headers=auth_headers).json()["result"] == 55
+        # Already fresh: nothing to write.
+        assert client.get(f"/calculations/{c}", headers=auth_headers).json()["result"] == 55
+    finally:
+        event.remove(Engine, "before_cursor_execute", listener)
+    assert len(updates) == 1
+    assert stored(db_session, a).result == 3
+    assert stored(db_session, sibling).updated_at == unrelated_updated_at
+
+def test_bulk_update_marks_downstream_stale(client, db_session, chain, auth_headers):
+    a, b, c = chain
+    response = client.patch("/calculations", json={"updates": [{"id": str(a), "inputs": [1, 1]}]}, headers=auth_headers)
+    assert response.json()["updated"] == 1
+    assert client.get(f"/calculations/{c}", headers=auth_headers).json()["result"] == 15
+
+def test_cycles_are_rejected(client, chain, auth_headers):
+    a, b, c = chain
+    response = link(client, auth_headers, a, [(0, c)])
+    assert response.status_code == 409
+    assert link(client, auth_headers, a, [(0, a)]).status_code == 409
+    # Re-linking along the existing direction is fine.
+    assert link(client, auth_headers, c, [(0, b), (1, a)]).json()["result"] == 27
+
+def test_invalid_links(client, db_session, test_user, seed_users, chain, auth_headers):
+    a, b, c = chain
+    foreign = add_calculation(db_session, seed_users[0], Addition, (1, 1))
+    assert link(client, auth_headers, c, [(0, foreign)]).status_code == 404
+    assert link(client, auth_headers, c, [(0, uuid.uuid4())]).status_code == 404
+    assert link(client, auth_headers, c, [(2, a)]).status_code == 400
+    assert link(client, auth_headers, c, [(0, a), (0, b)]).status_code == 400
+    assert link(client, auth_headers, uuid.uuid4(), [(0, a)]).status_code == 404
+    assert client.get(f"/calculations/{uuid.uuid4()}", headers=auth_headers).status_code == 404
+
+def test_failed_recompute_is_reported_and_rolled_back(client, db_session, test_user, auth_headers):
+    source = add_calculation(db_session, test_user, Addition, (1, 1))
+    divisor_user = add_calculation(db_session, test_user, Division, (10, 1))
+    assert link(client, auth_headers, divisor_user, [(1, source)]).json()["result"] == 5
+
+    upstream = stored(db_session, source)
+    upstream.inputs = [1, -1]
+    upstream.result = upstream.get_result()
+    db_session.commit()
+
+    response = client.get(f"/calculations/{divisor_user}", headers=auth_headers)
+    assert response.status_code == 409
+    assert "divide by zero" in response.json()["error"]
+    assert stored(db_session, divisor_user).result == 5
+
+def test_unlinking_and_deleting_sources(client, db_session, chain, auth_headers):
+    a, b, c = chain
+    response = link(client, auth_headers, c, [])
+    assert response.json()["sources"] == []
+
+    db_session.delete(stored(db_session, a))
+    db_session.commit()
+    assert db_session.query(CalculationDependency).count() == 0
+    # b keeps the last value it received from a.
+    assert client.get(f"/calculations/{b}", headers=auth_headers).json()["inputs"] == [3, 10]
+
+def test_history_and_stats_paths_still_resolve(client, auth_headers):
+    assert client.get("/calculations/history", headers=auth_headers).status_code == 200
+    assert client.get("/calculations/stats", headers=auth_headers).status_code == 200
+
+def test_topological_order():
+    a, b, c, d = (uuid.uuid4() for _ in range(4))
+    inbound = {b: [(0, a)], c: [(0, b), (1, a)], d: [(0, c)]}
+    assert topological_order([a, b, c, d], inbound) == [a, b, c, d]
+    assert topological_order([c, d], inbound) == [c, d]
+    with pytest.raises(CalculationCycleError):
+        topological_order([a, b], {a: [(0, b)], b: [(0, a)]})
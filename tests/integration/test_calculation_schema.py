@@ -98,4 +98,13 @@ def test_division_with_zero_as_second_input():
     with pytest.raises(ValidationError) as exc_info:
         CalculationCreate(**data)
     error_message = str(exc_info.value).lower()
-    assert "zero" in error_message or "cannot divide by zero" in error_message, error_message
\ No newline at end of file
+    assert "zero" in error_message or "cannot divide by zero" in error_message, error_message
+
+def test_modulo_with_zero_divisor():
+    with pytest.raises(ValidationError, match="Cannot divide by zero"):
+        CalculationCreate(type="modulo", inputs=[14, 0], user_id=uuid4())
+
+def test_percentile_must_be_between_0_and_100():
+    assert CalculationCreate(type="percentile", inputs=[95, 1, 2, 3], user_id=uuid4()).type == "percentile"
+    with pytest.raises(ValidationError, match="Percentile must be between 0 and 100"):
+        CalculationCreate(type="percentile", inputs=[120, 1, 2], user_id=uuid4())
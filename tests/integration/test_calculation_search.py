@@ -0,0 +1,160 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.models.calculation import Addition, Calculation, Division, Multiplication
+from app.models.types import CALCULATION_TYPE_CODES
+from app.models.user import User
+from tests.conftest import test_engine
+from tests.integration.test_fastapi_calculator import client
+
+requires_postgres = pytest.mark.skipif(
+    test_engine.dialect.name != "postgresql", reason="BRIN and GIN indexes require PostgreSQL"
+)
+
+@pytest.fixture
+def auth_headers(test_user):
+    token = User.create_access_token({"sub": str(test_user.id)})
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def history(db_session, test_user, seed_users):
+    now = datetime.utcnow()
+    rows = [
+        (Addition, [1, 2], now - timedelta(days=10)),
+        (Addition, [10, 20, 30], now - timedelta(days=5)),
+        (Multiplication, [3, 4], now - timedelta(days=2)),
+        (Division, [100, 4], now - timedelta(hours=1)),
+    ]
+    for calculation_cls, inputs, created_at in rows:
+        calculation = calculation_cls(user_id=test_user.id, inputs=inputs, created_at=created_at)
+        calculation.result = calculation.get_result()
+        db_session.add(calculation)
+    other = Addition(user_id=seed_users[0].id, inputs=[1, 2], created_at=now)
+    other.result = other.get_result()
+    db_session.add(other)
+    db_session.commit()
+    return now
+
+def search(client, headers, **params):
+    response = client.get("/calculations/search", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return [(row["type"], row["result"]) for row in response.json()]
+
+def test_search_filters(client, history, auth_headers):
+    now = history
+    assert search(client, auth_headers) == [("division", 25), ("multiplication", 12), ("addition", 60), ("addition", 3)]
+    assert search(client, auth_headers, type=["addition", "division"], limit=2) == [("division", 25), ("addition", 60)]
+    assert search(client, auth_headers, min_result=12, max_result=25) == [("division", 25), ("multiplication", 12)]
+    assert search(client, auth_headers, created_after=(now - timedelta(days=6)).isoformat(),
+                  created_before=(now - timedelta(days=1)).isoformat()) == [("multiplication", 12), ("addition", 60)]
+    assert search(client, auth_headers, contains=[20]) == [("addition", 60)]
+    assert search(client, auth_headers, contains=[1, 2]) == [("addition", 3)]
+    assert search(client, auth_headers, contains=[4], type="division") == [("division", 25)]
+    assert search(client, auth_headers, contains=[2.5]) == []
+    assert search(client, auth_headers, offset=3) == [("addition", 3)]
+
+def test_search_accepts_aware_timestamps(client, history, auth_headers):
+    cutoff = (history - timedelta(days=3)).replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=5)))
+    assert search(client, auth_headers, created_after=cutoff.isoformat()) == [("division", 25), ("multiplication", 12)]
+
+def test_search_requires_auth_and_validates(client, auth_headers):
+    assert client.get("/calculations/search").status_code == 401
+    assert client.get("/calculations/search", params={"type": "square_root"}, headers=auth_headers).status_code == 400
+    assert client.get("/calculations/search", params={"limit": 0}, headers=auth_headers).status_code == 400
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(Explain, "postgresql")
+def compile_explain(element, compiler, **kwargs):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kwargs)
+
+PLANNER_ROWS = 100_000
+
+@pytest.fixture
+def planner_history(db_session, test_user, seed_users):
+    """
+    PLANNER_ROWS analyzed calculations, one a second from the 15th of this
+    month, so they sit in a single partition in created_at order; returns that
+    start and the partition. On a handful of rows every index costs about the
+    same and the planner's pick is noise (the primary key (id, created_at), for
+    one, also answers date windows). The rows are never committed.
+    """
+    start = datetime.utcnow().replace(day=15, hour=0, minute=0, second=0, microsecond=0)
+    db_session.execute(text("""
+        INSERT INTO calculations (id, user_id, type, inputs, result, created_at, updated_at)
+        SELECT gen_random_uuid(),
+               CAST(CASE WHEN i % 10 = 0 THEN :user_id ELSE :other_id END AS uuid),
+               CASE WHEN i % 3 = 0 THEN :addition ELSE :multiplication END,
+               jsonb_build_array(i, i + 1), 2 * i + 1,
+               :start + i * interval '1 second', :start + i * interval '1 second'
+        FROM generate_series(1, :rows) AS i
+    """), {
+        "user_id": str(test_user.id), "other_id": str(seed_users[0].id),
+        "addition": CALCULATION_TYPE_CODES["addition"], "multiplication": CALCULATION_TYPE_CODES["multiplication"],
+        "start": start, "rows": PLANNER_ROWS,
+    })
+    db_session.execute(text("ANALYZE calculations"))
+    partition = db_session.execute(
+        text("SELECT tableoid::regclass::text FROM calculations WHERE created_at = :first"),
+        {"first": start + timedelta(seconds=1)},
+    ).scalar()
+    return start, partition
+
+def explain(db_session, condition, partition):
+    """
+    Index definitions the plan uses on partition for a query filtered on
+    condition alone. Sequential scans are disabled so that an index the
+    condition can't use shows up as a failure rather than a cheaper scan.
+    """
+    connection = db_session.connection()
+    connection.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = connection.execute(Explain(select(Calculation.id).where(condition))).scalar()
+    plan = plan if isinstance(plan, list) else json.loads(plan)
+    names = set()
+
+    def walk(node, relation=None):
+        relation = node.get("Relation Name", relation)
+        if "Index Name" in node and relation == partition:
+            names.add(node["Index Name"])
+        for child in node.get("Plans", ()):
+            walk(child, relation)
+
+    walk(plan[0]["Plan"])
+    definitions = db_session.execute(
+        text("SELECT indexdef FROM pg_indexes WHERE indexname = ANY(:names)"), {"names": list(names)}
+    ).scalars().all()
+    db_session.rollback()
+    return " ".join(definitions)
+
+@requires_postgres
+def test_date_window_uses_brin(db_session, planner_history):
+    start, partition = planner_history
+    condition = Calculation.created_at.between(start + timedelta(minutes=20), start + timedelta(minutes=30))
+    assert "USING brin (created_at)" in explain(db_session, condition, partition)
+
+@requires_postgres
+def test_result_range_uses_user_result_btree(db_session, test_user, planner_history):
+    _, partition = planner_history
+    conditions = Calculation.search_filters("postgresql", test_user.id, min_result=10, max_result=30)
+    assert "USING btree (user_id, result)" in explain(db_session, conditions[0] & conditions[1] & conditions[2], partition)
+
+@requires_postgres
+def test_inputs_contain_uses_gin(db_session, test_user, planner_history):
+    _, partition = planner_history
+    condition = Calculation.search_filters("postgresql", test_user.id, contains=[20])[-1]
+    assert "USING gin (inputs jsonb_path_ops)" in explain(db_session, condition, partition)
+
+@requires_postgres
+def test_type_filter_uses_user_type_btree(db_session, test_user, planner_history):
+    _, partition = planner_history
+    conditions = Calculation.search_filters("postgresql", test_user.id, types=["addition"])
+    assert "USING btree (user_id, type)" in explain(db_session, conditions[0] & conditions[1], partition)
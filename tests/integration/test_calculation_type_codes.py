@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import StatementError
+from sqlalchemy.schema import CreateIndex
+
+from app.models.calculation import Addition, Calculation, Division
+from app.models.types import CALCULATION_TYPE_CODES
+
+def test_type_is_stored_as_a_small_integer_code(db_session, test_user):
+    db_session.add_all([
+        Addition(user_id=test_user.id, inputs=[1, 2], result=3),
+        Division(user_id=test_user.id, inputs=[8, 2], result=4),
+    ])
+    db_session.commit()
+
+    stored = db_session.execute(text("SELECT type FROM calculations ORDER BY type")).scalars().all()
+    assert stored == [CALCULATION_TYPE_CODES["addition"], CALCULATION_TYPE_CODES["division"]]
+
+    db_session.expire_all()
+    loaded = db_session.query(Calculation).filter(Calculation.type == "division").one()
+    assert isinstance(loaded, Division) and loaded.type == "division"
+    assert Calculation.stats_for_user(db_session, test_user.id)["by_type"] == {"addition": 1, "division": 1}
+
+def test_unknown_type_is_rejected(db_session):
+    with pytest.raises(StatementError, match="Unsupported calculation type"):
+        db_session.query(Calculation).filter(Calculation.type == "square_root").all()
+
+def test_user_type_index_covers_result():
+    index = next(index for index in Calculation.__table__.indexes if index.name == "ix_calculations_user_id_type")
+    assert [column.name for column in index.columns] == ["user_id", "type"]
+    ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+    assert "INCLUDE (result)" in ddl
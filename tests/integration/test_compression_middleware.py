@@ -0,0 +1,127 @@
+import asyncio
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.compression import StreamCompressor
+from app.config import settings
+from app.middleware import compression
+from app.middleware.compression import CompressingResponder, CompressionMiddleware, choose_levels, sample_payload
+
+PAYLOAD = sample_payload(200)
+
+def make_client(minimum_size=500):
+    app = FastAPI()
+
+    @app.get("/json")
+    async def json_route():
+        return Response(PAYLOAD, media_type="application/json", headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    async def small_route():
+        return JSONResponse({"ok": True})
+
+    @app.get("/stream")
+    async def stream_route():
+        async def chunks():
+            for start in range(0, len(PAYLOAD), 4096):
+                yield PAYLOAD[start:start + 4096]
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    @app.get("/events")
+    async def events_route():
+        return StreamingResponse(iter([b"data: x\n\n" * 200]), media_type="text/event-stream")
+
+    @app.get("/binary")
+    async def binary_route():
+        return Response(b"\0" * 5000, media_type="application/octet-stream")
+
+    @app.get("/encoded")
+    async def encoded_route():
+        return Response(gzip.compress(PAYLOAD), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    app.add_middleware(CompressionMiddleware, minimum_size=minimum_size, levels={"gzip": 6, "br": 5})
+    return TestClient(app)
+
+def test_compresses_large_json_and_weakens_etag():
+    response = make_client().get("/json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert response.content == PAYLOAD
+
+@pytest.mark.parametrize("path, accept", [
+    ("/json", "identity"),
+    ("/small", "gzip"),
+    ("/events", "gzip"),
+    ("/binary", "gzip"),
+])
+def test_passes_through_when_compression_does_not_apply(path, accept):
+    response = make_client().get(path, headers={"Accept-Encoding": accept})
+    assert "content-encoding" not in response.headers
+
+def test_already_encoded_responses_are_not_compressed_twice():
+    response = make_client().get("/encoded", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == PAYLOAD
+
+def test_streams_without_buffering_the_whole_body():
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def run():
+        responder = CompressingResponder(send, "gzip", 6, minimum_size=1000)
+        await responder.send({"type": "http.response.start", "status": 200,
+                              "headers": [(b"content-type", b"application/json")]})
+        await responder.send({"type": "http.response.body", "body": b"[" + b"1," * 300, "more_body": True})
+        assert messages == [], "held until minimum_size bytes are available"
+        await responder.send({"type": "http.response.body", "body": b"1," * 300, "more_body": True})
+        assert len(messages) == 2 and messages[0]["status"] == 200
+        await responder.send({"type": "http.response.body", "body": b"1]", "more_body": False})
+
+    asyncio.run(run())
+
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    # Each chunk is independently decodable as it arrives (sync flush).
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decoder.decompress(messages[1]["body"]) == b"[" + b"1," * 600
+    assert decoder.decompress(messages[2]["body"]) == b"1]"
+
+def test_streaming_response_round_trips():
+    response = make_client().get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == PAYLOAD
+
+def test_prefers_brotli():
+    response = make_client().get("/stream", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.content == PAYLOAD
+
+def test_choose_levels_respects_budget():
+    assert choose_levels(0.0, PAYLOAD)["gzip"] == 1
+    assert choose_levels(1e9, PAYLOAD)["gzip"] == 9
+
+def test_levels_are_fixed_unless_a_budget_is_set(monkeypatch):
+    measured = []
+    monkeypatch.setattr(compression, "choose_levels", lambda budget: measured.append(budget) or {"gzip": 2})
+    compression.measured_levels.cache_clear()
+    assert CompressionMiddleware(None).levels == {"gzip": settings.COMPRESSION_GZIP_LEVEL, "br": settings.COMPRESSION_BR_LEVEL}
+    assert measured == []
+
+    monkeypatch.setattr(settings, "COMPRESSION_CPU_BUDGET_MS_PER_MB", 12.5)
+    assert CompressionMiddleware(None).levels == CompressionMiddleware(None).levels == {"gzip": 2}
+    # Measured once per process, not per middleware instance.
+    assert measured == [12.5]
+    compression.measured_levels.cache_clear()
+
+def test_stream_compressor_round_trip():
+    compressor = StreamCompressor("gzip", 6)
+    data = compressor.compress(PAYLOAD[:1000]) + compressor.finish(PAYLOAD[1000:])
+    assert gzip.decompress(data) == PAYLOAD
@@ -0,0 +1,147 @@
+import pytest
+import uuid
+from sqlalchemy import event
+
+from app.cache.history import HistoryCache, etag_matches, history_cache
+from app.database import engine
+from app.models.history_version import HistoryVersion
+from app.models.calculation import Addition, Division
+from app.models.user import User
+from tests.conftest import TestingSessionLocal
+from tests.integration.test_fastapi_calculator import client
+
+@pytest.fixture
+def auth_headers(test_user):
+    token = User.create_access_token({"sub": str(test_user.id)})
+    return {"Authorization": f"Bearer {token}"}
+
+def add_calculation(db_session, user, calculation_cls=Addition, inputs=(1, 2)):
+    calculation = calculation_cls(user_id=user.id, inputs=list(inputs))
+    calculation.result = calculation.get_result()
+    db_session.add(calculation)
+    db_session.commit()
+    return calculation
+
+def test_version_bump_invalidates_entries(db_session, test_user):
+    cache = HistoryCache(max_entries=10)
+    user_id = test_user.id
+    version = cache.version(db_session, user_id)
+    cache.put(user_id, "history", "p", version, b"[]")
+    assert cache.get(user_id, "history", "p", version) == b"[]"
+
+    HistoryVersion.bump(db_session, [user_id])
+    db_session.commit()
+    assert cache.version(db_session, user_id) != version
+    assert cache.get(user_id, "history", "p", cache.version(db_session, user_id)) is None
+    assert cache.etag(user_id, "history", "p", cache.version(db_session, user_id)) != cache.etag(user_id, "history", "p", version)
+
+def test_cache_is_bounded():
+    cache = HistoryCache(max_entries=2)
+    user_id = uuid.uuid4()
+    for params in ("a", "b", "c"):
+        cache.put(user_id, "history", params, 0, params.encode())
+    assert cache.get(user_id, "history", "a", 0) is None
+    assert cache.get(user_id, "history", "c", 0) == b"c"
+
+def test_etags_are_shared_between_cache_instances():
+    # Every worker derives the same ETag from the shared version, so any of them can answer 304.
+    user_id = uuid.uuid4()
+    assert HistoryCache().etag(user_id, "history", "p", 7) == HistoryCache().etag(user_id, "history", "p", 7)
+
+def test_etag_matches():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert not etag_matches(None, '"b"')
+    assert not etag_matches('"a"', '"b"')
+
+def test_calculation_writes_bump_version_on_commit(db_session, test_user):
+    add_calculation(db_session, test_user)
+    before = history_cache.version(db_session, test_user.id)
+    other = TestingSessionLocal()
+    try:
+        calculation = add_calculation(db_session, test_user)
+        assert history_cache.version(other, test_user.id) == before + 1
+
+        calculation.inputs = [5, 5]
+        db_session.flush()
+        # Not visible to other sessions (other workers) until the write commits.
+        assert history_cache.version(other, test_user.id) == before + 1
+        db_session.commit()
+        other.rollback()
+        assert history_cache.version(other, test_user.id) == before + 2
+    finally:
+        other.close()
+
+def test_history_returns_etag_and_304_without_reading_calculations(client, db_session, test_user, auth_headers):
+    add_calculation(db_session, test_user, inputs=(2, 3))
+
+    response = client.get("/calculations/history", headers=auth_headers)
+    assert response.status_code == 200
+    assert [calc["result"] for calc in response.json()] == [5]
+    etag = response.headers["etag"]
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        not_modified = client.get("/calculations/history", headers={**auth_headers, "If-None-Match": etag})
+        cached = client.get("/calculations/history", headers=auth_headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert cached.status_code == 200 and cached.json() == response.json()
+    # Per request: the caller's user row (is it still active?) and the version;
+    # the history itself is not queried again.
+    assert len(statements) == 4
+    assert sum("FROM history_versions" in statement for statement in statements) == 2
+    assert sum("FROM users" in statement for statement in statements) == 2
+    assert not any("FROM calculations" in statement for statement in statements)
+
+def test_deactivated_user_gets_no_304_or_cached_body(client, db_session, test_user, auth_headers):
+    add_calculation(db_session, test_user)
+    response = client.get("/calculations/history", headers=auth_headers)
+    assert response.status_code == 200
+
+    test_user.is_active = False
+    db_session.commit()
+    assert client.get("/calculations/history", headers={**auth_headers, "If-None-Match": response.headers["etag"]}).status_code == 400
+    assert client.get("/calculations/history", headers=auth_headers).status_code == 400
+    assert client.get("/calculations/stats", headers=auth_headers).status_code == 400
+
+    db_session.delete(test_user)
+    db_session.commit()
+    assert client.get("/calculations/history", headers=auth_headers).status_code == 401
+
+def test_history_changes_after_write(client, db_session, test_user, auth_headers):
+    add_calculation(db_session, test_user)
+    first = client.get("/calculations/history", headers=auth_headers)
+
+    add_calculation(db_session, test_user, inputs=(10, 20))
+    second = client.get("/calculations/history", headers={**auth_headers, "If-None-Match": first.headers["etag"]})
+
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+    assert len(second.json()) == 2
+
+def test_stats(client, db_session, test_user, auth_headers):
+    add_calculation(db_session, test_user, Addition, (1, 2))
+    add_calculation(db_session, test_user, Addition, (3, 4))
+    add_calculation(db_session, test_user, Division, (10, 5))
+
+    response = client.get("/calculations/stats", headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 3
+    assert body["by_type"] == {"addition": 2, "division": 1}
+    assert body["result_sum"] == 12
+    assert body["result_avg"] == 4
+    assert (body["result_min"], body["result_max"]) == (2, 7)
+
+    again = client.get("/calculations/stats", headers={**auth_headers, "If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+
+def test_history_requires_auth(client):
+    assert client.get("/calculations/history").status_code == 401
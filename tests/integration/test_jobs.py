@@ -0,0 +1,186 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.jobs import JobWorker
+from app.models.calculation import Calculation
+from app.models.job import CalculationJob, JobQueueFull
+from app.models.user import User
+from tests.integration.test_fastapi_calculator import client
+
+@pytest.fixture
+def auth_headers(test_user):
+    token = User.create_access_token({"sub": str(test_user.id)})
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def worker():
+    return JobWorker(poll_interval=0.01, worker_id="test-worker")
+
+def submit(db_session, user, calculation_type="addition", inputs=(1, 2), priority=0):
+    job = CalculationJob.submit(db_session, user.id, calculation_type, list(inputs), priority)
+    db_session.commit()
+    return job.id
+
+def reload(db_session, job_id):
+    db_session.expire_all()
+    return db_session.get(CalculationJob, job_id)
+
+def test_submit_poll_and_fetch(client, db_session, auth_headers, worker):
+    response = client.post("/jobs", json={"type": "multiplication", "inputs": [6, 7]}, headers=auth_headers)
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert response.headers["location"] == f"/jobs/{job_id}"
+    assert response.json()["status"] == "queued"
+
+    assert client.get(f"/jobs/{job_id}/result", headers=auth_headers).status_code == 409
+
+    assert worker.run_once().status == "succeeded"
+    status = client.get(f"/jobs/{job_id}", headers=auth_headers).json()
+    assert status["status"] == "succeeded"
+    assert status["result"] == 42
+    assert status["attempts"] == 1
+
+    result = client.get(f"/jobs/{job_id}/result", headers=auth_headers)
+    assert result.status_code == 200
+    assert result.json()["result"] == 42
+    assert result.json()["id"] == status["calculation_id"]
+    assert db_session.query(Calculation).filter(Calculation.id == uuid.UUID(status["calculation_id"])).count() == 1
+
+def test_jobs_are_private(client, db_session, seed_users, auth_headers):
+    job_id = submit(db_session, seed_users[0])
+    assert client.get(f"/jobs/{job_id}", headers=auth_headers).status_code == 404
+
+def test_higher_priority_is_claimed_first(db_session, test_user, worker):
+    low = submit(db_session, test_user, priority=0)
+    high = submit(db_session, test_user, priority=5)
+    assert worker.run_once().id == high
+    assert worker.run_once().id == low
+    assert worker.run_once() is None
+
+def test_running_jobs_are_capped_per_user(db_session, test_user, seed_users, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_RUNNING_PER_USER", 1)
+    first = submit(db_session, test_user)
+    second = submit(db_session, test_user)
+    other = submit(db_session, seed_users[0])
+
+    claimed = CalculationJob.claim(db_session, "a")
+    assert claimed.id == first
+    # test_user is at the cap, so the other user's job goes next.
+    assert CalculationJob.claim(db_session, "b").id == other
+    assert CalculationJob.claim(db_session, "c") is None
+    assert reload(db_session, second).status == "queued"
+
+def test_invalid_inputs_fail_without_retry(client, db_session, test_user, auth_headers, worker):
+    job_id = submit(db_session, test_user, "division", (1, 0))
+    job = worker.run_once()
+    assert job.status == "failed"
+    assert job.attempts == 1
+    assert "divide by zero" in job.error
+    response = client.get(f"/jobs/{job_id}/result", headers=auth_headers)
+    assert response.status_code == 409
+    assert "divide by zero" in response.json()["error"]
+
+def test_errors_are_retried_with_backoff(db_session, test_user, worker, monkeypatch):
+    job_id = submit(db_session, test_user)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("database hiccup")
+
+    monkeypatch.setattr(Calculation, "create_calculation", broken)
+    job = worker.run_once()
+    assert job.status == "queued"
+    assert job.attempts == 1
+    assert job.run_after > datetime.utcnow()
+    # Not runnable until the backoff passes.
+    assert worker.run_once() is None
+
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF", 0)
+    stored = reload(db_session, job_id)
+    stored.run_after = datetime.utcnow()
+    db_session.commit()
+    assert worker.run_once().status == "queued"
+    final = worker.run_once()
+    assert final.status == "failed"
+    assert final.attempts == settings.JOB_MAX_ATTEMPTS
+    assert "database hiccup" in final.error
+
+def test_jobs_of_dead_workers_are_requeued(db_session, test_user):
+    job_id = submit(db_session, test_user)
+    job = CalculationJob.claim(db_session, "dead-worker")
+    assert job.status == "running"
+    job.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+
+    assert CalculationJob.requeue_expired(db_session) == 1
+    job = reload(db_session, job_id)
+    assert job.status == "queued"
+    assert job.locked_by is None
+
+    job.status, job.attempts, job.locked_until = "running", job.max_attempts, datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    CalculationJob.requeue_expired(db_session)
+    assert reload(db_session, job_id).status == "failed"
+
+def test_running_jobs_keep_their_lease(db_session, test_user, worker, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 0.2)
+    job_id = submit(db_session, test_user)
+    create_calculation = Calculation.create_calculation
+    recovered = []
+
+    def slow(*args, **kwargs):
+        time.sleep(0.5)
+        recovered.append(CalculationJob.requeue_expired(db_session))
+        return create_calculation(*args, **kwargs)
+
+    monkeypatch.setattr(Calculation, "create_calculation", slow)
+    job = worker.run_once()
+    assert recovered == [0]
+    assert (job.status, job.attempts) == ("succeeded", 1)
+
+def test_lost_lease_drops_the_attempt(db_session, test_user, worker, monkeypatch):
+    job_id = submit(db_session, test_user)
+    create_calculation = Calculation.create_calculation
+
+    def requeued_and_claimed_elsewhere(*args, **kwargs):
+        stored = reload(db_session, job_id)
+        stored.locked_by = "other-worker"
+        db_session.commit()
+        return create_calculation(*args, **kwargs)
+
+    monkeypatch.setattr(Calculation, "create_calculation", requeued_and_claimed_elsewhere)
+    job = worker.run_once()
+    assert (job.status, job.locked_by, job.result) == ("running", "other-worker", None)
+    assert db_session.query(Calculation).filter(Calculation.user_id == test_user.id).count() == 0
+
+def test_requested_priority_is_capped(client, auth_headers):
+    response = client.post("/jobs", json={"type": "addition", "inputs": [1, 2], "priority": 10}, headers=auth_headers)
+    assert response.json()["priority"] == settings.JOB_MAX_PRIORITY == 0
+    response = client.post("/jobs", json={"type": "addition", "inputs": [1, 2], "priority": -5}, headers=auth_headers)
+    assert response.json()["priority"] == -5
+
+def test_queue_is_bounded_per_user(client, db_session, test_user, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_QUEUED_PER_USER", 1)
+    submit(db_session, test_user)
+    with pytest.raises(JobQueueFull):
+        CalculationJob.submit(db_session, test_user.id, "addition", [1, 2])
+    db_session.rollback()
+    response = client.post("/jobs", json={"type": "addition", "inputs": [1, 2]}, headers=auth_headers)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "10"
+
+def test_worker_loop_stops(db_session, test_user, worker):
+    job_id = submit(db_session, test_user)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    deadline = datetime.utcnow() + timedelta(seconds=10)
+    while reload(db_session, job_id).status != "succeeded" and datetime.utcnow() < deadline:
+        pass
+    worker.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert reload(db_session, job_id).status == "succeeded"
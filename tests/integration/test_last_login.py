@@ -0,0 +1,123 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app.auth.last_login import LastLoginBuffer, last_login_buffer
+from app.models.user import User
+from tests.conftest import TestingSessionLocal
+
+@pytest.fixture
+def buffer():
+    return LastLoginBuffer(session_factory=TestingSessionLocal, flush_interval=60, max_staleness=300)
+
+def test_record_keeps_newest_timestamp(buffer, test_user):
+    now = datetime.utcnow()
+    buffer.record(test_user.id, now)
+    buffer.record(test_user.id, now - timedelta(minutes=5))
+    buffer.record(test_user.id, now + timedelta(seconds=1))
+
+    assert len(buffer) == 1
+    assert buffer._pending[test_user.id] == now + timedelta(seconds=1)
+
+def test_flush_writes_all_users_in_one_statement(buffer, db_session, seed_users):
+    now = datetime.utcnow()
+    for offset, user in enumerate(seed_users):
+        buffer.record(user.id, now + timedelta(seconds=offset))
+
+    statements = []
+    engine = db_session.get_bind()
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert buffer.flush() == len(seed_users)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert len([s for s in statements if s.startswith("UPDATE")]) == 1
+    assert len(buffer) == 0
+    db_session.expire_all()
+    for offset, user in enumerate(seed_users):
+        assert user.last_login == now + timedelta(seconds=offset)
+
+def test_flush_empty_buffer_is_noop(buffer):
+    assert buffer.flush() == 0
+
+def test_max_staleness_forces_flush(db_session, test_user):
+    buffer = LastLoginBuffer(session_factory=TestingSessionLocal, flush_interval=60, max_staleness=0)
+    now = datetime.utcnow()
+    buffer.record(test_user.id, now)
+
+    assert len(buffer) == 0
+    db_session.refresh(test_user)
+    assert test_user.last_login == now
+
+def test_stop_flushes_pending(db_session, test_user):
+    buffer = LastLoginBuffer(session_factory=TestingSessionLocal, flush_interval=60, max_staleness=300)
+    buffer.start()
+    now = datetime.utcnow()
+    buffer.record(test_user.id, now)
+    buffer.stop()
+
+    db_session.refresh(test_user)
+    assert test_user.last_login == now
+
+def test_failed_flush_requeues(buffer, test_user):
+    def failing_execute(*args, **kwargs):
+        raise OperationalError("UPDATE users", {}, Exception("database is down"))
+
+    def broken_session():
+        session = TestingSessionLocal()
+        session.execute = failing_execute
+        return session
+
+    buffer.session_factory = broken_session
+    now = datetime.utcnow()
+    buffer.record(test_user.id, now)
+
+    assert buffer.flush() == 0
+    assert buffer._pending[test_user.id] == now
+
+def test_authenticate_write_through_when_disabled(db_session, monkeypatch):
+    monkeypatch.setattr(last_login_buffer, "flush_interval", 0)
+    password = "writethrough"
+    user = User(
+        first_name="Write",
+        last_name="Through",
+        email="writethrough@example.com",
+        username="writethrough",
+        password=User.hash_password(password)
+    )
+    db_session.add(user)
+    db_session.commit()
+
+    User.authenticate(db_session, "writethrough", password)
+    db_session.refresh(user)
+    assert user.last_login is not None
+
+def test_authenticate_reports_buffered_login_without_writing(db_session, monkeypatch):
+    monkeypatch.setattr(last_login_buffer, "flush_interval", 60)
+    password = "buffered"
+    user = User(
+        first_name="Buf",
+        last_name="Fered",
+        email="buffered@example.com",
+        username="buffered",
+        password=User.hash_password(password)
+    )
+    db_session.add(user)
+    db_session.commit()
+
+    statements = []
+    engine = db_session.get_bind()
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert User.authenticate(db_session, "buffered", password) is not None
+        assert user.last_login == last_login_buffer._pending[user.id]
+        db_session.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert not [s for s in statements if s.startswith("UPDATE")]
+    last_login_buffer.flush()
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+import uvicorn
+from starlette.responses import StreamingResponse
+
+from app import launcher
+from app.calculation_events import calculation_events
+from app.launcher import MemoryWatchdog, available_cpus, max_requests_for_worker, private_memory_mb, worker_count
+
+def write_cpu_max(tmp_path, content):
+    (tmp_path / "cpu.max").write_text(content)
+    return str(tmp_path)
+
+def test_available_cpus_follows_cgroup_quota(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    assert available_cpus(write_cpu_max(tmp_path, "max 100000\n")) == 8
+    assert available_cpus(write_cpu_max(tmp_path, "200000 100000\n")) == 2
+    assert available_cpus(write_cpu_max(tmp_path, "50000 100000\n")) == 1
+    assert available_cpus(write_cpu_max(tmp_path, "1600000 100000\n")) == 8
+    assert available_cpus(str(tmp_path / "missing")) == 8
+
+def test_worker_count():
+    assert worker_count(3) == 3
+    assert worker_count(0) == available_cpus()
+
+def test_max_requests_for_worker():
+    assert max_requests_for_worker(0, 100) is None
+    assert max_requests_for_worker(1000, 0) == 1000
+    assert all(1000 <= max_requests_for_worker(1000, 100) <= 1100 for _ in range(50))
+
+def test_loop_and_http_fall_back_when_not_installed(monkeypatch):
+    monkeypatch.setattr(launcher.importlib.util, "find_spec", lambda name: None)
+    assert launcher.choose_loop() == "asyncio"
+    assert launcher.choose_http() == "h11"
+
+def test_memory_watchdog_stops_server_over_limit():
+    assert private_memory_mb() > 0
+    server = SimpleNamespace(should_exit=False)
+    assert not MemoryWatchdog(server, 1e9, 1).check()
+    assert not server.should_exit
+    assert MemoryWatchdog(server, 0.001, 1).check()
+    assert server.should_exit
+
+def test_server_ends_event_streams_when_shutdown_starts():
+    async def app(scope, receive, send):
+        if scope["type"] == "http":
+            await StreamingResponse(calculation_events.stream("user"), media_type="text/event-stream")(scope, receive, send)
+
+    async def run():
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        server = launcher.Server(uvicorn.Config(app, lifespan="off", timeout_graceful_shutdown=30, log_level="warning"))
+        serving = asyncio.create_task(server.serve(sockets=[sock]))
+        while not server.started:
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET / HTTP/1.1\r\nHost: test\r\n\r\n")
+        await reader.readuntil(b"retry: ")
+        started = time.monotonic()
+        server.should_exit = True
+        await asyncio.wait_for(serving, 10)
+        writer.close()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 5
+
+@pytest.mark.slow
+def test_launcher_serves_recycles_and_shuts_down(tmp_path):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    database_url = f"sqlite:///{tmp_path / 'launcher.db'}"
+    env = {**os.environ, "DATABASE_URL": database_url}
+    subprocess.run([sys.executable, "-m", "app.database_init"], env=env, check=True, capture_output=True)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.launcher", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "2", "--max-requests", "2", "--max-requests-jitter", "0"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + 30
+        results = []
+        while len(results) < 10 and time.monotonic() < deadline:
+            try:
+                response = requests.post(f"http://127.0.0.1:{port}/add", json={"a": 1, "b": 2}, timeout=5)
+                results.append(response.json()["result"])
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        # More requests than two workers allow before recycling, so replacements served some.
+        assert results == [3] * 10
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+from app import database
+
+def test_importing_main_creates_no_engine_or_heavy_resources():
+    code = (
+        "import sys, main, app.database as database\n"
+        "assert database._engine is None and database._replica_router is None\n"
+        "print(sorted(name for name in ('passlib', 'numpy', 'jinja2') if name in sys.modules))\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == "[]"
+
+def test_engine_and_sessions_resolve_on_first_use():
+    assert database.engine is database.default_engine()
+    session = database.SessionLocal()
+    try:
+        assert session.get_bind() is database.default_engine()
+    finally:
+        session.close()
+    read_session = database.ReadSessionLocal()
+    try:
+        assert read_session.router is database.default_replica_router()
+    finally:
+        read_session.close()
@@ -0,0 +1,93 @@
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import event
+
+from app.models.calculation import Calculation, Addition
+from app.models.loading import loader_option
+from app.models.user import User
+from tests.integration.test_fastapi_calculator import client
+
+def add_calculations(db_session, user, count):
+    now = datetime.utcnow()
+    calculations = []
+    for i in range(count):
+        calc = Addition(user_id=user.id, inputs=[i, 1], result=i + 1, created_at=now + timedelta(seconds=i))
+        calculations.append(calc)
+        db_session.add(calc)
+    db_session.commit()
+    return calculations
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self)
+
+def test_loader_option_invalid_strategy():
+    with pytest.raises(ValueError, match="Unsupported loader strategy"):
+        loader_option(User.calculations, "eager")
+
+@pytest.mark.parametrize("strategy", ["selectin", "joined", "subquery"])
+def test_query_with_calculations_avoids_n_plus_one(db_session, seed_users, strategy):
+    for user in seed_users:
+        add_calculations(db_session, user, 2)
+    db_session.expunge_all()
+
+    with QueryCounter(db_session.get_bind()) as counter:
+        users = User.query_with_calculations(db_session, strategy).all()
+        totals = [len(user.calculations) for user in users]
+
+    assert totals == [2] * len(seed_users)
+    assert counter.count <= 2, f"Expected at most 2 queries, got {counter.count}"
+
+def test_query_with_user_eager_loads_owner(db_session, test_user):
+    add_calculations(db_session, test_user, 3)
+    email = test_user.email
+    db_session.expunge_all()
+
+    with QueryCounter(db_session.get_bind()) as counter:
+        calculations = Calculation.query_with_user(db_session).all()
+        emails = {calc.user.email for calc in calculations}
+
+    assert emails == {email}
+    assert counter.count == 1
+
+def test_get_with_recent_calculations(db_session, test_user):
+    add_calculations(db_session, test_user, 5)
+    user_id = test_user.id
+    db_session.expunge_all()
+
+    user = User.get_with_recent_calculations(db_session, user_id, limit=3)
+    assert [calc.result for calc in user.calculations] == [5, 4, 3]
+    assert all(calc.user is user for calc in user.calculations)
+
+def test_get_with_recent_calculations_missing_user(db_session):
+    assert User.get_with_recent_calculations(db_session, uuid.uuid4()) is None
+
+def test_recent_calculations_endpoint(client, db_session, test_user):
+    add_calculations(db_session, test_user, 4)
+    token = User.create_access_token({"sub": str(test_user.id)})
+
+    response = client.get(
+        "/users/me/calculations/recent?limit=2",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["id"] == str(test_user.id)
+    assert [calc["result"] for calc in body["calculations"]] == [4, 3]
+
+def test_recent_calculations_endpoint_requires_auth(client):
+    response = client.get("/users/me/calculations/recent")
+    assert response.status_code == 401
@@ -0,0 +1,77 @@
+import pytest
+from datetime import date, datetime
+from sqlalchemy import text
+
+from app.models.calculation import Calculation, Addition
+from app.partitions import (
+    DEFAULT_PARTITION,
+    add_months,
+    create_partition,
+    ensure_partitions,
+    expire_partitions,
+    is_partitioned,
+    list_partitions,
+    month_start,
+    partition_name,
+)
+from tests.conftest import test_engine
+
+requires_postgres = pytest.mark.skipif(
+    test_engine.dialect.name != "postgresql", reason="native partitioning requires PostgreSQL"
+)
+
+def test_month_helpers():
+    assert month_start(date(2026, 10, 19)) == date(2026, 10, 1)
+    assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partition_name(date(2026, 3, 1)) == "calculations_p202603"
+
+def test_partition_management_is_noop_without_partitioning(db_session):
+    connection = db_session.connection()
+    if test_engine.dialect.name == "postgresql":
+        pytest.skip("table is partitioned on PostgreSQL")
+    assert not is_partitioned(connection)
+    assert ensure_partitions(connection) == []
+    assert expire_partitions(connection, retention_months=0) == []
+
+@requires_postgres
+def test_calculations_table_is_partitioned_by_month(db_session):
+    connection = db_session.connection()
+    assert is_partitioned(connection)
+    months = [month for _, month in list_partitions(connection)]
+    assert month_start(datetime.utcnow().date()) in months
+    assert connection.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar()
+
+@requires_postgres
+def test_create_partition_moves_rows_out_of_default(db_session, test_user):
+    old = Addition(user_id=test_user.id, inputs=[1, 2], result=3, created_at=datetime(2001, 5, 17))
+    db_session.add(old)
+    db_session.commit()
+    connection = db_session.connection()
+    name = partition_name(date(2001, 5, 1))
+
+    try:
+        assert create_partition(connection, date(2001, 5, 1))
+        in_partition = connection.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+        assert in_partition == 1
+        assert db_session.get(Calculation, old.id).result == 3
+    finally:
+        connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        db_session.commit()
+
+@requires_postgres
+def test_expire_partitions_detaches_old_months(db_session):
+    connection = db_session.connection()
+    old_month = date(2000, 1, 1)
+    name = partition_name(old_month)
+    create_partition(connection, old_month)
+
+    try:
+        expired = expire_partitions(connection, retention_months=12, drop=False)
+        assert name in expired
+        assert name not in [partition for partition, _ in list_partitions(connection)]
+        # Detached partitions survive as standalone tables until dropped.
+        assert connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+    finally:
+        connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        db_session.commit()
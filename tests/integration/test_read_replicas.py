@@ -0,0 +1,128 @@
+import pytest
+import uuid
+from sqlalchemy import create_engine, select, text
+
+from app.cache.shared import SharedMemoryCache
+from app.database import Base, ReplicaRouter, RoutingSession
+from app.models.user import User
+
+def make_user(label):
+    return User(
+        first_name=label,
+        last_name="Node",
+        email=f"{label}@example.com",
+        username=f"{label}-user",
+        password="Password123"
+    )
+
+@pytest.fixture
+def nodes(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for node, label in ((primary, "primary"), (replica, "replica")):
+        Base.metadata.create_all(bind=node)
+        with RoutingSession(bind=node) as session:
+            session.add(make_user(label))
+            session.commit()
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+@pytest.fixture
+def router(nodes):
+    primary, replica = nodes
+    return ReplicaRouter(primary, [replica], sticky_seconds=60, max_lag=5)
+
+def read_session(router, **info):
+    session = RoutingSession(router=router, bind=router.primary)
+    session.info.update(info)
+    return session
+
+def node_label(session):
+    return session.execute(select(User.first_name)).scalar()
+
+def test_reads_go_to_replica(router):
+    with read_session(router) as session:
+        assert node_label(session) == "replica"
+
+def test_writes_and_raw_sql_go_to_primary(router):
+    with read_session(router) as session:
+        assert session.get_bind(clause=text("SELECT 1")) is router.primary
+        session.add(make_user("written"))
+        session.commit()
+
+    with RoutingSession(bind=router.primary) as primary_session:
+        assert primary_session.query(User).filter_by(first_name="written").count() == 1
+
+def test_reads_after_flush_stay_on_primary(router):
+    with read_session(router) as session:
+        session.add(make_user("pending"))
+        session.flush()
+        assert session.query(User).filter_by(first_name="pending").count() == 1
+
+def test_read_your_writes_stickiness(router):
+    user_id = uuid.uuid4()
+    with read_session(router, user_id=user_id) as session:
+        session.add(make_user("sticky"))
+        session.commit()
+
+    assert router.is_sticky(user_id)
+    with read_session(router, user_id=user_id) as session:
+        assert node_label(session) == "primary"
+    with read_session(router, user_id=uuid.uuid4()) as session:
+        assert node_label(session) == "replica"
+
+def test_stickiness_is_shared_by_workers_on_the_host(nodes, tmp_path):
+    primary, replica = nodes
+    cache = SharedMemoryCache(str(tmp_path / "cache"), 64 * 1024)
+    writer = ReplicaRouter(primary, [replica], sticky_seconds=60, shared=cache)
+    other_worker = ReplicaRouter(primary, [replica], sticky_seconds=60, shared=cache)
+    user_id = uuid.uuid4()
+    with read_session(writer, user_id=user_id) as session:
+        session.add(make_user("sticky"))
+        session.commit()
+
+    with read_session(other_worker, user_id=user_id) as session:
+        assert node_label(session) == "primary"
+    with read_session(other_worker, user_id=uuid.uuid4()) as session:
+        assert node_label(session) == "replica"
+    cache.close()
+
+def test_failed_replica_read_is_retried_on_primary(nodes, tmp_path):
+    primary, _ = nodes
+    # Reachable, but every query fails (as on a recovery conflict or statement timeout).
+    broken = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    router = ReplicaRouter(primary, [broken])
+    with read_session(router) as session:
+        assert node_label(session) == "primary"
+        assert session.info["replica_failed"]
+        assert session.get_bind(clause=select(User)) is router.primary
+    broken.dispose()
+
+def test_falls_back_when_replica_down_or_lagging(router, nodes):
+    _, replica = nodes
+    router.mark_down(replica)
+    with read_session(router) as session:
+        assert node_label(session) == "primary"
+
+    router._down_until.clear()
+    router._lag[replica] = 60
+    with read_session(router) as session:
+        assert node_label(session) == "primary"
+
+    router.check_health()
+    with read_session(router) as session:
+        assert node_label(session) == "replica"
+
+def test_health_check_marks_unreachable_replica_down(nodes, tmp_path):
+    primary, _ = nodes
+    unreachable = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    router = ReplicaRouter(primary, [unreachable])
+    router.check_health()
+    assert router.healthy_replicas() == []
+    assert router.reader() is primary
+
+def test_without_replicas_uses_session_bind(nodes):
+    primary, _ = nodes
+    with RoutingSession(router=ReplicaRouter(primary, []), bind=primary) as session:
+        assert node_label(session) == "primary"
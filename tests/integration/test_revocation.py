@@ -0,0 +1,114 @@
+import pytest
+import uuid
+from datetime import datetime, timedelta
+
+from app.auth import revocation
+from app.auth.revocation import TokenRevocationList, revoke_token
+from app.models.revoked_token import RevokedToken
+from app.models.user import User
+from tests.conftest import TestingSessionLocal
+from tests.integration.test_fastapi_calculator import client
+
+@pytest.fixture
+def revocations():
+    return TokenRevocationList(session_factory=TestingSessionLocal, capacity=100, error_rate=0.01, exact_size=2)
+
+def test_token_contains_jti():
+    token = User.create_access_token({"sub": str(uuid.uuid4())})
+    assert User.decode_token(token)["jti"]
+
+def test_revoked_token_fails_verification(db_session, test_user):
+    token = User.create_access_token({"sub": str(test_user.id)})
+    assert User.verify_token(token) == test_user.id
+
+    revoke_token(db_session, User.decode_token(token)["jti"], test_user.id)
+    db_session.commit()
+
+    assert User.verify_token(token) is None
+    assert db_session.query(RevokedToken).count() == 1
+
+def test_unrevoked_tokens_never_hit_database(revocations):
+    revocations.add("revoked")
+    assert not any(revocations.is_revoked(f"fresh-{i}") for i in range(50))
+    assert revocations.database_lookups <= 5
+
+def test_refresh_picks_up_other_workers_revocations(db_session, revocations):
+    revocations.rebuild()
+    assert not revocations.is_revoked("from-another-worker")
+
+    db_session.add(RevokedToken(jti="from-another-worker", expires_at=datetime.utcnow() + timedelta(minutes=5)))
+    db_session.commit()
+
+    assert revocations.refresh() == 1
+    assert revocations.is_revoked("from-another-worker")
+
+def test_refresh_picks_up_revocations_committed_late(db_session, revocations):
+    now = datetime.utcnow()
+    revocations.rebuild()
+    db_session.add(RevokedToken(jti="stamped-later", revoked_at=now))
+    db_session.commit()
+    revocations.refresh()
+
+    # Stamped before the watermark but committed after the last refresh.
+    db_session.add(RevokedToken(jti="stamped-earlier", revoked_at=now - timedelta(seconds=2)))
+    db_session.commit()
+    revocations.refresh()
+    assert revocations.is_revoked("stamped-earlier")
+    assert revocations.database_lookups == 0
+    assert revocations.bloom.count == 2
+
+def test_evicted_revocation_confirmed_from_database(db_session, revocations):
+    now = datetime.utcnow()
+    for offset, jti in enumerate(("first", "second", "third")):
+        db_session.add(RevokedToken(jti=jti, revoked_at=now + timedelta(seconds=offset)))
+    db_session.commit()
+    revocations.rebuild()
+
+    assert "first" not in revocations._exact
+    assert revocations.is_revoked("first")
+    assert revocations.database_lookups == 1
+
+def test_rebuild_purges_expired_revocations(db_session, revocations):
+    db_session.add(RevokedToken(jti="expired", expires_at=datetime.utcnow() - timedelta(minutes=1)))
+    db_session.add(RevokedToken(jti="active", expires_at=datetime.utcnow() + timedelta(minutes=5)))
+    db_session.commit()
+
+    assert revocations.rebuild() == 1
+    assert revocations.is_revoked("active")
+    assert db_session.query(RevokedToken).filter_by(jti="expired").count() == 0
+
+def test_refresh_grows_filter_when_over_capacity(db_session):
+    revocations = TokenRevocationList(session_factory=TestingSessionLocal, capacity=2, error_rate=0.01, exact_size=10)
+    revocations.rebuild()
+    for i in range(3):
+        db_session.add(RevokedToken(jti=f"jti-{i}"))
+    db_session.commit()
+
+    revocations.refresh()
+    assert revocations.capacity >= 4
+    assert all(revocations.is_revoked(f"jti-{i}") for i in range(3))
+
+def test_logout_revokes_token(client, test_user):
+    token = User.create_access_token({"sub": str(test_user.id)})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/users/me/calculations/recent", headers=headers).status_code == 200
+    assert client.post("/auth/logout", headers=headers).status_code == 204
+    assert client.get("/users/me/calculations/recent", headers=headers).status_code == 401
+
+def test_cli_revocations_expire_and_are_purged(db_session, revocations, test_user, monkeypatch):
+    monkeypatch.setattr(revocation, "SessionLocal", TestingSessionLocal)
+    token = User.create_access_token({"sub": str(test_user.id)}, timedelta(minutes=-1))
+    claims = User.decode_token(User.create_access_token({"sub": str(test_user.id)}))
+
+    revocation.main([token, claims["jti"]])
+
+    rows = {row.jti: row for row in db_session.query(RevokedToken)}
+    expired = rows.pop(revocation.parse_revocation(token)[0])
+    assert expired.user_id == test_user.id
+    assert expired.expires_at < datetime.utcnow()
+    # A bare jti is kept no longer than a token issued now could live.
+    assert rows[claims["jti"]].expires_at <= datetime.utcfromtimestamp(claims["exp"]) + timedelta(seconds=1)
+
+    assert revocations.rebuild() == 1
+    assert db_session.query(RevokedToken).count() == 1
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+
+from anyio import to_thread
+
+from app.runtime_monitor import (
+    RuntimeMonitor,
+    loop_lag,
+    loop_stalls,
+    threadpool_busy,
+    threadpool_queue_wait,
+    threadpool_size,
+    threadpool_waiting,
+)
+from tests.integration.test_fastapi_calculator import client
+
+def block_the_loop(seconds):
+    time.sleep(seconds)
+
+def test_blocked_loop_is_measured_and_its_stack_logged(caplog):
+    monitor = RuntimeMonitor(interval=0.02, warn_after=0.1, threadpool_limit=0)
+    stalls_before = loop_stalls.value()
+    lag_before = loop_lag.sum()
+
+    async def run():
+        monitor.start()
+        try:
+            await asyncio.sleep(0.1)
+            block_the_loop(0.4)
+            await asyncio.sleep(0.1)
+        finally:
+            monitor.stop()
+
+    with caplog.at_level(logging.WARNING, logger="app.runtime_monitor"):
+        asyncio.run(run())
+
+    assert loop_stalls.value() == stalls_before + 1
+    assert loop_lag.sum() - lag_before >= 0.3
+    assert "Event loop blocked" in caplog.text
+    assert "block_the_loop" in caplog.text
+
+def test_idle_loop_does_not_warn():
+    monitor = RuntimeMonitor(interval=0.01, warn_after=0.2, threadpool_limit=0)
+    stalls_before = loop_stalls.value()
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.2)
+        monitor.stop()
+
+    asyncio.run(run())
+    assert loop_stalls.value() == stalls_before
+
+def test_threadpool_size_occupancy_and_queue_wait():
+    monitor = RuntimeMonitor(interval=0.02, warn_after=10, threadpool_limit=2)
+    waits_before = threadpool_queue_wait.count()
+
+    async def run():
+        monitor.start()
+        assert to_thread.current_default_thread_limiter().total_tokens == 2
+        busy = [asyncio.ensure_future(to_thread.run_sync(time.sleep, 0.3)) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        monitor.sample_threadpool()
+        sampled = (threadpool_size.value(), threadpool_busy.value(), threadpool_waiting.value())
+        await asyncio.gather(*busy)
+        await asyncio.sleep(0.1)
+        monitor.stop()
+        return sampled
+
+    size, busy, waiting = asyncio.run(run())
+    assert size == 2
+    assert busy == 2
+    # The third sleep and the monitor's probe are queued.
+    assert waiting >= 1
+    assert threadpool_queue_wait.count() > waits_before
+    assert threadpool_queue_wait.sum() >= 0.1
+
+def test_monitor_runs_with_the_app(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "event_loop_lag_seconds" in response.text
+    assert "threadpool_size 40" in response.text
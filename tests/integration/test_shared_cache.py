@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+import pytest
+
+from app.cache import shared
+from app.cache.shared import SharedMemoryCache, memoized_result, result_cache_key, user_cache_key
+from app.config import settings
+from app.models.calculation import Addition, Division
+from app.models.user import User
+from tests.integration.test_fastapi_calculator import client
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SharedMemoryCache(str(tmp_path / "cache"), 64 * 1024, slot_size=1024, group_size=4)
+    yield cache
+    cache.close()
+
+@pytest.fixture
+def enabled_cache(cache, monkeypatch):
+    monkeypatch.setattr(settings, "SHARED_CACHE_ENABLED", True)
+    monkeypatch.setattr(shared, "_shared_cache", cache)
+    return cache
+
+def read_in_child(path, size, slot_size, group_size, key, queue):
+    child = SharedMemoryCache(path, size, slot_size=slot_size, group_size=group_size)
+    queue.put(child.get(key))
+    child.set(b"from-child", b"hello", 60)
+    child.close()
+
+def test_set_get_delete(cache):
+    assert cache.get(b"a") is None
+    assert cache.set(b"a", b"1", 60)
+    assert cache.get(b"a") == b"1"
+    assert cache.set(b"a", b"22", 60)
+    assert cache.get(b"a") == b"22"
+    assert cache.delete(b"a")
+    assert cache.get(b"a") is None
+    assert not cache.delete(b"a")
+
+def test_entries_expire(cache):
+    cache.set(b"a", b"1", 0.05)
+    assert cache.get(b"a") == b"1"
+    time.sleep(0.1)
+    assert cache.get(b"a") is None
+
+def test_oversized_entries_are_refused(cache):
+    assert not cache.set(b"big", b"x" * cache.capacity, 60)
+    assert cache.get(b"big") is None
+
+def test_memory_is_fixed_and_soonest_expiry_is_evicted(cache):
+    for index in range(cache.slot_count * 4):
+        cache.set(b"key-%d" % index, b"v", 60 + index)
+    assert len(cache.keys()) == cache.slot_count
+    # The newest (latest-expiring) entries survive.
+    last = cache.slot_count * 4 - 1
+    assert cache.get(b"key-%d" % last) == b"v"
+    assert cache.get(b"key-0") is None
+
+def test_clear(cache):
+    cache.set(b"a", b"1", 60)
+    cache.clear()
+    assert cache.keys() == []
+
+def test_layout_change_uses_a_new_file_and_leaves_old_mappings_alone(tmp_path):
+    path = str(tmp_path / "cache")
+    first = SharedMemoryCache(path, 64 * 1024, slot_size=256)
+    first.set(b"a", b"1", 60)
+    reopened = SharedMemoryCache(path, 64 * 1024, slot_size=256)
+    assert reopened.get(b"a") == b"1"
+    reopened.close()
+
+    resized = SharedMemoryCache(path, 64 * 1024, slot_size=512)
+    assert resized.get(b"a") is None
+    assert resized.file_path != first.file_path
+    # A worker still on the old layout keeps a working mapping (truncating it would SIGBUS).
+    assert first.get(b"a") == b"1"
+    first.set(b"b", b"2", 60)
+    assert first.get(b"b") == b"2"
+    # Only the current layout's file keeps a name.
+    assert sorted(name for name in os.listdir(tmp_path) if not name.endswith(".lock")) == [os.path.basename(resized.file_path)]
+    first.close()
+    resized.close()
+
+def test_damaged_file_is_replaced(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = SharedMemoryCache(path, 64 * 1024, slot_size=256)
+    cache.close()
+    with open(cache.file_path, "r+b") as handle:
+        handle.write(b"garbage!")
+    replaced = SharedMemoryCache(path, 64 * 1024, slot_size=256)
+    assert replaced.set(b"a", b"1", 60) and replaced.get(b"a") == b"1"
+    replaced.close()
+
+def test_visible_across_processes(cache):
+    cache.set(b"from-parent", b"world", 60)
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(
+        target=read_in_child,
+        args=(cache.path, 64 * 1024, cache.slot_size, cache.group_size, b"from-parent", queue)
+    )
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+    assert queue.get(timeout=5) == b"world"
+    assert cache.get(b"from-child") == b"hello"
+
+def test_concurrent_writers_never_produce_torn_reads(cache):
+    values = [bytes([index]) * 100 for index in range(1, 9)]
+    stop = threading.Event()
+
+    def write(value):
+        while not stop.is_set():
+            cache.set(b"hot", value, 60)
+
+    writers = [threading.Thread(target=write, args=(value,)) for value in values]
+    for writer in writers:
+        writer.start()
+    try:
+        for _ in range(2000):
+            value = cache.get(b"hot")
+            assert value is None or value in values
+    finally:
+        stop.set()
+        for writer in writers:
+            writer.join()
+
+def test_result_keys_depend_on_type_and_inputs():
+    assert result_cache_key("addition", [1.0, 2.0]) == result_cache_key("addition", [1.0, 2.0])
+    assert result_cache_key("addition", [1.0, 2.0]) != result_cache_key("multiplication", [1.0, 2.0])
+    assert result_cache_key("addition", [1.0, 2.0]) != result_cache_key("addition", [2.0, 1.0])
+
+def test_memoized_result(enabled_cache, monkeypatch):
+    monkeypatch.setattr(settings, "SHARED_CACHE_MIN_INPUTS", 3)
+    user_id = uuid.uuid4()
+    calculation = Addition(user_id=user_id, inputs=[1.0, 2.0, 3.0])
+    assert memoized_result(calculation) == 6.0
+    assert enabled_cache.get(result_cache_key("addition", [1.0, 2.0, 3.0])) is not None
+
+    enabled_cache.set(result_cache_key("addition", [1.0, 2.0, 3.0]), shared.RESULT.pack(42.0), 60)
+    assert memoized_result(Addition(user_id=user_id, inputs=[1.0, 2.0, 3.0])) == 42.0
+    # Short inputs are computed directly.
+    assert memoized_result(Addition(user_id=user_id, inputs=[1.0, 2.0])) == 3.0
+    with pytest.raises(ValueError):
+        memoized_result(Division(user_id=user_id, inputs=[1.0, 0.0, 3.0]))
+    assert enabled_cache.get(result_cache_key("division", [1.0, 0.0, 3.0])) is None
+
+def test_memoized_result_without_cache(monkeypatch):
+    monkeypatch.setattr(settings, "SHARED_CACHE_ENABLED", False)
+    assert shared.default_shared_cache() is None
+    assert memoized_result(Addition(user_id=uuid.uuid4(), inputs=[1.0, 2.0])) == 3.0
+
+def test_authenticated_user_is_served_from_cache(client, enabled_cache, db_session, test_user):
+    token = User.create_access_token({"sub": str(test_user.id)})
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.post("/calculations", json={"type": "addition", "inputs": [1, 2]}, headers=headers)
+    assert response.status_code == 201
+    assert enabled_cache.get(user_cache_key(test_user.id)) is not None
+
+    test_user.is_active = False
+    db_session.flush()
+    # Still cached until the change commits, so no lookup can re-cache the old row meanwhile.
+    assert enabled_cache.get(user_cache_key(test_user.id)) is not None
+    db_session.commit()
+    assert enabled_cache.get(user_cache_key(test_user.id)) is None
+    response = client.post("/calculations", json={"type": "addition", "inputs": [1, 2]}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,45 @@
+import uuid
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.config import settings
+from app.database import Base, get_engine, get_sessionmaker
+from app.models.calculation import Calculation, Addition
+from app.models.user import User
+
+def test_sqlite_engine_is_tuned(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA mmap_size")).scalar() == settings.SQLITE_MMAP_SIZE
+        assert connection.execute(text("PRAGMA foreign_keys")).scalar() == 1
+    engine.dispose()
+
+def test_column_types_are_portable():
+    inputs = Calculation.__table__.c.inputs.type
+    user_id = User.__table__.c.id.type
+    assert inputs.compile(dialect=postgresql.dialect()) == "JSONB"
+    assert inputs.compile(dialect=sqlite.dialect()) == "JSON"
+    assert user_id.compile(dialect=postgresql.dialect()) == "UUID"
+    assert user_id.compile(dialect=sqlite.dialect()) == "CHAR(32)"
+
+def test_models_round_trip_on_sqlite(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = get_sessionmaker(engine)
+
+    with Session() as session:
+        user = User(first_name="Lite", last_name="User", email="lite@example.com", username="lite", password="Password123")
+        session.add(user)
+        session.flush()
+        session.add(Addition(user_id=user.id, inputs=[1.5, 2.5], result=4.0))
+        session.commit()
+        user_id = user.id
+
+    with Session() as session:
+        calculation = session.query(Calculation).one()
+        assert isinstance(calculation, Addition)
+        assert isinstance(calculation.user_id, uuid.UUID) and calculation.user_id == user_id
+        assert calculation.inputs == [1.5, 2.5]
+    engine.dispose()
@@ -0,0 +1,44 @@
+from app.compression import brotli
+from app.ui import PrecompressedPage, index_page
+from tests.integration.test_fastapi_calculator import client
+
+def test_index_is_served_precompressed(client):
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    assert response.content == index_page().variants["identity"]
+    assert b"<html" in response.content.lower()
+
+def test_identity_when_client_does_not_accept_compression(client):
+    response = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == index_page().etags["identity"]
+
+def test_conditional_request_returns_304(client):
+    etag = client.get("/", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    response = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    # The gzip variant's tag does not validate for a client that cannot decode gzip.
+    response = client.get("/", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] == index_page().etags["identity"]
+    assert "content-encoding" not in response.headers
+
+def test_etag_depends_only_on_content():
+    body = b"<html>" + b"x" * 1000 + b"</html>"
+    assert PrecompressedPage(body).etags == PrecompressedPage(body).etags
+    assert PrecompressedPage(body).etags != PrecompressedPage(body + b" ").etags
+
+def test_variants_that_do_not_shrink_are_dropped():
+    page = PrecompressedPage(b"<p>")
+    assert list(page.variants) == ["identity"]
+
+def test_brotli_preferred_when_available(client):
+    response = client.get("/", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert brotli.decompress(index_page().variants["br"]) == index_page().variants["identity"]
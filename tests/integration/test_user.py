@@ -8,7 +8,8 @@ from sqlalchemy.orm import sessionmaker
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 
-from app.models.user import User
+from app.auth.last_login import last_login_buffer
+from app.models.user import User, hash_pool, shutdown_hash_pool
 from tests.conftest import create_fake_user, managed_db_session
 from tests.integration.test_fastapi_calculator import client
 from app.config import settings
@@ -321,6 +322,8 @@ def test_authenticate_updates_last_login(db_session):
     old_last_login = user.last_login
 
     User.authenticate(db_session, "lastloginuser", password)
+    # last_login is coalesced in memory; force the batched write.
+    last_login_buffer.flush()
     db_session.refresh(user)
     assert user.last_login is not None
     if old_last_login is not None:
@@ -456,3 +459,76 @@ def test_register_duplicate_username(db_session):
 
 
 
+
+def test_bulk_register_statuses(db_session):
+    User.register(db_session, {
+        "first_name": "Existing",
+        "last_name": "User",
+        "email": "existing@example.com",
+        "username": "existinguser",
+        "password": "Password123"
+    })
+    db_session.commit()
+
+    records = [
+        {"first_name": "Bulk", "last_name": "One", "email": "bulk1@example.com", "username": "bulkone", "password": "Password123"},
+        {"first_name": "Bulk", "last_name": "Two", "email": "existing@example.com", "username": "bulktwo", "password": "Password123"},
+        {"first_name": "Bulk", "last_name": "Three", "email": "bulk1@example.com", "username": "bulkthree", "password": "Password123"},
+        {"first_name": "Bulk", "last_name": "Four", "email": "not-an-email", "username": "bulkfour", "password": "Password123"},
+        "not-a-record",
+    ]
+    results = User.bulk_register(db_session, records)
+    db_session.commit()
+
+    assert [r["status"] for r in results] == ["created", "duplicate", "duplicate", "invalid", "invalid"]
+    assert results[0]["id"] is not None
+    assert results[1]["id"] is None
+
+    created = db_session.query(User).filter_by(email="bulk1@example.com").one()
+    assert created.id == results[0]["id"]
+    assert created.verify_password("Password123")
+    assert db_session.query(User).count() == 2
+
+def test_hash_passwords_process_pool(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_HASH_MIN_BATCH", 2)
+    monkeypatch.setattr(settings, "BULK_HASH_WORKERS", 2)
+    try:
+        hashes = User.hash_passwords(["Password123", "Password456"])
+        pool = hash_pool()
+        assert len(User.hash_passwords(["Password789", "Password000"])) == 2
+        # One pool for every batch, not one per call.
+        assert hash_pool() is pool
+    finally:
+        shutdown_hash_pool()
+    assert len(hashes) == 2
+    assert User(password=hashes[1]).verify_password("Password456")
+    assert hash_pool() is not pool
+    shutdown_hash_pool()
+
+def test_bulk_register_endpoint(client, db_session, test_user, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_USER_IDS", f"{uuid.uuid4()}, {test_user.id}")
+    token = User.create_access_token({"sub": str(test_user.id)})
+    payload = {"users": [
+        {"first_name": "Api", "last_name": "Bulk", "email": "apibulk@example.com", "username": "apibulk", "password": "Password123"},
+        {"first_name": "Api", "last_name": "Bulk", "email": "apibulk2@example.com", "username": "ab", "password": "Password123"},
+    ]}
+    response = client.post("/users/bulk-register", json=payload, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["created"], body["duplicates"], body["invalid"]) == (1, 0, 1)
+    assert db_session.query(User).filter_by(username="apibulk").count() == 1
+
+def test_bulk_register_endpoint_requires_admin(client, db_session, test_user):
+    token = User.create_access_token({"sub": str(test_user.id)})
+    payload = {"users": [{"first_name": "Api", "last_name": "Bulk", "email": "apibulk@example.com", "username": "apibulk", "password": "Password123"}]}
+    response = client.post("/users/bulk-register", json=payload, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403
+    assert db_session.query(User).filter_by(username="apibulk").count() == 0
+
+def test_bulk_register_endpoint_rejects_oversized_batch(client, test_user, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_USER_IDS", str(test_user.id))
+    monkeypatch.setattr(settings, "BULK_REGISTER_MAX_RECORDS", 1)
+    token = User.create_access_token({"sub": str(test_user.id)})
+    response = client.post("/users/bulk-register", json={"users": [{}, {}]}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 413
@@ -0,0 +1,107 @@
+import struct
+import uuid
+
+import numpy as np
+import pytest
+
+from app import wire
+from app.models.calculation import Calculation
+from app.models.user import User
+from app.wire import HEADER, MSGPACK, OCTET_STREAM, WireFormatError, decode_frame, encode_frame, negotiate_media_type
+from tests.integration.test_fastapi_calculator import client
+
+@pytest.fixture
+def auth_headers(test_user):
+    token = User.create_access_token({"sub": str(test_user.id)})
+    return {"Authorization": f"Bearer {token}"}
+
+def test_frame_round_trip_reads_inputs_in_place():
+    body = encode_frame("division", [100, 4, 0.5])
+    assert len(body) == HEADER.size + 24
+    calculation_type, values = decode_frame(body)
+    assert calculation_type == "division"
+    assert values.tolist() == [100, 4, 0.5]
+    assert values.dtype == np.dtype("<f8")
+    assert not values.flags.owndata
+
+@pytest.mark.parametrize("body, message", [
+    (b"CALC", "shorter than"),
+    (struct.pack("<4sBBHQ", b"JSON", 1, 0, 1, 0), "not a version 1"),
+    (struct.pack("<4sBBHQ", b"CALC", 2, 0, 1, 0), "not a version 1"),
+    (struct.pack("<4sBBHQ", b"CALC", 1, 0, 1, 2) + b"\0" * 8, "announces 2 values"),
+    (struct.pack("<4sBBHQ", b"CALC", 1, 0, 0, 0), "Unsupported calculation type code: 0"),
+    (struct.pack("<4sBBHQ", b"CALC", 1, 0, 99, 0), "Unsupported calculation type code: 99"),
+])
+def test_decode_frame_rejects_malformed_bodies(body, message):
+    with pytest.raises(WireFormatError, match=message):
+        decode_frame(body)
+
+def test_negotiate_media_type():
+    assert negotiate_media_type(None) == "application/json"
+    assert negotiate_media_type("*/*") == "application/json"
+    assert negotiate_media_type("application/octet-stream") == OCTET_STREAM
+    assert negotiate_media_type("application/json;q=0.5, application/octet-stream") == OCTET_STREAM
+    assert negotiate_media_type("text/html") == "application/json"
+
+def test_create_from_octet_stream(client, db_session, auth_headers):
+    headers = {**auth_headers, "Content-Type": OCTET_STREAM}
+    response = client.post("/calculations", content=encode_frame("multiplication", [1.5, 4, 2]), headers=headers)
+    assert response.status_code == 201, response.text
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["inputs"] == [1.5, 4, 2]
+    assert response.json()["result"] == 12
+    # Stored as JSON like any other calculation.
+    stored = db_session.get(Calculation, uuid.UUID(response.json()["id"]))
+    assert (stored.type, stored.inputs) == ("multiplication", [1.5, 4, 2])
+
+def test_octet_stream_response(client, auth_headers):
+    headers = {**auth_headers, "Accept": OCTET_STREAM}
+    response = client.post("/calculations", json={"type": "addition", "inputs": [1, 2]}, headers=headers)
+    assert response.status_code == 201
+    assert response.headers["content-type"] == OCTET_STREAM
+    calculation_type, values = decode_frame(response.content)
+    assert (calculation_type, values.tolist()) == ("addition", [3])
+    uuid.UUID(response.headers["x-calculation-id"])
+
+@pytest.mark.parametrize("calculation_type, inputs, error", [
+    ("division", [1, 0], "Cannot divide by zero"),
+    ("addition", [1], "At least two numbers are required for calculation"),
+    ("addition", [1, float("nan")], "Inputs must be finite numbers"),
+    ("percentile", [101, 1, 2], "Percentile must be between 0 and 100"),
+])
+def test_octet_stream_validation(client, auth_headers, calculation_type, inputs, error):
+    headers = {**auth_headers, "Content-Type": OCTET_STREAM}
+    response = client.post("/calculations", content=encode_frame(calculation_type, inputs), headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {"error": error}
+
+def test_malformed_and_unsupported_bodies(client, auth_headers):
+    response = client.post("/calculations", content=b"CALC", headers={**auth_headers, "Content-Type": OCTET_STREAM})
+    assert response.status_code == 400
+    response = client.post("/calculations", content=b"type=addition", headers={**auth_headers, "Content-Type": "text/plain"})
+    assert response.status_code == 415
+    response = client.post("/calculations", content=b"{", headers={**auth_headers, "Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert response.json()["error"].startswith("body: ")
+
+def test_job_from_octet_stream(client, auth_headers):
+    headers = {**auth_headers, "Content-Type": OCTET_STREAM}
+    response = client.post("/jobs", content=encode_frame("subtraction", [10, 4]), headers=headers)
+    assert response.status_code == 202, response.text
+    assert response.json()["type"] == "subtraction"
+
+def test_msgpack_request_and_response(client, auth_headers):
+    headers = {**auth_headers, "Content-Type": MSGPACK, "Accept": MSGPACK}
+    body = wire.msgpack.packb({"type": "mean", "inputs": np.array([1, 2, 6], dtype="<f8").tobytes()})
+    response = client.post("/calculations", content=body, headers=headers)
+    assert response.status_code == 201, response.text
+    assert response.headers["content-type"] == MSGPACK
+    document = wire.msgpack.unpackb(response.content)
+    assert document["result"] == 3
+    assert np.frombuffer(document["inputs"], dtype="<f8").tolist() == [1, 2, 6]
+
+    headers["Content-Type"] = "application/x-msgpack"
+    response = client.post("/jobs", content=wire.msgpack.packb({"type": "addition", "inputs": [1, 2], "priority": 5}), headers=headers)
+    assert response.status_code == 202
+    response = client.post("/calculations", content=wire.msgpack.packb({"type": "addition", "inputs": ["1", 2]}), headers=headers)
+    assert response.status_code == 400
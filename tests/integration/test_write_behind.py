@@ -0,0 +1,101 @@
+import pytest
+import uuid
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app.cache.history import history_cache
+from app.models.calculation import Addition, Calculation
+from app.models.user import User
+from app.write_behind import CalculationWriteBuffer, WriteBufferFull, batch_size_histogram, calculation_write_buffer
+from tests.conftest import TestingSessionLocal
+from tests.integration.test_fastapi_calculator import client
+
+@pytest.fixture
+def buffer():
+    return CalculationWriteBuffer(session_factory=TestingSessionLocal, flush_interval=60, batch_size=50, max_queue=200)
+
+@pytest.fixture
+def auth_headers(test_user):
+    return {"Authorization": f"Bearer {User.create_access_token({'sub': str(test_user.id)})}"}
+
+def queued_addition(buffer, user_id, inputs=(1, 2)):
+    calculation = Calculation.create_calculation("addition", user_id, list(inputs))
+    calculation.result = calculation.get_result()
+    return buffer.submit(calculation)
+
+def test_flush_writes_batches_with_multi_row_inserts(buffer, db_session, test_user):
+    ids = [queued_addition(buffer, test_user.id, (i, 1)).id for i in range(120)]
+    version = history_cache.version(db_session, test_user.id)
+    batches = batch_size_histogram.count()
+
+    statements = []
+    engine = db_session.get_bind()
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert buffer.flush() == 120
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert len([s for s in statements if s.startswith("INSERT INTO calculations")]) == 3
+    assert len(buffer) == 0
+    assert batch_size_histogram.count() == batches + 3
+    assert history_cache.version(db_session, test_user.id) > version
+    stored = db_session.query(Calculation).filter(Calculation.user_id == test_user.id).all()
+    assert sorted(calc.id for calc in stored) == sorted(ids)
+    assert all(isinstance(calc, Addition) for calc in stored)
+
+def test_submit_rejects_when_queue_is_full(buffer, test_user):
+    for _ in range(buffer.max_queue):
+        queued_addition(buffer, test_user.id)
+    with pytest.raises(WriteBufferFull):
+        queued_addition(buffer, test_user.id)
+
+def test_failed_flush_requeues_rows(buffer, test_user, monkeypatch):
+    queued_addition(buffer, test_user.id)
+
+    def failing_execute(self, *args, **kwargs):
+        raise OperationalError("INSERT", {}, Exception("database is down"))
+
+    monkeypatch.setattr("sqlalchemy.orm.Session.execute", failing_execute)
+    assert buffer.flush() == 0
+    assert len(buffer) == 1
+    monkeypatch.undo()
+    assert buffer.flush() == 1
+
+def test_rows_rejected_by_the_database_are_dropped_individually(buffer, db_session, test_user):
+    queued_addition(buffer, test_user.id)
+    queued_addition(buffer, uuid.uuid4())
+    queued_addition(buffer, test_user.id)
+
+    assert buffer.flush() == 2
+    assert len(buffer) == 0
+    assert db_session.query(Calculation).count() == 2
+
+def test_stop_flushes_pending_rows(db_session, test_user):
+    buffer = CalculationWriteBuffer(session_factory=TestingSessionLocal, flush_interval=60)
+    buffer.start()
+    queued_addition(buffer, test_user.id)
+    buffer.stop()
+    assert db_session.query(Calculation).count() == 1
+
+def test_create_calculation_writes_through_by_default(client, db_session, auth_headers):
+    response = client.post("/calculations", json={"type": "division", "inputs": [9, 3]}, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json()["result"] == 3
+    assert db_session.query(Calculation).count() == 1
+
+def test_create_calculation_queues_when_write_behind_enabled(client, db_session, auth_headers, monkeypatch):
+    monkeypatch.setattr(calculation_write_buffer, "flush_interval", 60)
+    monkeypatch.setattr(calculation_write_buffer, "session_factory", TestingSessionLocal)
+
+    response = client.post("/calculations", json={"type": "addition", "inputs": [1, 2]}, headers=auth_headers)
+    assert response.status_code == 202
+    assert db_session.query(Calculation).count() == 0
+    calculation_write_buffer.flush()
+    assert str(db_session.query(Calculation).one().id) == response.json()["id"]
+
+    monkeypatch.setattr(calculation_write_buffer, "max_queue", 0)
+    response = client.post("/calculations", json={"type": "addition", "inputs": [1, 2]}, headers=auth_headers)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
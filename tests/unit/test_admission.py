@@ -0,0 +1,56 @@
+from app.middleware.admission import AIMDConcurrencyLimiter, TokenBucketLimiter
+
+def test_token_bucket_allows_burst_then_limits():
+    limiter = TokenBucketLimiter(rate=10, burst=3, max_keys=10)
+    assert [limiter.acquire("a", 0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    retry_after = limiter.acquire("a", 0.0)
+    assert retry_after == 0.1
+
+def test_token_bucket_refills_over_time():
+    limiter = TokenBucketLimiter(rate=10, burst=1, max_keys=10)
+    assert limiter.acquire("a", 0.0) == 0.0
+    assert limiter.acquire("a", 0.05) > 0
+    assert limiter.acquire("a", 0.2) == 0.0
+
+def test_token_bucket_keys_are_independent_and_bounded():
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2)
+    assert limiter.acquire("a", 0.0) == 0.0
+    assert limiter.acquire("b", 0.0) == 0.0
+    assert limiter.acquire("c", 0.0) == 0.0
+    assert len(limiter) == 2
+    # "a" was evicted, so it starts again with a full bucket
+    assert limiter.acquire("a", 0.0) == 0.0
+
+def test_aimd_limit_rejects_when_full():
+    limiter = AIMDConcurrencyLimiter(initial=2, minimum=1, maximum=10, target_latency=0.1)
+    assert limiter.try_acquire()
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+def test_aimd_decreases_on_slow_requests_and_recovers():
+    limiter = AIMDConcurrencyLimiter(initial=10, minimum=2, maximum=20, target_latency=0.1)
+    for second in range(30):
+        limiter.try_acquire()
+        limiter.release(1.0, now=second * 2.0)
+    assert limiter.limit == 2
+
+    for _ in range(50):
+        for _ in range(int(limiter.limit)):
+            limiter.try_acquire()
+        for _ in range(int(limiter.limit)):
+            limiter.release(0.01)
+    assert limiter.limit > 2
+
+def test_aimd_decreases_once_per_burst_of_slow_requests():
+    limiter = AIMDConcurrencyLimiter(initial=10, minimum=2, maximum=20, target_latency=0.1)
+    for _ in range(5):
+        limiter.try_acquire()
+    # All five were in flight together; only the first completion cuts the limit.
+    for finished in (1.0, 1.1, 1.2, 1.3, 1.4):
+        limiter.release(1.0, now=finished)
+    assert limiter.limit == 9
+
+    # A slow request that started after that decrease cuts it again.
+    limiter.try_acquire()
+    limiter.release(0.5, now=2.0)
+    assert limiter.limit == 9 * 0.9
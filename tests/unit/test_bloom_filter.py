@@ -0,0 +1,22 @@
+from app.auth.revocation import BloomFilter
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    assert bloom.count == 1000
+
+def test_bloom_filter_false_positive_rate_is_bounded():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300, f"Too many false positives: {false_positives}"
+
+def test_bloom_filter_sizing():
+    bloom = BloomFilter(capacity=100000, error_rate=0.001)
+    # ~1.44 * log2(1/p) bits per element
+    assert len(bloom.bits) < 200 * 1024
+    assert bloom.hash_count == 10
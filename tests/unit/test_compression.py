@@ -0,0 +1,34 @@
+import gzip
+
+import pytest
+
+from app.compression import brotli, compress, negotiate_encoding
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("gzip;q=0, br;q=0", None),
+    ("*", "br"),
+    ("*;q=0, gzip", "gzip"),
+    ("deflate", None),
+    ("GZIP;q=0.8", "gzip"),
+    ("gzip;q=bogus, br", "br"),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header, ("br", "gzip")) == expected
+
+def test_gzip_is_deterministic():
+    data = b"calculator " * 100
+    assert compress(data, "gzip") == compress(data, "gzip")
+    assert gzip.decompress(compress(data, "gzip")) == data
+
+def test_brotli_round_trip():
+    data = b"calculator " * 100
+    assert brotli.decompress(compress(data, "br")) == data
+
+def test_unknown_encoding():
+    with pytest.raises(ValueError):
+        compress(b"x", "deflate")
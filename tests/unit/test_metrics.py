@@ -0,0 +1,35 @@
+import pytest
+from app.metrics import MetricsRegistry
+
+def test_counter_and_gauge_render():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests", labels=("status",))
+    counter.inc(status="200")
+    counter.inc(2, status="500")
+    gauge = registry.gauge("queue_depth", "Queue depth")
+    gauge.set_function(lambda: 7)
+
+    text = registry.render()
+    assert 'requests_total{status="200"} 1' in text
+    assert 'requests_total{status="500"} 2' in text
+    assert "queue_depth 7" in text
+    assert counter.value(status="500") == 2
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+
+    text = registry.render()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert histogram.count() == 3
+    assert histogram.sum() == pytest.approx(5.55)
+
+def test_registry_returns_existing_metric_and_rejects_kind_change():
+    registry = MetricsRegistry()
+    assert registry.counter("hits", "Hits") is registry.counter("hits", "Hits")
+    with pytest.raises(ValueError):
+        registry.gauge("hits", "Hits")
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.operations.statistics import RunningMoments, TDigest, iter_chunks, moments, percentile
+
+def test_iter_chunks_from_lists_arrays_and_streams():
+    values = list(range(10))
+    assert [chunk.tolist() for chunk in iter_chunks(values, 4)] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert [len(chunk) for chunk in iter_chunks(np.arange(10.0), 5)] == [5, 5]
+    assert [len(chunk) for chunk in iter_chunks(iter(values), 3)] == [3, 3, 3, 1]
+    assert list(iter_chunks(iter([]), 3)) == []
+
+def test_moments_match_numpy_across_chunk_boundaries(monkeypatch):
+    monkeypatch.setattr(settings, "STATISTICS_CHUNK_SIZE", 7)
+    values = np.random.default_rng(1).normal(5, 3, size=100)
+    summary = moments(values)
+    assert summary.count == 100
+    assert summary.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert summary.variance() == pytest.approx(values.var(ddof=1), rel=1e-12)
+    assert summary.variance(ddof=0) == pytest.approx(values.var(), rel=1e-12)
+
+def test_moments_are_stable_with_a_large_offset():
+    # The sum-of-squares formula loses every significant digit here.
+    values = 1e9 + np.array([4.0, 7.0, 13.0, 16.0])
+    summary = RunningMoments()
+    for value in values:
+        summary.update(np.array([value]))
+    assert summary.variance() == pytest.approx(30.0, rel=1e-9)
+
+def test_variance_needs_two_values():
+    with pytest.raises(ValueError, match="more than 1 number"):
+        moments([1.0]).variance()
+
+def test_tdigest_estimates_quantiles_in_bounded_memory():
+    values = np.random.default_rng(2).lognormal(size=200_000)
+    digest = TDigest(compression=100)
+    for chunk in iter_chunks(values, 10_000):
+        digest.update(chunk)
+    assert len(digest) <= 110
+    for q in (0.001, 0.01, 0.5, 0.99, 0.999):
+        estimate = digest.quantile(q)
+        # Rank error: the fraction of values below the estimate is close to q.
+        assert abs(np.mean(values < estimate) - q) < 0.002
+    assert digest.quantile(0) == values.min()
+    assert digest.quantile(1) == values.max()
+
+def test_tdigest_without_values():
+    with pytest.raises(ValueError):
+        TDigest().quantile(0.5)
+
+def test_percentile_is_exact_for_lists_and_estimated_beyond(monkeypatch):
+    values = [15, 20, 35, 40, 50]
+    assert percentile(values, 40) == np.percentile(values, 40) == 29
+    assert percentile(values, 0) == 15 and percentile(values, 100) == 50
+    with pytest.raises(ValueError, match="between 0 and 100"):
+        percentile(values, 101)
+
+    monkeypatch.setattr(settings, "PERCENTILE_EXACT_MAX_INPUTS", 1000)
+    large = np.random.default_rng(3).uniform(0, 1, size=50_000)
+    assert percentile(large, 90) == pytest.approx(np.percentile(large, 90), abs=0.005)
+    assert percentile(iter(large.tolist()), 90) == pytest.approx(np.percentile(large, 90), abs=0.005)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from app.models.calculation import Calculation
+from app.operations.vectorized import array_result, invalid_rows, pack_inputs, reduce_inputs, validation_error
+
+ROWS = [[10, 2], [1.5, 2, 3.25], [7, -3, 0.5, 4], [100, 10, 10]]
+
+def test_pack_inputs():
+    values, offsets = pack_inputs([[1, 2], [3, 4, 5]])
+    assert values.tolist() == [1, 2, 3, 4, 5]
+    assert offsets.tolist() == [0, 2, 5]
+
+@pytest.mark.parametrize("calculation_type", ["addition", "subtraction", "multiplication", "division", "modulo"])
+def test_reduce_inputs_matches_get_result(calculation_type):
+    values, offsets = pack_inputs(ROWS)
+    expected = [Calculation.create_calculation(calculation_type, None, row).get_result() for row in ROWS]
+    assert reduce_inputs(calculation_type, values, offsets).tolist() == expected
+
+@pytest.mark.parametrize("calculation_type", ["mean", "variance", "stddev", "percentile", "power"])
+def test_statistics_match_get_result(calculation_type):
+    rows = [[10, 2], [50, 2, 3.25, 1.5], [7, -3, 0.5, 4], [99, 10, 10], [0, 1e9 + 1, 1e9 + 2, 1e9 + 3], [1.5, 2, 3, 0.25]]
+    values, offsets = pack_inputs(rows)
+    expected = [Calculation.create_calculation(calculation_type, None, row).get_result() for row in rows]
+    assert reduce_inputs(calculation_type, values, offsets).tolist() == pytest.approx(expected, rel=1e-12)
+
+def test_invalid_rows():
+    values, offsets = pack_inputs([[0, 2], [4, 0], [1], [], [5, 1, 0]])
+    assert invalid_rows("division", values, offsets).tolist() == [False, True, True, True, True]
+    assert invalid_rows("addition", values, offsets).tolist() == [False, False, True, True, False]
+    assert invalid_rows("modulo", values, offsets).tolist() == [False, True, True, True, True]
+    values, offsets = pack_inputs([[50, 1], [101, 1], [-1, 1], [100, 1], [0, 1, 2], [3]])
+    assert invalid_rows("percentile", values, offsets).tolist() == [False, True, True, False, False, True]
+
+def test_reduce_inputs_rejects_unknown_type():
+    values, offsets = pack_inputs(ROWS)
+    with pytest.raises(ValueError, match="Unsupported calculation type"):
+        reduce_inputs("square_root", values, offsets)
+
+def test_reduce_inputs_empty_batch():
+    values, offsets = pack_inputs([])
+    assert reduce_inputs("addition", values, offsets).shape == (0,)
+    assert not np.any(invalid_rows("division", values, offsets))
+
+@pytest.mark.parametrize("calculation_type, inputs, error", [
+    ("addition", [1, 2], None),
+    ("addition", [1], "At least two numbers are required for calculation"),
+    ("addition", [1, np.nan], "Inputs must be finite numbers"),
+    ("multiplication", [np.inf, 2], "Inputs must be finite numbers"),
+    ("division", [0, 2], None),
+    ("division", [4, 2, 0], "Cannot divide by zero"),
+    ("modulo", [4, 0], "Cannot divide by zero"),
+    ("percentile", [100, 1, 2], None),
+    ("percentile", [100.5, 1, 2], "Percentile must be between 0 and 100"),
+    ("square_root", [4, 2], "Unsupported calculation type: square_root"),
+])
+def test_validation_error(calculation_type, inputs, error):
+    assert validation_error(calculation_type, np.array(inputs, dtype=np.float64)) == error
+
+@pytest.mark.parametrize("calculation_type", ["addition", "subtraction", "division", "modulo", "mean", "percentile"])
+def test_array_result_matches_get_result(calculation_type):
+    row = [50, 2, 3.25, 1.5]
+    expected = Calculation.create_calculation(calculation_type, None, row).get_result()
+    assert array_result(calculation_type, np.array(row, dtype=np.float64)) == pytest.approx(expected, rel=1e-12)
+
+def test_array_result_rejects_overflow():
+    with pytest.raises(ValueError, match="not a finite number"):
+        array_result("multiplication", np.array([1e300, 1e300]))